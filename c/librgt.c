@@ -692,4 +692,423 @@ double jaccard (
 
     // Return jaccard index.
     return ((double)inter) / ((double) uni);
-}
\ No newline at end of file
+}
+
+/*
+ * Interface with chromosome codes.
+ *
+ * The following functions take the chromosomes of the genomic regions as integer codes instead of names. The codes
+ * of both sets have to come from one common table in which the codes are ordered like the chromosome names, so that
+ * comparing codes gives the same order as comparing names. The result arrays are allocated by the caller with room
+ * for capacityR regions; the number of result regions is returned even if it exceeds capacityR, in which case only
+ * the first capacityR regions are written and the caller has to repeat the call with larger arrays.
+ */
+
+/**
+ * Return true, if the regions overlap (chromosome codes).
+ */
+static bool overlapCodes(
+    const int chromosomeA,
+    const int initialA,
+    const int finalA,
+    const int chromosomeB,
+    const int initialB,
+    const int finalB
+) {
+    if (chromosomeA != chromosomeB) {
+        return false;
+    }
+    if (initialA <= initialB) {
+        return finalA > initialB;
+    }
+    return initialA < finalB;
+}
+
+/**
+ * Compare two genomic regions by chromosome code, initial and final position (see compareGenomicRegions).
+ */
+static int compareCodes(
+    const int chromosomeA,
+    const int initialA,
+    const int finalA,
+    const int chromosomeB,
+    const int initialB,
+    const int finalB
+) {
+    if (chromosomeA != chromosomeB) {
+        return chromosomeA < chromosomeB ? -1 : 1;
+    }
+    if (initialA != initialB) {
+        return initialA < initialB ? -1 : 1;
+    }
+    if (finalA != finalB) {
+        return finalA < finalB ? -1 : 1;
+    }
+    return 0;
+}
+
+/**
+ * Store a result region if there is room for it.
+ */
+static void storeResult(
+    const int k,
+    const int index,
+    const int initial,
+    const int final,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR,
+    const int capacityR
+) {
+    if (k < capacityR) {
+        indicesR[k] = index;
+        initialsR[k] = initial;
+        finalsR[k] = final;
+    }
+}
+
+/**
+ * Compute the intersection of two sorted genomic region sets with chromosome codes. The walk through both sets is
+ * the same as in intersectGenomicRegionSetsOverlap, intersectGenomicRegionSetsOriginal and
+ * intersectGenomicRegionSetsCompletelyIncluded, so the results are identical.
+ *
+ * @param const int overlapType    Enum for the overlap type.
+ * @param const int *chromosomesA  An array of the chromosome codes of the genomic regions of the first set.
+ * @param const int *initialsA     An array of the initial positions of the genomic regions of the first set.
+ * @param const int *finalsA       An array of the final positions of the genomic regions of the first set.
+ * @param const int sizeA          The number of genomic regions in the first set.
+ * @param const int *chromosomesB  An array of the chromosome codes of the genomic regions of the second set.
+ * @param const int *initialsB     An array of the initial positions of the genomic regions of the second set.
+ * @param const int *finalsB       An array of the final positions of the genomic regions of the second set.
+ * @param const int sizeB          The number of genomic regions in the second set.
+ * @param int *indicesR            Used to return the result. The indices of the regions of the first set holding the
+ *                                 meta data of the result regions.
+ * @param int *initialsR           Used to return the result. The initial positions of the result regions.
+ * @param int *finalsR             Used to return the result. The final positions of the result regions.
+ * @param const int capacityR      The number of regions the result arrays can hold.
+ *
+ * @return The number of regions in the result set.
+ */
+int intersectGenomicRegionSetsCodes (
+    const int overlapType,
+    const int *chromosomesA,
+    const int *initialsA,
+    const int *finalsA,
+    const int sizeA,
+    const int *chromosomesB,
+    const int *initialsB,
+    const int *finalsB,
+    const int sizeB,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR,
+    const int capacityR
+) {
+    int i = 0;
+    int j = 0;
+    int k = 0;
+    const int last_i = sizeA - 1;
+    const int last_j = sizeB - 1;
+    int pre_inter = 0;
+    bool cont_loop = (sizeA > 0) && (sizeB > 0);
+    bool cont_overlap = false;
+
+    while (cont_loop) {
+        if (overlapCodes(chromosomesA[i], initialsA[i], finalsA[i], chromosomesB[j], initialsB[j], finalsB[j])) {
+            if (overlapType == OVERLAP_TYPE_ORIGINAL) {
+                // Every region of the first set is reported once
+                storeResult(k++, i, initialsA[i], finalsA[i], indicesR, initialsR, finalsR, capacityR);
+                if (i < last_i) {
+                    i++;
+                } else {
+                    cont_loop = false;
+                }
+                continue;
+            }
+            if (overlapType == OVERLAP_TYPE_OVERLAP) {
+                storeResult(k++, i, max(initialsA[i], initialsB[j]), min(finalsA[i], finalsB[j]),
+                            indicesR, initialsR, finalsR, capacityR);
+            } else if ((initialsA[i] >= initialsB[j]) && (finalsA[i] <= finalsB[j])) {
+                storeResult(k++, i, initialsA[i], finalsA[i], indicesR, initialsR, finalsR, capacityR);
+            }
+            if (!cont_overlap) {
+                pre_inter = j;
+            }
+            if (j < last_j) {
+                j++;
+            } else if (i < last_i) {
+                i++;
+            } else {
+                cont_loop = false;
+            }
+            cont_overlap = true;
+        } else {
+            cont_overlap = false;
+            const int comparison = compareCodes(chromosomesA[i], initialsA[i], finalsA[i], chromosomesB[j], initialsB[j], finalsB[j]);
+            if (comparison > 0) {
+                if (j < last_j) {
+                    j++;
+                } else {
+                    cont_loop = false;
+                }
+            } else {
+                if (i < last_i) {
+                    i++;
+                    if ((overlapType != OVERLAP_TYPE_ORIGINAL) && (comparison < 0) &&
+                        (chromosomesA[i] == chromosomesB[j]) && (pre_inter > 0)) {
+                        j = pre_inter;
+                    }
+                } else {
+                    cont_loop = false;
+                }
+            }
+        }
+    }
+    return k;
+}
+
+/**
+ * Return jaccard index, a value of similarity of two sorted genomic region sets with chromosome codes. The result is
+ * the same as jaccard, but the coverages are summed up in 64 bit.
+ */
+double jaccardCodes (
+    const int *chromosomesA,
+    const int *initialsA,
+    const int *finalsA,
+    const int sizeA,
+    const int *chromosomesB,
+    const int *initialsB,
+    const int *finalsB,
+    const int sizeB
+) {
+    int i = 0;
+    int j = 0;
+    const int last_i = sizeA - 1;
+    const int last_j = sizeB - 1;
+    int pre_inter = 0;
+    bool cont_loop = (sizeA > 0) && (sizeB > 0);
+    bool cont_overlap = false;
+    long long inter = 0;
+    long long totalCoverageA = 0;
+    long long totalCoverageB = 0;
+
+    while (cont_loop) {
+        if (overlapCodes(chromosomesA[i], initialsA[i], finalsA[i], chromosomesB[j], initialsB[j], finalsB[j])) {
+            inter += min(finalsA[i], finalsB[j]) - max(initialsA[i], initialsB[j]);
+            if (!cont_overlap) {
+                pre_inter = j;
+            }
+            if (j < last_j) {
+                j++;
+            } else if (i < last_i) {
+                i++;
+            } else {
+                cont_loop = false;
+            }
+            cont_overlap = true;
+        } else {
+            cont_overlap = false;
+            const int comparison = compareCodes(chromosomesA[i], initialsA[i], finalsA[i], chromosomesB[j], initialsB[j], finalsB[j]);
+            if (comparison > 0) {
+                if (j < last_j) {
+                    j++;
+                } else {
+                    cont_loop = false;
+                }
+            } else {
+                if (i < last_i) {
+                    i++;
+                    if ((comparison < 0) && (chromosomesA[i] == chromosomesB[j]) && (pre_inter > 0)) {
+                        j = pre_inter;
+                    }
+                } else {
+                    cont_loop = false;
+                }
+            }
+        }
+    }
+
+    for (i = 0; i < sizeA; i++) {
+        totalCoverageA += finalsA[i] - initialsA[i];
+    }
+    for (j = 0; j < sizeB; j++) {
+        totalCoverageB += finalsB[j] - initialsB[j];
+    }
+    return ((double) inter) / ((double) (totalCoverageA + totalCoverageB - inter));
+}
+
+/**
+ * Merge the overlapping regions of a sorted genomic region set with chromosome codes. A region is merged into the
+ * previous merged region if they overlap and have the same key (keys may code names or strands, or be all equal).
+ *
+ * @param const int *chromosomes  An array of the chromosome codes of the genomic regions.
+ * @param const int *initials     An array of the initial positions of the genomic regions.
+ * @param const int *finals       An array of the final positions of the genomic regions.
+ * @param const int *keys         An array of the keys of the genomic regions.
+ * @param const int size          The number of genomic regions.
+ * @param int *indicesR           Used to return the result. The indices of the first region of every merged region.
+ * @param int *initialsR          Used to return the result. The initial positions of the merged regions.
+ * @param int *finalsR            Used to return the result. The final positions of the merged regions.
+ *
+ * @return The number of merged regions (at most size).
+ */
+int mergeGenomicRegionsCodes (
+    const int *chromosomes,
+    const int *initials,
+    const int *finals,
+    const int *keys,
+    const int size,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR
+) {
+    int i;
+    int k = 0;
+    if (size == 0) {
+        return 0;
+    }
+    indicesR[0] = 0;
+    initialsR[0] = initials[0];
+    finalsR[0] = finals[0];
+    for (i = 1; i < size; i++) {
+        const int p = indicesR[k];
+        if ((keys[p] == keys[i]) &&
+            overlapCodes(chromosomes[p], initialsR[k], finalsR[k], chromosomes[i], initials[i], finals[i])) {
+            initialsR[k] = min(initialsR[k], initials[i]);
+            finalsR[k] = max(finalsR[k], finals[i]);
+        } else {
+            k++;
+            indicesR[k] = i;
+            initialsR[k] = initials[i];
+            finalsR[k] = finals[i];
+        }
+    }
+    return k + 1;
+}
+
+/**
+ * Cluster the regions of a sorted genomic region set with chromosome codes. A region joins the previous cluster if
+ * it overlaps the cluster after being extended by distance on both sides (see GenomicRegion.extend).
+ *
+ * @param const int *chromosomes  An array of the chromosome codes of the genomic regions.
+ * @param const int *initials     An array of the initial positions of the genomic regions.
+ * @param const int *finals       An array of the final positions of the genomic regions.
+ * @param const int size          The number of genomic regions.
+ * @param const int distance      The maximum distance between regions within the same cluster.
+ * @param int *indicesR           Used to return the result. The indices of the first region of every cluster.
+ * @param int *initialsR          Used to return the result. The initial positions of the clusters.
+ * @param int *finalsR            Used to return the result. The final positions of the clusters.
+ *
+ * @return The number of clusters (at most size).
+ */
+int clusterGenomicRegionsCodes (
+    const int *chromosomes,
+    const int *initials,
+    const int *finals,
+    const int size,
+    const int distance,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR
+) {
+    int i;
+    int k = 0;
+    if (size == 0) {
+        return 0;
+    }
+    indicesR[0] = 0;
+    initialsR[0] = initials[0];
+    finalsR[0] = finals[0];
+    for (i = 1; i < size; i++) {
+        const int p = indicesR[k];
+        int initial = initials[i] - distance;
+        int final = finals[i] + distance;
+        if (initial > final) {
+            const int swap = initial;
+            initial = final;
+            final = swap;
+        }
+        initial = max(initial, 0);
+        if (overlapCodes(chromosomes[i], initial, final, chromosomes[p], initialsR[k], finalsR[k])) {
+            initialsR[k] = min(initialsR[k], initials[i]);
+            finalsR[k] = max(finalsR[k], finals[i]);
+        } else {
+            k++;
+            indicesR[k] = i;
+            initialsR[k] = initials[i];
+            finalsR[k] = finals[i];
+        }
+    }
+    return k + 1;
+}
+
+/**
+ * Subtract a merged genomic region set from a sorted genomic region set with chromosome codes in one pass. Every
+ * region of the first set is cut at the regions of the second set it overlaps; regions without overlap are kept
+ * as they are. The second set has to be merged, so that both its initials and finals are sorted.
+ *
+ * @param const int *chromosomesA  An array of the chromosome codes of the genomic regions of the first set.
+ * @param const int *initialsA     An array of the initial positions of the genomic regions of the first set.
+ * @param const int *finalsA       An array of the final positions of the genomic regions of the first set.
+ * @param const int sizeA          The number of genomic regions in the first set.
+ * @param const int *chromosomesB  An array of the chromosome codes of the genomic regions of the second set.
+ * @param const int *initialsB     An array of the initial positions of the genomic regions of the second set.
+ * @param const int *finalsB       An array of the final positions of the genomic regions of the second set.
+ * @param const int sizeB          The number of genomic regions in the second set.
+ * @param const int wholeRegion    If true, overlapping regions are removed completely instead of being cut.
+ * @param int *indicesR            Used to return the result. The indices of the regions of the first set holding the
+ *                                 meta data of the result regions.
+ * @param int *initialsR           Used to return the result. The initial positions of the result regions.
+ * @param int *finalsR             Used to return the result. The final positions of the result regions.
+ * @param const int capacityR      The number of regions the result arrays can hold.
+ *
+ * @return The number of regions in the result set (see intersectGenomicRegionSetsCodes for capacityR).
+ */
+int subtractGenomicRegionSetsCodes (
+    const int *chromosomesA,
+    const int *initialsA,
+    const int *finalsA,
+    const int sizeA,
+    const int *chromosomesB,
+    const int *initialsB,
+    const int *finalsB,
+    const int sizeB,
+    const int wholeRegion,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR,
+    const int capacityR
+) {
+    int i;
+    int j = 0;
+    int k = 0;
+    for (i = 0; i < sizeA; i++) {
+        // Skip the regions of the second set which end before the current region (or on a previous chromosome)
+        while ((j < sizeB) && ((chromosomesB[j] < chromosomesA[i]) ||
+                               ((chromosomesB[j] == chromosomesA[i]) && (finalsB[j] < initialsA[i])))) {
+            j++;
+        }
+        int position = initialsA[i];
+        bool overlapping = false;
+        int l;
+        for (l = j; (l < sizeB) && (chromosomesB[l] == chromosomesA[i]) && (initialsB[l] <= finalsA[i]); l++) {
+            if (!overlapCodes(chromosomesA[i], initialsA[i], finalsA[i], chromosomesB[l], initialsB[l], finalsB[l])) {
+                continue;
+            }
+            overlapping = true;
+            if (wholeRegion) {
+                break;
+            }
+            if (initialsB[l] > position) {
+                storeResult(k++, i, position, initialsB[l], indicesR, initialsR, finalsR, capacityR);
+            }
+            position = max(position, finalsB[l]);
+        }
+        if (!overlapping) {
+            storeResult(k++, i, initialsA[i], finalsA[i], indicesR, initialsR, finalsR, capacityR);
+        } else if (!wholeRegion && (position < finalsA[i])) {
+            storeResult(k++, i, position, finalsA[i], indicesR, initialsR, finalsR, capacityR);
+        }
+    }
+    return k;
+}
@@ -78,4 +78,69 @@ double jaccard (
     const int sizeB
 );
 
+int intersectGenomicRegionSetsCodes (
+    const int overlapType,
+    const int *chromsA,
+    const int *initialsA,
+    const int *finalsA,
+    const int sizeA,
+    const int *chromsB,
+    const int *initialsB,
+    const int *finalsB,
+    const int sizeB,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR,
+    const int capacityR
+);
+
+double jaccardCodes (
+    const int *chromsA,
+    const int *initialsA,
+    const int *finalsA,
+    const int sizeA,
+    const int *chromsB,
+    const int *initialsB,
+    const int *finalsB,
+    const int sizeB
+);
+
+int mergeGenomicRegionsCodes (
+    const int *chroms,
+    const int *initials,
+    const int *finals,
+    const int *keys,
+    const int size,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR
+);
+
+int clusterGenomicRegionsCodes (
+    const int *chroms,
+    const int *initials,
+    const int *finals,
+    const int size,
+    const int distance,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR
+);
+
+int subtractGenomicRegionSetsCodes (
+    const int *chromsA,
+    const int *initialsA,
+    const int *finalsA,
+    const int sizeA,
+    const int *chromsB,
+    const int *initialsB,
+    const int *finalsB,
+    const int sizeB,
+    const int wholeRegion,
+    int *indicesR,
+    int *initialsR,
+    int *finalsR,
+    const int capacityR
+);
+
 #endif // _LIBRGT_H_
@@ -0,0 +1,279 @@
+"""
+BedReader
+===================
+BedReader streams BED and bedGraph files in chunks of lines. Plain, gzip and
+bgzip compressed files are read transparently. Every chunk is parsed column
+by column into lists and NumPy arrays, and the reader checks on the way
+whether the file is sorted, so that the callers can skip sorting.
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+import os
+import gzip
+from itertools import islice
+import numpy as np
+# Internal
+from rgt.GenomicRegion import GenomicRegion
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def open_file(filename):
+    """Open a text file for reading; gzip and bgzip compressed files (recognized by their magic number) are
+    decompressed on the fly."""
+    with open(filename, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(filename, "rb")
+    return open(filename)
+
+
+def is_bgzip(filename):
+    """Return True if the file is compressed with bgzip (gzip with the BGZF extra field), which can be indexed."""
+    with open(filename, "rb") as f:
+        header = f.read(14)
+    return header[:4] == b"\x1f\x8b\x08\x04" and header[12:14] == b"BC"
+
+
+def is_sorted(chroms, initials, finals, previous=None):
+    """Return True if the regions are in the order of GenomicRegion.__cmp__.
+
+    *Keyword arguments:*
+
+        - chroms -- list of chromosome names.
+        - initials, finals -- NumPy arrays of the positions.
+        - previous -- (chrom, initial, final) of the region before the first one, or None.
+    """
+    if previous is not None and len(initials):
+        if previous > (chroms[0], initials[0], finals[0]):
+            return False
+    if len(initials) < 2:
+        return True
+    chroms = np.array(chroms, dtype=object)
+    same_chrom = chroms[1:] == chroms[:-1]
+    if not np.all(same_chrom | (chroms[1:] > chroms[:-1])):
+        return False
+    ordered = (initials[1:] > initials[:-1]) | ((initials[1:] == initials[:-1]) & (finals[1:] >= finals[:-1]))
+    return bool(np.all(ordered | ~same_chrom))
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class BedReader:
+    """*Keyword arguments:*
+
+        - filename -- path to the BED or bedGraph file (may be gzip or bgzip compressed).
+        - bedgraph -- Read the file as bedGraph (chrom, start, end, value) instead of BED.
+        - chunk_size -- number of lines parsed at once.
+        - regions -- GenomicRegionSet (or list of GenomicRegions); if given, only the rows overlapping these regions
+          are read.
+
+    The columns are interpreted as in GenomicRegionSet.read_bed and read_bedgraph. After all chunks have been read,
+    the attribute sorted tells whether the file was sorted.
+
+    With regions, a bgzip compressed file is read through its tabix index (.tbi or .csi), which is created next to
+    the file if there is none. Other files are streamed completely and filtered.
+    """
+
+    def __init__(self, filename, bedgraph=False, chunk_size=100000, regions=None):
+        self.filename = filename
+        self.bedgraph = bedgraph
+        self.chunk_size = chunk_size
+        self.regions = regions
+        self.sorted = True
+        self.error_line = 0  # Count error line
+        self._last = None
+
+    def chunks(self):
+        """Yield the regions of the file as tuples of columns (chroms, initials, finals, names, orientations, data),
+        as taken by GenomicRegionArray.add_arrays. initials and finals are int64 arrays, the others are lists."""
+        self.sorted = True
+        self.error_line = 0
+        self._last = None
+        intervals = None
+        tabix = None
+        if self.regions is not None:
+            intervals = _query_intervals(self.regions)
+            tabix = self._open_tabix()
+
+        if tabix is not None:
+            lines = _fetch(tabix, intervals)
+            f = tabix
+        else:
+            f = open_file(self.filename)
+            lines = f
+        try:
+            while True:
+                chunk = list(islice(lines, self.chunk_size))
+                if not chunk:
+                    break
+                if self.bedgraph:
+                    columns = self._parse_bedgraph(chunk)
+                else:
+                    columns = self._parse_bed(chunk)
+                if tabix is None and intervals is not None:
+                    columns = _select(columns, intervals)
+                if not len(columns[1]):
+                    continue
+                chroms, initials, finals = columns[:3]
+                if self.sorted:
+                    self.sorted = is_sorted(chroms, initials, finals, self._last)
+                self._last = (chroms[-1], initials[-1], finals[-1])
+                yield columns
+        finally:
+            f.close()
+
+    def __iter__(self):
+        """Yield the regions of the file as GenomicRegions."""
+        for chroms, initials, finals, names, orientations, data in self.chunks():
+            for region in zip(chroms, initials.tolist(), finals.tolist(), names, orientations, data):
+                yield GenomicRegion(*region)
+
+    def _open_tabix(self):
+        """Return a pysam.TabixFile for a bgzip compressed file, indexing it first if necessary. Returns None if the
+        file is not bgzip compressed or cannot be indexed (e.g. if it is not sorted)."""
+        # pysam is only needed for reading indexed files
+        import pysam
+        if not is_bgzip(self.filename):
+            return None
+        index = None
+        for suffix in [".tbi", ".csi"]:
+            if os.path.exists(self.filename + suffix):
+                index = self.filename + suffix
+                break
+        try:
+            if index is None:
+                index = pysam.tabix_index(self.filename, preset="bed", keep_original=True) + ".tbi"
+            return pysam.TabixFile(self.filename, index=index)
+        except (IOError, OSError, ValueError):
+            print("Cannot use a tabix index for", self.filename, "- reading the whole file")
+            return None
+
+    def _error(self, line):
+        self.error_line += 1
+        if self.error_line > 2:
+            # Skip the first error lines which contain the track information
+            print("Error at line", line, self.filename)
+
+    def _parse_bed(self, lines):
+        rows = [line.split() for line in lines]
+        rows = [row for row in rows if row]
+        starts, ends = _int_columns(rows)
+        if starts is None:
+            # Find the broken lines one by one, then parse the rest at once
+            valid = []
+            for row in rows:
+                try:
+                    int(row[1]), int(row[2])
+                    valid.append(row)
+                except (IndexError, ValueError):
+                    self._error(row)
+            rows = valid
+            starts, ends = _int_columns(rows)
+        initials = np.minimum(starts, ends)
+        finals = np.maximum(starts, ends)
+        empty = initials == finals
+        if np.any(empty):
+            for i in np.flatnonzero(empty):
+                self._error(rows[i])
+            keep = ~empty
+            rows = [row for row, k in zip(rows, keep.tolist()) if k]
+            initials, finals = initials[keep], finals[keep]
+
+        chroms = [row[0] for row in rows]
+        names = [row[3] if len(row) > 3 else None for row in rows]
+        orientations = [row[5] if len(row) > 5 else None for row in rows]
+        data = [("\t".join([row[4]] + row[6:]) if len(row) > 5 else row[4]) if len(row) > 4 else None
+                for row in rows]
+        return chroms, initials, finals, names, orientations, data
+
+    def _parse_bedgraph(self, lines):
+        rows = []
+        for line in lines:
+            row = line.strip("\n").split("\t")
+            if row == [""]:
+                continue
+            try:
+                assert len(row) == 4
+                int(row[1]), int(row[2])
+                rows.append(row)
+            except (AssertionError, ValueError):
+                print("Error at line", row, self.filename)
+        initials, finals = _int_columns(rows)
+        n = len(rows)
+        return [row[0] for row in rows], initials, finals, [None] * n, [None] * n, [str(row[3]) for row in rows]
+
+
+def _int_columns(rows):
+    """Convert the second and third column of the rows to int64 arrays at once. Returns (None, None) if a row is too
+    short or holds no integer."""
+    try:
+        starts = np.array([row[1] for row in rows]).astype(np.int64)
+        ends = np.array([row[2] for row in rows]).astype(np.int64)
+    except (IndexError, ValueError):
+        return None, None
+    return starts.reshape(-1), ends.reshape(-1)
+
+
+def _query_intervals(regions):
+    """Return a dictionary chrom -> (starts, ends) with the merged, sorted intervals covered by the regions as int64
+    arrays. A zero-length region at p covers [p, p + 1), which is what GenomicRegion.overlap matches."""
+    by_chrom = {}
+    for r in regions:
+        by_chrom.setdefault(r.chrom, []).append((r.initial, max(r.final, r.initial + 1)))
+    intervals = {}
+    for chrom, pairs in by_chrom.items():
+        pairs.sort()
+        merged = [list(pairs[0])]
+        for start, end in pairs[1:]:
+            if start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        intervals[chrom] = (np.array([m[0] for m in merged], dtype=np.int64),
+                            np.array([m[1] for m in merged], dtype=np.int64))
+    return intervals
+
+
+def _fetch(tabix, intervals):
+    """Yield the lines of a tabix indexed file overlapping the intervals, every line once and in file order."""
+    contigs = set(tabix.contigs)
+    for chrom in sorted(intervals):
+        if chrom not in contigs:
+            continue
+        starts, ends = intervals[chrom]
+        previous_end = None
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            for line in tabix.fetch(chrom, start, end):
+                if previous_end is not None:
+                    # Rows overlapping the previous interval have been returned already
+                    fields = line.split("\t", 2)
+                    if int(fields[1]) < previous_end:
+                        continue
+                yield line
+            previous_end = end
+
+
+def _select(columns, intervals):
+    """Return the rows of the columns overlapping the intervals."""
+    chroms, initials, finals = columns[:3]
+    keep = np.zeros(len(initials), dtype=bool)
+    chrom_array = np.array(chroms, dtype=object)
+    for chrom, (starts, ends) in intervals.items():
+        rows = np.flatnonzero(chrom_array == chrom)
+        if not len(rows):
+            continue
+        # The last interval starting before the end of a row is the only one which can overlap it
+        k = np.searchsorted(starts, finals[rows], side="left") - 1
+        keep[rows] = (k >= 0) & (ends[np.maximum(k, 0)] > initials[rows])
+    rows = np.flatnonzero(keep)
+    return ([chroms[i] for i in rows], initials[rows], finals[rows]) + \
+        tuple([column[i] for i in rows] for column in columns[3:])
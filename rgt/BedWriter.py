@@ -0,0 +1,122 @@
+"""
+BedWriter
+===================
+BedWriter writes BED-like text files in blocks of lines instead of line by
+line. The rows are formatted in bulk, from GenomicRegions or from columns
+(lists or NumPy arrays), and can be compressed with bgzip and indexed with
+tabix when the file is closed.
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+import os
+import tempfile
+import numpy as np
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def region_lines(regions):
+    """Return the BED lines of the GenomicRegions as list."""
+    return [r.__str__() for r in regions]
+
+
+def string_column(column):
+    """Return the values of a column (list or NumPy array) as list of strings. NumPy arrays are converted at once;
+    their values are formatted as str() formats the NumPy scalars."""
+    if isinstance(column, np.ndarray):
+        return column.astype(str).tolist()
+    return [str(v) for v in column]
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class BedWriter:
+    """*Keyword arguments:*
+
+        - filename -- path to the output file.
+        - compress -- compress the file with bgzip (default: if the filename ends with .gz).
+        - index -- compress the file and create a tabix index (filename.tbi); the rows must be sorted by chromosome
+          and start.
+        - preset -- tabix preset of the index ("bed", "gff", "vcf", ...).
+        - buffer_size -- number of lines collected before they are written.
+
+    BedWriter is a context manager; the file is compressed and indexed when it is closed.
+    """
+
+    def __init__(self, filename, compress=None, index=False, preset="bed", buffer_size=100000):
+        self.filename = filename
+        self.compress = index or (filename.endswith(".gz") if compress is None else compress)
+        self.index = index
+        self.preset = preset
+        self.buffer_size = buffer_size
+        self._buffer = []
+        if self.compress:
+            # pysam compresses a complete file, so the text goes to a temporary file first
+            handle, self._path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=".bed")
+            self._file = os.fdopen(handle, "w")
+        else:
+            self._path = filename
+            self._file = open(filename, "w")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            if self.compress:
+                os.remove(self._path)
+
+    def write_line(self, line):
+        """Write one line (without newline)."""
+        self._buffer.append(line)
+        if len(self._buffer) >= self.buffer_size:
+            self._flush()
+
+    def write_lines(self, lines):
+        """Write the lines (without newlines) of a list."""
+        self._buffer.extend(lines)
+        if len(self._buffer) >= self.buffer_size:
+            self._flush()
+
+    def write_regions(self, regions):
+        """Write GenomicRegions as BED lines, as GenomicRegionSet.write_bed does."""
+        self.write_lines(region_lines(regions))
+
+    def write_columns(self, *columns):
+        """Write one row per position of the columns, separated by tabs. The columns are lists or NumPy arrays of
+        the same length; lists of strings are written as they are."""
+        columns = [c if isinstance(c, list) and (not c or isinstance(c[0], str)) else string_column(c)
+                   for c in columns]
+        self.write_lines(["\t".join(row) for row in zip(*columns)])
+
+    def close(self):
+        """Write the remaining lines and close the file; compress and index it if requested."""
+        if self._file.closed:
+            return
+        self._flush()
+        self._file.close()
+        if self.compress:
+            # pysam is only needed for compressed output
+            import pysam
+            try:
+                pysam.tabix_compress(self._path, self.filename, force=True)
+            finally:
+                os.remove(self._path)
+            if self.index:
+                pysam.tabix_index(self.filename, preset=self.preset, force=True)
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
@@ -0,0 +1,118 @@
+"""
+BigWigWriter
+===================
+BigWigWriter writes bigWig files with pyBigWig, without a text (wig or
+bedGraph) file in between. The intervals of a chromosome are collected and
+added in one call; the chromosomes are streamed one after another into the
+same file.
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+from collections import OrderedDict
+import numpy as np
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def read_chrom_sizes(chrom_file):
+    """Return the chromosome sizes of a tab-separated file (chrom, size) as OrderedDict."""
+    sizes = OrderedDict()
+    with open(chrom_file) as f:
+        for line in f:
+            line = line.strip().split("\t")
+            if len(line) >= 2:
+                sizes[line[0]] = int(line[1])
+    return sizes
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class BigWigWriter:
+    """*Keyword arguments:*
+
+        - filename -- path to the output file.
+        - chrom_sizes -- path to a chromosome size file (tab-separated: chrom, size) or dictionary of the sizes.
+        - chroms -- chromosomes in the order in which they are written; the other chromosomes follow in the order of
+          <chrom_sizes>.
+
+    The chromosomes must be written in the order of the header, each one in one piece; the intervals within a
+    chromosome may come in any order. Intervals beyond the chromosome end are clipped, intervals of chromosomes
+    without size are skipped. BigWigWriter is a context manager.
+    """
+
+    def __init__(self, filename, chrom_sizes, chroms=None):
+        # pyBigWig is only needed for bigWig output
+        import pyBigWig
+        if not isinstance(chrom_sizes, dict):
+            chrom_sizes = read_chrom_sizes(chrom_sizes)
+        order = OrderedDict((c, chrom_sizes[c]) for c in (chroms or []) if c in chrom_sizes)
+        for c in chrom_sizes:
+            order.setdefault(c, chrom_sizes[c])
+        self.filename = filename
+        self.chrom_sizes = order
+        self._rank = dict((c, i) for i, c in enumerate(order))
+        self._chrom = None
+        self._last = -1
+        self._intervals = []
+        self._file = pyBigWig.open(filename, "w")
+        self._file.addHeader(list(order.items()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_intervals(self, chrom, starts, ends, values):
+        """Write the intervals [start, end) of a chromosome with their values (lists or NumPy arrays). Where intervals
+        overlap, the interval with the smaller start is kept."""
+        if chrom not in self._rank:
+            return
+        if chrom != self._chrom:
+            self._flush()
+            if self._rank[chrom] <= self._last:
+                raise ValueError("%s is not written in the order of the header of %s" % (chrom, self.filename))
+            self._chrom, self._last = chrom, self._rank[chrom]
+        self._intervals.append((np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64),
+                                np.asarray(values, dtype=np.float64)))
+
+    def write_coverage(self, coverage_set, zero=False):
+        """Write the coverage of a CoverageSet; each bin is a window of <stepsize> in its middle, as
+        CoverageSet.write_bed gives. Bins without coverage are skipped, unless <zero> is set."""
+        offset = (coverage_set.binsize - coverage_set.stepsize) // 2
+        for region, c in zip(coverage_set.genomicRegions, coverage_set.coverage):
+            c = np.asarray(c)
+            bins = np.arange(len(c)) if zero else np.flatnonzero(c)
+            starts = bins * coverage_set.stepsize + offset + region.initial
+            self.write_intervals(region.chrom, starts, starts + coverage_set.stepsize, c[bins])
+
+    def close(self):
+        """Add the remaining intervals and close the file."""
+        if self._file is None:
+            return
+        self._flush()
+        self._file.close()
+        self._file = None
+
+    def _flush(self):
+        if not self._intervals:
+            return
+        starts, ends, values = [np.concatenate(column) for column in zip(*self._intervals)]
+        self._intervals = []
+        order = np.argsort(starts, kind="mergesort")
+        starts, ends, values = starts[order], ends[order], values[order]
+        # bigWig intervals must not overlap and must lie within the chromosome
+        ends = np.minimum(ends, self.chrom_sizes[self._chrom])
+        if len(ends) > 1:
+            starts[1:] = np.maximum(starts[1:], np.maximum.accumulate(ends)[:-1])
+        keep = starts < ends
+        if keep.any():
+            self._file.addEntries([self._chrom] * int(keep.sum()), starts[keep], ends=ends[keep], values=values[keep])
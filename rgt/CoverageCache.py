@@ -0,0 +1,188 @@
+"""
+CoverageCache
+===================
+CoverageCache keeps the coverage computed by CoverageSet.coverage_from_bam
+in a cache directory under the RGT data folder, so that the coverage of the
+same regions with the same parameters is loaded from disk instead of
+decoding the BAM file again. Entries are per chromosome and keyed by the
+state (path, size, modification time) of the BAM file and its index, the
+coverage parameters and the regions of the chromosome.
+
+Every entry is a directory with the NumPy arrays of the chromosome
+(coverage.npy, and strand.npy and sense.npy if requested) and meta.json.
+When the cache grows beyond its size budget, the least recently used
+entries are removed.
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import ConfigParser
+from collections import OrderedDict
+import numpy as np
+# Internal
+from rgt.Util import CacheData
+
+FORMAT_VERSION = 1
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class CoverageCache:
+    """*Keyword arguments:*
+
+        - cache_dir -- directory of the cache (default: coverage/ in the [Cache] path of data.config).
+        - max_size -- size budget of the cache in bytes (default: [Cache] max_size of data.config, or 10 GB).
+        - min_file_size -- BAM files smaller than this (in bytes) are not cached by coverage_cache() unless it is forced
+          (default: [Cache] min_file_size of data.config, or 10 MB).
+    """
+
+    def __init__(self, cache_dir=None, max_size=None, min_file_size=None):
+        if cache_dir is None or max_size is None or min_file_size is None:
+            config = CacheData()
+            if cache_dir is None:
+                cache_dir = os.path.join(config.get_cache_dir(), "coverage")
+            if max_size is None:
+                max_size = config.get_max_size()
+            if min_file_size is None:
+                min_file_size = config.get_min_file_size()
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.min_file_size = min_file_size
+
+    def entries(self, bam_file, regions, parameters, mask_file=None):
+        """Return the entry directory and the region indices of each chromosome, as OrderedDict chrom -> (path,
+        indices).
+
+        *Keyword arguments:*
+
+            - bam_file -- path to the BAM file.
+            - regions -- list of GenomicRegions.
+            - parameters -- tuple of the parameters the coverage depends on.
+            - mask_file -- path to the mask file used, if any.
+        """
+        index = bam_file + ".bai" if os.path.exists(bam_file + ".bai") else os.path.splitext(bam_file)[0] + ".bai"
+        state = (FORMAT_VERSION, _file_state(bam_file), _file_state(index), parameters,
+                 _file_state(mask_file) if mask_file is not None else None)
+        chroms = OrderedDict()
+        for i, r in enumerate(regions):
+            chroms.setdefault(r.chrom, []).append(i)
+        result = OrderedDict()
+        for chrom, indices in chroms.items():
+            key = repr((state, chrom,
+                        [(regions[i].initial, regions[i].final, regions[i].orientation) for i in indices]))
+            result[chrom] = (os.path.join(self.cache_dir, hashlib.sha1(key).hexdigest()), indices)
+        return result
+
+    def load(self, path):
+        """Return the arrays of an entry (memory mapped) and its meta data as (dict, dict), or None if there is no
+        valid entry."""
+        if not os.path.isdir(path):
+            return None
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if meta["version"] != FORMAT_VERSION:
+                return None
+            arrays = dict((name, np.load(os.path.join(path, name + ".npy"), mmap_mode="r")) for name in meta["arrays"])
+            # the modification time of the entry marks its last use
+            os.utime(path, None)
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        return arrays, meta
+
+    def store(self, path, arrays, meta):
+        """Store the arrays (dict name -> NumPy array) and meta data (dict) of an entry and remove the least recently
+        used entries if the cache exceeds its size budget."""
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # Write into a temporary directory first, so that no half written entry is ever seen
+        temp = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp")
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(temp, name + ".npy"), array)
+            meta = dict(meta, version=FORMAT_VERSION, arrays=sorted(arrays))
+            with open(os.path.join(temp, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            os.rename(temp, path)
+        except (IOError, OSError):
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits into its size budget."""
+        evict_entries(self.cache_dir, self.max_size)
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def coverage_cache(bam_file, cache=None):
+    """Return the CoverageCache to use for a BAM file, or None if the cache is not used.
+
+    *Keyword arguments:*
+
+        - bam_file -- path to the BAM file.
+        - cache -- CoverageCache; True: always use the default cache; False: never; None: for BAM files of at least
+          min_file_size, if the cache is configured and usable.
+    """
+    if cache is False or cache is None and not os.path.exists(bam_file):
+        return None
+    if isinstance(cache, CoverageCache):
+        return cache
+    try:
+        default = CoverageCache()
+    except (IOError, OSError, ConfigParser.Error):
+        if cache:
+            raise
+        return None
+    if cache or os.path.getsize(bam_file) >= default.min_file_size:
+        return default
+    return None
+
+
+def evict_entries(cache_dir, max_size):
+    """Remove the least recently used entry directories of a cache directory until they fit into max_size bytes. The
+    modification time of an entry marks its last use.
+
+    *Keyword arguments:*
+
+        - cache_dir -- directory of the cache.
+        - max_size -- size budget in bytes.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(".tmp") or not os.path.isdir(path):
+            continue
+        try:
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+        except OSError:
+            continue
+    total = sum(e[1] for e in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def _file_state(filename):
+    if not os.path.exists(filename):
+        return None
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime
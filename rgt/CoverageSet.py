@@ -9,7 +9,14 @@ from __future__ import print_function
 import os
 import sys
 import pysam
+import multiprocessing
 import numpy as np
+from itertools import izip
+from collections import OrderedDict
+from rgt.BedReader import BedReader
+from rgt.BedWriter import BedWriter, string_column
+from rgt.BigWigWriter import BigWigWriter
+from rgt.CoverageCache import coverage_cache
 
 
 class CoverageSet:
@@ -50,7 +57,7 @@ class CoverageSet:
                 j = cs_chroms.index(c)
                 assert len(self.coverage[i]) == len(cs.coverage[j])
                 self.coverage[i] -= cs.coverage[j]
-                self.coverage[i] = self.coverage[i].clip(0, max(max(self.coverage[i]), 0)) #neg. values to 0
+                np.maximum(self.coverage[i], 0, out=self.coverage[i]) #neg. values to 0
             except ValueError:
                 pass
             i += 1
@@ -86,7 +93,8 @@ class CoverageSet:
         
         """
         for i in range(len(self.coverage)):
-            self.coverage[i] = np.rint(self.coverage[i] * float(factor)).astype(int)
+            # rounded in place, so that the regions stay views of <overall_cov>
+            self.coverage[i][:] = np.rint(self.coverage[i] * float(factor))
 
     def normRPM(self):
         """Normalize to read per million (RPM)."""
@@ -104,49 +112,42 @@ class CoverageSet:
             pass
 
 
-    def write_bed(self, filename, zero=False):
+    def write_bed(self, filename, zero=False, compress=None, index=False):
         """Output coverage in BED format. 
         
         *Keyword arguments:*
         
         - filename -- filepath
         - zero -- boolean
+        - compress -- compress the file with bgzip (default: if the filename ends with .gz)
+        - index -- compress the file and create a tabix index; the regions must be sorted
         
         .. note:: If zero=True, coverage of zero is output as well. This may cause large output files!
         
         """
-        
-        with open(filename, 'w') as f:
-            i = 0
-            for region in self.genomicRegions:
-                c = self.coverage[i]
-                i += 1
-                for j in range(len(c)):
-                    if zero:
-                        print(region.chrom, j * self.stepsize + ((self.binsize-self.stepsize)/2) + region.initial, \
-                              j * self.stepsize + ((self.binsize+self.stepsize)/2) + region.initial, c[j], sep='\t', file=f)
-                    else:
-                        if c[j] != 0:
-                            print(region.chrom, j * self.stepsize + ((self.binsize-self.stepsize)/2) + region.initial, \
-                                  j * self.stepsize + ((self.binsize+self.stepsize)/2) + region.initial, c[j], sep='\t', file=f)
-                        
-    def write_wig(self, filename):
+        with BedWriter(filename, compress=compress, index=index) as f:
+            for region, c in zip(self.genomicRegions, self.coverage):
+                c = np.asarray(c)
+                bins = np.arange(len(c)) if zero else np.flatnonzero(c)
+                starts = bins * self.stepsize + ((self.binsize-self.stepsize)/2) + region.initial
+                ends = bins * self.stepsize + ((self.binsize+self.stepsize)/2) + region.initial
+                f.write_columns([region.chrom] * len(bins), starts, ends, c[bins])
+
+    def write_wig(self, filename, compress=False):
         """Output coverage in wig format. 
         
         *Keyword arguments:*
         
         - filename -- filepath        
+        - compress -- compress the file with bgzip
         """
-        f = open(filename, 'w')
-        i = 0
-        for region in self.genomicRegions:
-            print('variableStep chrom=' + str(region.chrom) + ' span=' +str(self.stepsize), file=f)
-            c = self.coverage[i]
-            i += 1
-            for j in range(len(c)):
-                if c[j] != 0:
-                    print(j * self.stepsize + ((self.binsize-self.stepsize)/2), c[j], file=f)
-        f.close()
+        with BedWriter(filename, compress=compress) as f:
+            for region, c in zip(self.genomicRegions, self.coverage):
+                f.write_line('variableStep chrom=' + str(region.chrom) + ' span=' + str(self.stepsize))
+                c = np.asarray(c)
+                bins = np.flatnonzero(c)
+                positions = string_column(bins * self.stepsize + ((self.binsize-self.stepsize)/2))
+                f.write_lines([p + " " + v for p, v in zip(positions, string_column(c[bins]))])
     
     def write_bigwig(self, filename, chrom_file, end=True, save_wig=False):
         """Output coverage in bigwig format. 
@@ -166,15 +167,11 @@ class CoverageSet:
         .. note:: The <save_wig> option may cause large output files 
         
         """
-
-        tmp_path = filename + '.wig'
-        self.write_wig(tmp_path)
-        t = ['wigToBigWig', "-clip", tmp_path, chrom_file, filename]
-        c = " ".join(t)
-        os.system(c)
-
-        if not save_wig:
-            os.remove(tmp_path)
+        if save_wig:
+            self.write_wig(filename + '.wig')
+        chroms = OrderedDict((r.chrom, None) for r in self.genomicRegions)
+        with BigWigWriter(filename, chrom_file, chroms=chroms.keys()) as f:
+            f.write_coverage(self)
     
     def _init_read_number(self, bamFile):
         """Compute number of reads and number of mapped reads for CoverageSet"""
@@ -194,7 +191,7 @@ class CoverageSet:
         #     self.reads = None
         #     self.mapped_reads = None
     
-    def coverage_from_genomicset(self, bamFile, readSize=200, strand_specific=False):
+    def coverage_from_genomicset(self, bamFile, readSize=200, strand_specific=False, stream=True):
 
         """Compute coverage based on the class variable <genomicRegions>. 
         
@@ -205,6 +202,7 @@ class CoverageSet:
         - bamFile -- path to bam file
         - readSize -- used read size
         - strand_specific -- calculate the coverage from the reads with the same orientation with the region
+        - stream -- read neighbouring regions of a chromosome in one pass through the BAM file (see fetch_windows)
         
         *Output:*
         
@@ -217,17 +215,15 @@ class CoverageSet:
         self._init_read_number(bamFile)
         
         cov=[0]*len(self.genomicRegions)
-        for i,region in enumerate(self.genomicRegions):
+        windows = [(r.chrom, max(0, r.initial-readSize), r.final+readSize) for r in self.genomicRegions]
+        for i, (region, reads) in enumerate(izip(self.genomicRegions, fetch_windows(bam, windows, stream))):
             
             try:
-                bin_start = max(0, region.initial-readSize)
-                bin_end = region.final+readSize
-
                 if not strand_specific:
-                    for r in bam.fetch(region.chrom,bin_start,bin_end):
+                    for r in reads:
                         cov[i] += 1
                 else:
-                    for r in bam.fetch(region.chrom,bin_start,bin_end):
+                    for r in reads:
                         # print(region.orientation)
                         # print(r.is_reverse)
                         if region.orientation == "+" and not r.is_reverse: cov[i] += 1
@@ -239,18 +235,9 @@ class CoverageSet:
         self.coverage = cov 
         self.coverageOrig = cov
 
-    def _get_bedinfo(self, l):
-        if len(l) > 1:
-            l.strip()
-            l = l.split('\t')
-            return l[0], int(l[1]), int(l[2]), True
-        else:
-            return -1, -1, -1, False
-
-    
     def coverage_from_bam(self, bam_file, extension_size=200, binsize=100, stepsize=50, rmdup=False,
                           maxdup=None, mask_file=None, paired_reads=False,
-                          get_strand_info=False, get_sense_info=False, no_gaps=False):
+                          get_strand_info=False, get_sense_info=False, no_gaps=False, stream=True, cache=None):
         """Compute coverage based on GenomicRegionSet. 
         
         Iterate over each GenomicRegion in class variable genomicRegions (GenomicRegionSet). The GenomicRegion is divided into consecutive bins with lenth <binsize>.
@@ -266,13 +253,15 @@ class CoverageSet:
         - maxdup -- define the maximum count for the dupliacted reads (0: remove all;-1:no limit)
         - mask_file -- ignore region described in <mask_file> (tab-separated: chrom, start, end)
         - get_strand_info -- compute strand information for each bin
+        - stream -- read neighbouring regions of a chromosome in one pass through the BAM file (see fetch_windows)
+        - cache -- CoverageCache; True: always load and store the coverage of each chromosome in the default cache; False: never; None: for BAM files of at least the minimum cache file size (see rgt.CoverageCache)
         
         
         *Output:*
         
         - Class variable <coverage>: a list of lists: the elements correspond a GenomicRegion. This list gives the coverage of each bin.
-        - Class variable <overall_cov>: a list: concatenation of class variable <coverage>.
-        - If option <get_strand_info> is set, a numpy array class variable  <cov_strand_all> of tuples. The tuples give the number of forward and backward reads for each bin.
+        - Class variable <overall_cov>: a numpy array (COVERAGE_DTYPE): concatenation of class variable <coverage>; the elements of <coverage> are views of it.
+        - If option <get_strand_info> is set, a list class variable <cov_strand_all> of numpy arrays (bins x 2). They give the number of forward and backward reads for each bin and are views of the (2 x bins) array <overall_strand>.
         
         *Example:*
         
@@ -308,50 +297,49 @@ class CoverageSet:
 
         if len(self.genomicRegions) == 0:
             return
-        log_aver = False
         self.binsize = binsize
         self.stepsize = stepsize
-        self.coverage = []
+        lengths = [len(r) // stepsize for r in self.genomicRegions]
+        self._allocate(lengths, strand=get_strand_info, sense=get_sense_info)
+        self._init_read_number(bam_file)
+        
+        #load the chromosomes computed before with the same parameters
+        regions = self.genomicRegions.sequences
+        todo = range(len(regions))
+        cache = coverage_cache(bam_file, cache)
+        if cache is not None:
+            entries = cache.entries(bam_file, regions, (extension_size, binsize, stepsize, rmdup, maxdup, paired_reads,
+                                                        get_strand_info, get_sense_info, no_gaps), mask_file)
+            todo = []
+            for chrom, (path, indices) in entries.items():
+                if not self._load_cached(cache.load(path), indices, get_strand_info, get_sense_info):
+                    todo += indices
+            todo.sort()
+            if not todo:
+                self.coverageorig = self.coverage[:]
+                return
         
         bam = pysam.Samfile(bam_file, "rb" )
         
         for read in bam.fetch():
             fragment_size = read.rlen + extension_size
             break
-
-        self._init_read_number(bam_file)
         
         #check whether one should mask
-        next_it = True
         if mask_file is not None and os.path.exists(mask_file):
-            mask = True
-            f = open(mask_file, 'r')
-            c_help, s_help, e_help = self.genomicRegions.sequences[0].chrom, -1, -1
+            mask = read_mask(mask_file)
         else:
-            mask = False
+            mask = {}
         
-        chrom_regions = [r.chrom for r in self.genomicRegions.sequences] #chroms by regions
-        
-        if get_strand_info:
-            self.cov_strand_all = []
-        if get_sense_info:
-            self.cov_sense_all = []
-        
-        for region in self.genomicRegions:
-            cov = [0] * (len(region) / stepsize)
-            
-            if get_strand_info:
-                cov_strand = [[0,0]] * (len(region) / stepsize)
-                strand_info = {}
-            if get_sense_info:
-                cov_sense = [[0,0]] * (len(region) / stepsize)
-                sense_info = {}
-            
-            positions = []
+        windows = [(regions[i].chrom, max(0, regions[i].initial-fragment_size), regions[i].final+fragment_size)
+                   for i in todo]
+        for i, reads in izip(todo, fetch_windows(bam, windows, stream)):
+            region = regions[i]
+            positions, helps, reverse, read1 = [], [], [], []
             j = 0
             read_length = -1
             try:
-                for read in bam.fetch(region.chrom, max(0, region.initial-fragment_size), region.final+fragment_size):
+                for read in reads:
                     if len(read.get_blocks()) > 1 and no_gaps: continue # ignore sliced reads
                     j += 1
                     read_length = read.rlen
@@ -373,136 +361,121 @@ class CoverageSet:
                                     if blocks[b_ind][1] <= read.pos < blocks[b_ind+1][0]:
                                         within_gap = True
 
-                        #if position in mask region, then ignore
-                        if mask:
-                            while next_it and c_help not in chrom_regions: #do not consider this deadzone
-                                c_help, s_help, e_help, next_it = self._get_bedinfo(f.readline())
-                            # deadzones behind, go further
-                            if c_help != -1 and chrom_regions.index(region.chrom) >= chrom_regions.index(c_help):
-                                while next_it and c_help != region.chrom: #get right chromosome
-                                    c_help, s_help, e_help, next_it = self._get_bedinfo(f.readline())
-                            while next_it and e_help <= pos_help and c_help == region.chrom: #check right position
-                                c_help, s_help, e_help, next_it = self._get_bedinfo(f.readline())
-                            if next_it and s_help <= pos_help and c_help == region.chrom:
-                                continue #pos in mask region
                         if within_gap: continue
-                        else: positions.append(pos)
-
-                        if get_strand_info:
-                            if pos not in strand_info:
-                                strand_info[pos] = (1,0) if not read.is_reverse else (0,1)
-                        if get_sense_info:
-                            if pos not in sense_info:
-                                if paired_reads and not read.is_read1:
-                                    continue
-                                else:
-                                    if region.orientation == "+":
-                                        sense_info[pos] = (1,0) if read.is_reverse else (0,1)
-                                    elif region.orientation == "-":
-                                        sense_info[pos] = (1,0) if not read.is_reverse else (0,1)
+                        else:
+                            positions.append(pos)
+                            helps.append(pos_help)
+                            reverse.append(read.is_reverse)
+                            read1.append(read.is_read1)
             except ValueError as e:
                 print("warning: {}".format(e))
                 pass
 
+            positions = np.array(positions, dtype=np.int64)
+            reverse = np.array(reverse, dtype=bool)
+            read1 = np.array(read1, dtype=bool)
+            #if position in mask region, then ignore
+            if region.chrom in mask:
+                keep = ~_masked(mask[region.chrom], np.array(helps, dtype=np.int64))
+                positions, reverse, read1 = positions[keep], reverse[keep], read1[keep]
+
             # if maxdup == -1: # No limit
             # elif maxdup == 0: # Remove all duplicates
             # else: # 
 
-            if rmdup:
-                positions = list(set(positions))
-                
-            positions.sort()
-            positions.reverse()
-            i = 0
-            while positions:
-                win_s = max(0, i * stepsize - binsize*0.5) + region.initial
-                win_e = i * stepsize + binsize*0.5 + region.initial 
-                c = 0
-                if get_strand_info:
-                    sum_strand_info = [0,0]
-                if get_sense_info:
-                    sum_sense_info = [0,0]
-                
-                taken = []
-                while True:
-                    s = positions.pop()
-                    
-                    taken.append(s)
-                    if s < win_e: #read within window
-                        c += 1
-                        if get_strand_info:
-                            sum_strand_info[0] += strand_info[s][0]
-                            sum_strand_info[1] += strand_info[s][1]
-                        if get_sense_info:
-                            try:
-                                sum_sense_info[0] += sense_info[s][0]
-                                sum_sense_info[1] += sense_info[s][1]
-                            except:
-                                pass
-                    if s >= win_e or not positions:
-                        taken.reverse()
-                        for s in taken:
-                            if s + extension_size + read_length >= win_s: #consider read in next iteration
-                                positions.append(s)
-                            else:
-                                break #as taken decreases monotonously
-                        taken = []
-                        break
-                if i < len(cov):
-                    cov[i] = c
-                    if get_strand_info:
-                        cov_strand[i] = sum_strand_info
-                    if get_sense_info:
-                        cov_sense[i] = sum_sense_info
-                i += 1
-
-            if not log_aver:
-                self.coverage.append(np.array(cov))
-            else:
-                cov = [x + 1 for x in cov]
-                self.coverage.append(np.log(np.array(cov)))
-
+            # the sorted positions refer to the distinct positions by <select>; the strand (sense) of a position is
+            # the one of its first read
+            unique, index, inverse = np.unique(positions, return_index=True, return_inverse=True)
+            select = np.arange(len(unique)) if rmdup else np.sort(inverse)
             if get_strand_info:
-                self.cov_strand_all.append(np.array(cov_strand))
+                forward = ~reverse[index][select]
             if get_sense_info:
-                self.cov_sense_all.append(np.array(cov_sense))
-            # print(np.array(cov_sense))
+                # with paired reads only the first mates count
+                sense, antisense = _sense_flags(positions, unique, reverse, read1 if paired_reads else
+                                                np.ones(len(positions), dtype=bool), region.orientation)
+                sense, antisense = sense[select], antisense[select]
+            positions = unique[select]
+
+            n = lengths[i]
+            if n:
+                # the counts are written into the preallocated views
+                first, last = _window_ranges(positions, n, region.initial, binsize, stepsize,
+                                             extension_size + read_length)
+                np.subtract(last, first, out=self.coverage[i], casting="unsafe")
+                if get_strand_info:
+                    self.cov_strand_all[i][:, 0] = _window_counts(forward, first, last)
+                    np.subtract(self.coverage[i], self.cov_strand_all[i][:, 0], out=self.cov_strand_all[i][:, 1])
+                if get_sense_info:
+                    self.cov_sense_all[i][:, 0] = _window_counts(sense, first, last)
+                    self.cov_sense_all[i][:, 1] = _window_counts(antisense, first, last)
             
         self.coverageorig = self.coverage[:]
-        self.overall_cov = reduce(lambda x,y: np.concatenate((x,y)), [self.coverage[i] for i in range(len(self.genomicRegions))])
-        if mask: f.close()
-
+        
+        if cache is not None:
+            computed = set(regions[i].chrom for i in todo)
+            for chrom, (path, indices) in entries.items():
+                if chrom in computed:
+                    self._store_cached(cache, path, indices, bam_file, get_strand_info, get_sense_info)
+
+    def _load_cached(self, entry, indices, strand, sense):
+        """Copy the arrays of a CoverageCache entry into the coverage of the regions <indices>; return False if
+        there is no entry."""
+        if entry is None:
+            return False
+        arrays, meta = entry
+        views = [("coverage", self.coverage, False)]
+        if strand:
+            views.append(("strand", self.cov_strand_all, True))
+        if sense:
+            views.append(("sense", self.cov_sense_all, True))
+        start = 0
+        for i in indices:
+            end = start + len(self.coverage[i])
+            for name, column, transposed in views:
+                column[i][:] = arrays[name][:, start:end].T if transposed else arrays[name][start:end]
+            start = end
+        return True
+
+    def _store_cached(self, cache, path, indices, bam_file, strand, sense):
+        """Store the coverage of the regions <indices> (one chromosome) as CoverageCache entry."""
+        arrays = {"coverage": np.concatenate([self.coverage[i] for i in indices])}
+        if strand:
+            arrays["strand"] = np.concatenate([self.cov_strand_all[i].T for i in indices], axis=1)
+        if sense:
+            arrays["sense"] = np.concatenate([self.cov_sense_all[i].T for i in indices], axis=1)
+        chrom = self.genomicRegions.sequences[indices[0]].chrom
+        try:
+            cache.store(path, arrays, {"bam": os.path.abspath(bam_file), "chrom": chrom})
+        except (IOError, OSError):
+            print("Cannot write the coverage cache of", bam_file)
+
+
+    def _allocate(self, lengths, strand=False, sense=False):
+        """Allocate the coverage of regions with <lengths> bins as views of one contiguous array <overall_cov>; the
+        strand (sense) counts are views (bins x 2) of one array <overall_strand> (<overall_sense>) of shape (2, bins)."""
+        bounds = np.cumsum([0] + lengths).tolist()
+        slices = [slice(s, e) for s, e in zip(bounds[:-1], bounds[1:])]
+        self.overall_cov = np.zeros(bounds[-1], dtype=COVERAGE_DTYPE)
+        self.coverage = [self.overall_cov[s] for s in slices]
+        if strand:
+            self.overall_strand = np.zeros((2, bounds[-1]), dtype=COVERAGE_DTYPE)
+            self.cov_strand_all = [self.overall_strand[:, s].T for s in slices]
+        if sense:
+            self.overall_sense = np.zeros((2, bounds[-1]), dtype=COVERAGE_DTYPE)
+            self.cov_sense_all = [self.overall_sense[:, s].T for s in slices]
 
     def array_transpose(self, flip=False):
-        """Transpose the arrays in strand coverage"""
-        self.transpose_cov1 = []
-        self.transpose_cov2 = []
-        # print(self.coverage)
-        for a in self.cov_sense_all:
-            if flip:
-                # print(a[:, 0])
-                # print(a[:, 1])
-                a1 = np.transpose(a[:, 0])
-                a1.shape = (a1.shape[0],1)
-                self.transpose_cov1.append(np.fliplr(a1))
-                a2 = np.transpose(a[:, 0])
-                a2.shape = (a2.shape[0], 1)
-                self.transpose_cov2.append(np.fliplr(a2))
-            else:
-                # print(a[:, 0])
-                # print(a[:, 1])
-                a1 = np.transpose(a[:, 0])
-                a1.shape = (a1.shape[0], 1)
-                self.transpose_cov1.append(a1)
-                a2 = np.transpose(a[:, 1])
-                a2.shape = (a2.shape[0], 1)
-                self.transpose_cov2.append(a2)
-        self.transpose_cov1 = np.array(self.transpose_cov1)
-        self.transpose_cov2 = np.array(self.transpose_cov2)
-        # print(self.transpose_cov1)
-        # print(self.transpose_cov2)
-
-
+        """Give the sense (antisense) coverage as class variable <transpose_cov1> (<transpose_cov2>): an array (regions
+        x bins x 1); with <flip>, both are the sense coverage. If all regions have the same number of bins, these are
+        views of <overall_sense>."""
+        lengths = set(len(a) for a in self.cov_sense_all)
+        if len(lengths) == 1:
+            n = lengths.pop()
+            self.transpose_cov1 = self.overall_sense[0].reshape(-1, n, 1)
+            self.transpose_cov2 = self.overall_sense[0 if flip else 1].reshape(-1, n, 1)
+        else:
+            self.transpose_cov1 = np.array([a[:, 0].reshape(-1, 1) for a in self.cov_sense_all])
+            self.transpose_cov2 = np.array([a[:, 0 if flip else 1].reshape(-1, 1) for a in self.cov_sense_all])
 
     def index2coordinates(self, index, regions):
         """Convert index of class variable <overall_cov> to genomic coordinates.
@@ -579,16 +552,7 @@ class CoverageSet:
             bwf.close()
 
         except ImportError, e:
-            import pyBigWig
-            self.coverage = []
-            bwf = pyBigWig.open(bigwig_file)
-
-            for gr in self.genomicRegions:
-                steps = int(len(gr) / stepsize)
-                ds = bwf.stats(gr.chrom, gr.initial, gr.final, type="mean", nBins=steps)
-                ds = [ x if x else 0 for x in ds ]
-                self.coverage.append( np.array(ds) )
-            bwf.close()
+            self.coverage = bigwig_bins(bigwig_file, self.genomicRegions.sequences, stepsize)
 
     def phastCons46way_score(self, stepsize=100):
         """Load the phastCons46way bigwig files to fetch the scores as coverage.
@@ -597,14 +561,17 @@ class CoverageSet:
         
         - stepsize -- used stepsize
         """
-        self.coverage = []
         phastCons46way_dir = "/data/phastCons46way/"
-        grs = self.genomicRegions.split_by_chromosome()
-        for gr in grs:
-            cov = CoverageSet("chrom",gr)
-            bwpath = os.path.join(phastCons46way_dir, gr.sequences[0].chrom+".phastCons46way.bw")
-            cov.coverage_from_bigwig(bigwig_file=bwpath,stepsize=stepsize)
-            self.coverage += cov.coverage
+        regions = self.genomicRegions.sequences
+        chroms = OrderedDict()
+        for i, r in enumerate(regions):
+            chroms.setdefault(r.chrom, []).append(i)
+        #one file per chromosome; the coverage keeps the order of the regions
+        self.coverage = [None] * len(regions)
+        for chrom, indices in chroms.items():
+            bwpath = os.path.join(phastCons46way_dir, chrom+".phastCons46way.bw")
+            for i, c in zip(indices, bigwig_bins(bwpath, [regions[i] for i in indices], stepsize)):
+                self.coverage[i] = c
 
     def count_unique_reads(self, bamFile):
         """Count the number of unique reads on for class variable <genomicRegions>.
@@ -622,8 +589,9 @@ class CoverageSet:
         bam = pysam.Samfile(bamFile, "rb" )
 
         reads = []
-        for i,region in enumerate(self.genomicRegions):
-            for r in bam.fetch(region.chrom,region.initial,region.final):
+        windows = [(region.chrom, region.initial, region.final) for region in self.genomicRegions]
+        for region_reads in fetch_windows(bam, windows):
+            for r in region_reads:
                 reads.append(r.qname)
 
         reads = list(set(reads))
@@ -632,88 +600,386 @@ class CoverageSet:
 
 
     def norm_gc_content(self, cov, genome_path, chrom_sizes):
-        chrom_sizes_dict = {}
+        """Normalize the coverage by the GC content of its bins; the GC bias is estimated from the coverage <cov> (of
+        the same regions), as get_gc_context does. <chrom_sizes> is not used any more."""
+        gc_cov, gc_avg, _ = get_gc_context(self.stepsize, self.binsize, genome_path, cov, self.genomicRegions)
+        gc = np.concatenate(gc_cov)
+        gc[gc < 1e-300] = gc_avg  # sometimes zeros occur, do not consider
+        coverage = np.concatenate([np.asarray(c) for c in self.coverage])
+        assert len(coverage) == len(gc)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            coverage = np.maximum(coverage * gc_avg / gc, 0).astype(int)  # neg. values to 0
+        # written back in place, so that the regions stay views of <overall_cov>
+        bounds = np.cumsum([0] + [len(c) for c in self.coverage])
+        for c, first, last in zip(self.coverage, bounds[:-1], bounds[1:]):
+            c[:] = coverage[first:last]
+
+
+def gc_percent(stepsize, binsize, genome_path, regions, lengths):
+    """Return the GC content (in percent, rounded down) of the bins of the regions as one array; bins which lie
+    beyond the end of their chromosome are -1. Bin i of a region covers the bases initial + i * stepsize to
+    initial + i * stepsize + binsize (inclusive).
+
+    *Keyword arguments:*
+
+        - stepsize -- step size of the bins.
+        - binsize -- size of the bins.
+        - genome_path -- path to the genome FASTA file; its GC track (see GCTrack) is built once and cached.
+        - regions -- GenomicRegionSet or list of GenomicRegions.
+        - lengths -- number of bins of each region.
+    """
+    from rgt.GCTrack import gc_track
+    track = gc_track(genome_path)
+    result = np.empty(sum(lengths), dtype=np.int64)
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    for r, first, last in zip(regions, bounds[:-1], bounds[1:]):
+        starts = r.initial + np.arange(last - first, dtype=np.int64) * stepsize
+        gc, length = track.gc_counts(r.chrom, starts, starts + binsize + 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[first:last] = np.where(length > 0, (gc / length.astype(float) * 100).astype(np.int64), -1)
+    return result
+
+
+def get_gc_context(stepsize, binsize, genome_path, cov_list, regions, gc=None):
+    """Return the GC bias of a coverage: for every bin the mean coverage of all bins with its GC content (as list of
+    arrays, one per region), the average of the histogram and the histogram (mean coverage per GC percent 0..100).
+    Bins beyond the end of their chromosome are not counted and get the value of GC percent 0.
+
+    *Keyword arguments:*
+
+        - stepsize -- step size of the bins.
+        - binsize -- size of the bins.
+        - genome_path -- path to the genome FASTA file.
+        - cov_list -- coverage of the regions (list of arrays).
+        - regions -- GenomicRegionSet or list of GenomicRegions of the coverage.
+        - gc -- GC content of the bins as gc_percent returns it (default: computed from the genome).
+    """
+    lengths = [len(c) for c in cov_list]
+    if gc is None:
+        gc = gc_percent(stepsize, binsize, genome_path, regions, lengths)
+    cov = np.concatenate([np.asarray(c, dtype=float) for c in cov_list]) if cov_list else np.zeros(0)
+    valid = gc >= 0
+    counts = np.bincount(gc[valid], minlength=101)
+    sums = np.bincount(gc[valid], weights=np.round(cov[valid], 2), minlength=101)
+    hist = np.where(counts > 0, sums / np.maximum(counts, 1), 0.)
+    return np.split(hist[np.maximum(gc, 0)], np.cumsum(lengths)[:-1]), hist.mean(), hist.tolist()
 
-        with open(chrom_sizes) as f:
-            for line in f:
-                line = line.strip()
-                line = line.split('\t')
-                c, e = line[0], int(line[1])
-                chrom_sizes_dict[c] = e
 
-        gc_cov, gc_avg, _ = get_gc_context(self.stepsize, self.binsize, genome_path, cov, chrom_sizes_dict)
+def coverage_matrix(rows):
+    """Return the coverage of several samples as one array with a row per sample. The region arrays of each row are
+    copied into the preallocated array, without concatenating them pairwise.
 
-        import warnings  # todo: ugly, why do warnings occur?
-        warnings.filterwarnings("ignore")
+    *Keyword arguments:*
+
+        - rows -- list of lists of numpy arrays (for instance CoverageSet.coverage); all rows have the same number of
+          bins.
+    """
+    rows = [[np.asarray(a) for a in row] for row in rows]
+    dtypes = set(a.dtype for row in rows for a in row)
+    matrix = np.empty((len(rows), sum(len(a) for a in rows[0]) if rows else 0),
+                      dtype=np.result_type(*dtypes) if dtypes else COVERAGE_DTYPE)
+    for k, row in enumerate(rows):
+        start = 0
+        for a in row:
+            matrix[k, start:start + len(a)] = a
+            start += len(a)
+        assert start == matrix.shape[1]
+    return matrix
+
+
+def read_mask(mask_file):
+    """Return the intervals of a mask file (BED) per chromosome, as dictionary chrom -> (starts, ends) of sorted
+    and merged intervals."""
+    columns = {}
+    for chroms, initials, finals in (c[:3] for c in BedReader(mask_file).chunks()):
+        chroms = np.array(chroms)
+        for chrom in np.unique(chroms).tolist():
+            selected = chroms == chrom
+            columns.setdefault(chrom, []).append((initials[selected], finals[selected]))
+    mask = {}
+    for chrom, parts in columns.items():
+        starts = np.concatenate([p[0] for p in parts])
+        ends = np.concatenate([p[1] for p in parts])
+        order = np.argsort(starts, kind="mergesort")
+        starts, reach = starts[order], np.maximum.accumulate(ends[order])
+        # an interval starts a new merged interval if it begins behind all previous ones
+        new = np.flatnonzero(np.concatenate(([True], starts[1:] > reach[:-1])))
+        mask[chrom] = (starts[new], reach[np.concatenate((new[1:] - 1, [len(starts) - 1]))])
+    return mask
+
+
+def _masked(intervals, positions):
+    """Return a boolean array telling which positions lie within the (sorted, merged) intervals (starts, ends)."""
+    starts, ends = intervals
+    i = np.searchsorted(starts, positions, side="right") - 1
+    return (i >= 0) & (positions < ends[np.maximum(i, 0)])
+
+
+def bigwig_bins(bigwig_file, regions, stepsize):
+    """Return the mean signal of a bigWig file in len(region) / stepsize bins of each region, as pyBigWig's stats
+    gives with exact=True (0 for bins without signal).
+
+    The regions are read by chromosome; neighbouring regions are read in one span of values, which is reduced to the
+    bins of all its regions at once.
+
+    *Keyword arguments:*
+
+        - bigwig_file -- path to the bigWig file.
+        - regions -- list of GenomicRegions.
+        - stepsize -- size of the bins.
+    """
+    bwf = _open_bigwig(bigwig_file)
+    sizes = bwf.chroms()
+    result = [None] * len(regions)
+    chroms = OrderedDict()
+    for i, r in enumerate(regions):
+        chroms.setdefault(r.chrom, []).append(i)
+    for chrom, indices in chroms.items():
+        indices.sort(key=lambda i: regions[i].initial)
+        span = []
+        for i in indices:
+            if span and (regions[i].initial - end > STREAM_GAP or
+                         max(end, regions[i].final) - regions[span[0]].initial > BIGWIG_SPAN):
+                _bigwig_span(bwf, chrom, sizes.get(chrom, 0), [regions[j] for j in span], stepsize, span, result)
+                span = []
+            end = max(end, regions[i].final) if span else regions[i].final
+            span.append(i)
+        _bigwig_span(bwf, chrom, sizes.get(chrom, 0), [regions[j] for j in span], stepsize, span, result)
+    return result
+
+
+def _bigwig_span(bwf, chrom, size, regions, stepsize, indices, result):
+    """Put the binned signal of regions which lie in one span of a chromosome into result[indices]."""
+    initials = np.array([r.initial for r in regions], dtype=np.int64)
+    lengths = np.array([r.final for r in regions], dtype=np.int64) - initials
+    # as pyBigWig, a region shorter than stepsize is one bin
+    steps = np.maximum(lengths // stepsize, 1)
+    start, end = initials.min(), (initials + lengths).max()
+    values = np.zeros(0)
+    if start < size:
+        values = bwf.values(chrom, int(start), int(min(end, size)), numpy=True)
+    covered = ~np.isnan(values)
+    sums = np.concatenate(([0.], np.cumsum(np.where(covered, values, 0), dtype=np.float64)))
+    counts = np.concatenate(([0], np.cumsum(covered)))
+    # the bins of all regions at once: bin k of a region spans lengths * k / steps to lengths * (k + 1) / steps
+    region = np.repeat(np.arange(len(regions)), steps)
+    k = np.arange(len(region)) - np.repeat(np.cumsum(steps) - steps, steps)
+    offset = initials[region] - start
+    first = np.minimum(offset + k * lengths[region] // steps[region], len(values))
+    last = np.minimum(offset + (k + 1) * lengths[region] // steps[region], len(values))
+    n = counts[last] - counts[first]
+    means = np.where(n > 0, (sums[last] - sums[first]) / np.maximum(n, 1), 0)
+    for i, m in zip(indices, np.split(means, np.cumsum(steps)[:-1])):
+        result[i] = m
+
+
+def _open_bigwig(filename):
+    """Return an open pyBigWig file; the last BIGWIG_HANDLES files (of this process) are kept open."""
+    import pyBigWig
+    key = (os.getpid(), os.path.abspath(filename), os.path.getmtime(filename) if os.path.exists(filename) else None)
+    bwf = _bigwig_handles.pop(key, None)
+    if bwf is None:
+        bwf = pyBigWig.open(filename)
+        if bwf is None:
+            raise IOError("Cannot open the bigWig file " + filename)
+        while len(_bigwig_handles) >= BIGWIG_HANDLES:
+            _bigwig_handles.popitem(last=False)[1].close()
+    _bigwig_handles[key] = bwf
+    return bwf
+
+
+def _window_ranges(positions, n, offset, binsize, stepsize, reach):
+    """Return for each of the n sliding windows the range first:last of the sorted read positions which are counted
+    in it, as two arrays.
+
+    Window i ends (exclusively) at i * stepsize + binsize / 2 + offset. A read is counted in window i if it starts
+    before the end of the window and reaches (with reach = extension size + read length) the start of the previous
+    window, max(0, (i - 1) * stepsize - binsize / 2) + offset; the first window counts every read before its end.
+    """
+    steps = np.arange(n) * stepsize
+    ends = steps + binsize * 0.5 + offset
+    lows = np.empty(n)
+    if n:
+        lows[0] = -np.inf
+        lows[1:] = np.maximum(0, steps[:-1] - binsize * 0.5) + offset - reach
+    first = np.searchsorted(positions, lows, side="left")
+    last = np.maximum(np.searchsorted(positions, ends, side="left"), first)
+    return first, last
+
+
+def _window_counts(flags, first, last):
+    """Return the number of set flags (boolean array) in flags[first:last] for every window as array."""
+    counts = np.zeros(len(flags) + 1, dtype=np.int64)
+    np.cumsum(flags, out=counts[1:])
+    return counts[last] - counts[first]
+
+
+def _sense_flags(positions, unique, reverse, eligible, orientation):
+    """Return two boolean arrays which flag the sorted distinct read positions <unique> as sense and antisense to a
+    region of <orientation>. The strand of a position is the one of its first eligible read; <positions>, <reverse>
+    and <eligible> are given per read, in the order of the reads. Positions without eligible read are neither."""
+    reads = np.flatnonzero(eligible)
+    found, first = np.unique(positions[reads], return_index=True)
+    has = np.in1d(unique, found, assume_unique=True)
+    strand = np.zeros(len(unique), dtype=bool)
+    strand[has] = reverse[reads[first]]
+    if orientation == "+":
+        return has & strand, has & ~strand
+    if orientation == "-":
+        return has & ~strand, has & strand
+    return np.zeros(len(unique), dtype=bool), np.zeros(len(unique), dtype=bool)
+
+STREAM_GAP = 10000  # Largest gap between the windows of a chromosome which are read in one pass
+COVERAGE_DTYPE = np.int32  # Type of the window counts of coverage_from_bam
+BIGWIG_SPAN = 1000000  # Largest span of a chromosome which is read from a bigWig file at once
+BIGWIG_HANDLES = 8  # Number of bigWig files which are kept open
+_bigwig_handles = OrderedDict()
+
+
+def fetch_windows(bam, windows, stream=True):
+    """Yield for every window (chrom, start, end) the reads which bam.fetch(chrom, start, end) returns, in the same
+    order. Errors of fetch (e.g. for unknown chromosomes) are raised when the reads of the window are iterated.
+
+    With stream, consecutive windows of a chromosome are read with one fetch if their starts do not decrease and the
+    gaps between them are at most STREAM_GAP, so that the reads (and BGZF blocks) shared by overlapping or close
+    windows are decoded only once; the reads are assigned to the windows in a sweep. Sparse windows are fetched one
+    by one.
+
+    *Keyword arguments:*
+
+        - bam -- pysam.Samfile.
+        - windows -- list of (chrom, start, end).
+        - stream -- read runs of windows in one pass.
+    """
+    references = set(bam.references)
+    i = 0
+    while i < len(windows):
+        chrom, start, end = windows[i]
+        j = i + 1
+        if stream and chrom in references:
+            run_end = end
+            while j < len(windows) and windows[j][0] == chrom and \
+                    windows[j - 1][1] <= windows[j][1] <= run_end + STREAM_GAP:
+                run_end = max(run_end, windows[j][2])
+                j += 1
+        if j == i + 1:
+            yield _fetch(bam, chrom, start, end)
+        else:
+            for reads in _sweep(bam.fetch(chrom, start, run_end), windows[i:j]):
+                yield reads
+        i = j
+
+
+def _fetch(bam, chrom, start, end):
+    for read in bam.fetch(chrom, start, end):
+        yield read
+
+
+def _read_end(read):
+    """Return the end of a read as the BAM index sees it (at least one base, also for unmapped reads)."""
+    end = None if read.is_unmapped else read.reference_end
+    if end is None or end <= read.pos:
+        return read.pos + 1
+    return end
+
+
+def _sweep(reads, windows):
+    """Yield the lists of reads overlapping the windows; the windows are ordered by start, the reads by position."""
+    active = []
+    pending = None
+    reads = iter(reads)
+    for chrom, start, end in windows:
+        # Reads ending before this window cannot overlap the following ones either
+        active = [(r, e) for r, e in active if e > start]
+        while True:
+            if pending is None:
+                read = next(reads, None)
+                if read is None:
+                    break
+                pending = (read, _read_end(read))
+            if pending[0].pos >= end:
+                break
+            active.append(pending)
+            pending = None
+        yield [r for r, e in active if r.pos < end and e > start]
 
-        for i in range(len(self.coverage)):
-            assert len(self.coverage[i]) == len(gc_cov[i])
-            self.coverage[i] = np.array(self.coverage[i])
-            gc_cov[i] = np.array(gc_cov[i])
-            gc_cov[i][gc_cov[i] < 10 * -300] = gc_avg  # sometimes zeros occur, do not consider
-            self.coverage[i] = self.coverage[i] * gc_avg / gc_cov[i]
-            self.coverage[i] = self.coverage[i].clip(0, max(max(self.coverage[i]), 0))  # neg. values to 0
-            self.coverage[i] = self.coverage[i].astype(int)
-
-def get_gc_context(stepsize, binsize, genome_path, cov_list, chrom_sizes_dict):
-    """Get GC content"""
-    class help_content():
-        def __init__(self):
-            self.content = [[] for _ in range(101)]
-            self.g_gc = []
-            self.g = -1
-
-        def add(self, d, c):
-            self.content[int(c * 100)].append(round(float(d), 2))
-
-        def _compute(self):
-            for l in self.content:
-                r = sum(l) / float(len(l)) if len(l) > 0 else 0
-                self.g_gc.append(r)
-
-            self.g = sum(self.g_gc) / float(len(self.g_gc))
-
-        def _map(self, x):
-            return self.g_gc[x]
-
-    # chromosomes = []
-    # get first chromosome, typically chr1
-    # for s in FastaReader(genome_path):
-    #    chromosomes.append(s.name)
-    tmp = chrom_sizes_dict.keys()
-    # tmp = map(lambda x: x.replace('chr',''), chromosomes)
-    tmp.sort()
-    genome_fasta = pysam.Fastafile(genome_path)
-    genome = genome_fasta.fetch(reference=tmp[0])
-
-    content = help_content()
-    gc_content_cov = []
-
-    for cov in cov_list:
-        cur_gc_value = []
-
-        for i in range(len(cov)):
-            s = i * stepsize
-            e = i * stepsize + binsize
-            seq = genome[s: e + 1]
-            seq = seq.upper()
-            count = seq.count("C") + seq.count("G")
-            if len(seq) > 0:
-                gc_content = float(count) / len(seq)
-                # print(float(count), len(seq), float(count) / len(seq), cov[i], file=sys.stderr)
-                content.add(cov[i], gc_content)
-                cur_gc_value.append(int(gc_content * 100))
-            else:
-                #                print("Bins exceed genome (%s - %s), add pseudo counts" %(s, e), file=sys.stderr)
-                #                     content.add(cov[i], 0.5)
-                cur_gc_value.append(0)
 
-        gc_content_cov.append(cur_gc_value)
+def compute_coverages(jobs, workers=1):
+    """Compute the coverage of several CoverageSets with a pool of processes. The work is split by BAM file and
+    chromosome; the results are put together in the same structures (coverage, overall_cov, cov_strand_all, ...)
+    as the serial computation gives.
 
-    content._compute()
-    r = []
-    for l in gc_content_cov:
-        tmp = map(content._map, l)
-        r.append(tmp)
+    *Keyword arguments:*
 
-    return r, content.g, content.g_gc
\ No newline at end of file
+        - jobs -- list of (CoverageSet, method, keyword arguments), where method is "coverage_from_bam" or
+          "coverage_from_genomicset".
+        - workers -- number of processes; with 1, the jobs are computed one after another in this process.
+    """
+    if workers <= 1:
+        for cov, method, kwargs in jobs:
+            getattr(cov, method)(**kwargs)
+        return
+
+    tasks, shards = [], []
+    for k, (cov, method, kwargs) in enumerate(jobs):
+        regions = [(r.chrom, r.initial, r.final, r.orientation) for r in cov.genomicRegions]
+        if not regions:
+            getattr(cov, method)(**kwargs)
+            continue
+        by_chrom = OrderedDict()
+        for i, r in enumerate(regions):
+            by_chrom.setdefault(r[0], []).append(i)
+        for indices in by_chrom.values():
+            tasks.append((method, [regions[i] for i in indices], kwargs))
+            shards.append((k, indices))
+
+    pool = multiprocessing.Pool(processes=workers)
+    try:
+        results = pool.map(_coverage_task, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    merged = {}
+    for (k, indices), result in zip(shards, results):
+        cov, method, kwargs = jobs[k]
+        columns = merged.setdefault(k, {})
+        for key, value in result.items():
+            if key in _REGION_ATTRIBUTES:
+                column = columns.setdefault(key, [None] * len(cov.genomicRegions))
+                for i, v in zip(indices, value):
+                    column[i] = v
+            else:
+                setattr(cov, key, value)
+    for k, columns in merged.items():
+        cov, method, kwargs = jobs[k]
+        if method == "coverage_from_bam":
+            cov._allocate([len(c) for c in columns["coverage"]], strand="cov_strand_all" in columns,
+                          sense="cov_sense_all" in columns)
+            for key, column in columns.items():
+                for view, values in zip(getattr(cov, key), column):
+                    view[...] = values
+            cov.coverageorig = cov.coverage[:]
+        else:
+            cov.coverage = cov.coverageOrig = columns["coverage"]
+
+
+_REGION_ATTRIBUTES = ["coverage", "cov_strand_all", "cov_sense_all"]
+
+
+def _coverage_task(task):
+    """Compute the coverage of a list of regions (chrom, initial, final, orientation) in a worker process."""
+    from rgt.GenomicRegion import GenomicRegion
+    from rgt.GenomicRegionSet import GenomicRegionSet
+    method, regions, kwargs = task
+    regionset = GenomicRegionSet("shard")
+    for chrom, initial, final, orientation in regions:
+        regionset.add(GenomicRegion(chrom, initial, final, orientation=orientation))
+    cov = CoverageSet("shard", regionset)
+    getattr(cov, method)(**kwargs)
+    result = {"reads": cov.reads, "mapped_reads": cov.mapped_reads, "binsize": cov.binsize,
+              "stepsize": cov.stepsize}
+    for key in _REGION_ATTRIBUTES:
+        if hasattr(cov, key):
+            result[key] = list(getattr(cov, key))
+    return result
@@ -0,0 +1,145 @@
+"""
+GCTrack
+===================
+GCTrack gives the GC content of any interval of a genome in constant time.
+For every chromosome of the genome FASTA file it keeps the cumulative count
+of G and C bases, which is built once and cached on disk (as CoverageCache
+entries in the gc/ folder of the RGT cache, with its own size budget), so
+that later runs only map the arrays into memory.
+
+The cumulative count is stored in two parts, about one byte per base: the
+count before every block of 256 bases (uint32) and, for every base, the
+count since the start of its block (uint8).
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+import os
+import hashlib
+import ConfigParser
+import numpy as np
+# Internal
+from rgt.Util import CacheData
+from rgt.CoverageCache import CoverageCache, _file_state
+
+FORMAT_VERSION = 2
+BLOCK_BITS = 8  # Blocks of 2 ** BLOCK_BITS bases, so that the counts within a block fit into uint8
+CHUNK_SIZE = 1 << 23  # Number of bases which are read from the FASTA file at once (a multiple of the block size)
+_tracks = {}
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class GCTrack:
+    """*Keyword arguments:*
+
+        - genome_path -- path to the genome FASTA file (indexed by pysam if it has no index).
+        - cache -- CoverageCache which keeps the cumulative counts; True: always use the default cache; False: never;
+          None: use the default cache (gc/ in the [Cache] path of data.config, limited to [Cache] gc_max_size) if it
+          is configured and usable.
+    """
+
+    def __init__(self, genome_path, cache=None):
+        # pysam is only needed to build the tracks
+        import pysam
+        self.genome_path = genome_path
+        self.cache = _gc_cache(cache)
+        self._fasta = pysam.FastaFile(genome_path)
+        self._sizes = dict(zip(self._fasta.references, self._fasta.lengths))
+        self._state = (FORMAT_VERSION, _file_state(genome_path))
+        self._tracks = {}
+
+    def cumulative(self, chrom, positions):
+        """Return the cumulative GC count of a chromosome at <positions> (between 0 and the chromosome size) as int64
+        array: the number of G and C bases (of any case) before each position. Chromosomes which are not in the genome
+        have an empty track (size 0)."""
+        if chrom not in self._tracks:
+            self._tracks[chrom] = self._load(chrom)
+        blocks, offsets = self._tracks[chrom]
+        positions = np.asarray(positions, dtype=np.int64)
+        return blocks[positions >> BLOCK_BITS].astype(np.int64) + offsets[positions]
+
+    def size(self, chrom):
+        """Return the size of a chromosome (0 if it is not in the genome)."""
+        return self._sizes.get(chrom, 0)
+
+    def gc_counts(self, chrom, starts, ends):
+        """Return the number of G and C bases and the length of the intervals [start, end) of a chromosome (lists or
+        NumPy arrays) as two arrays; the intervals are clipped to the chromosome."""
+        size = self.size(chrom)
+        starts = np.clip(np.asarray(starts, dtype=np.int64), 0, size)
+        ends = np.clip(np.asarray(ends, dtype=np.int64), starts, size)
+        return self.cumulative(chrom, ends) - self.cumulative(chrom, starts), ends - starts
+
+    def _load(self, chrom):
+        if chrom not in self._sizes:
+            return np.zeros(1, dtype=np.uint32), np.zeros(1, dtype=np.uint8)
+        if self.cache is None:
+            return self._build(chrom)
+        path = os.path.join(self.cache.cache_dir, hashlib.sha1(repr((self._state, chrom))).hexdigest())
+        cached = self.cache.load(path)
+        if cached is not None:
+            return cached[0]["blocks"], cached[0]["offsets"]
+        blocks, offsets = self._build(chrom)
+        try:
+            self.cache.store(path, {"blocks": blocks, "offsets": offsets},
+                             {"genome": os.path.abspath(self.genome_path), "chrom": chrom})
+        except (IOError, OSError):
+            pass
+        return blocks, offsets
+
+    def _build(self, chrom):
+        size = self._sizes[chrom]
+        block = 1 << BLOCK_BITS
+        blocks = np.zeros((size >> BLOCK_BITS) + 1, dtype=np.uint32)
+        offsets = np.zeros(size + 1, dtype=np.uint8)
+        total = 0
+        for start in range(0, size, CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, size)
+            # setting bit 0x20 turns upper into lower case letters
+            bases = np.frombuffer(self._fasta.fetch(chrom, start, end), dtype=np.uint8) | 0x20
+            # cumulative count at the positions start, ..., end
+            counts = np.empty(end - start + 1, dtype=np.int64)
+            counts[0] = 0
+            np.cumsum((bases == ord("c")) | (bases == ord("g")), out=counts[1:])
+            counts += total
+            starts = counts[::block]
+            blocks[start >> BLOCK_BITS:(start >> BLOCK_BITS) + len(starts)] = starts
+            offsets[start:end + 1] = counts - np.repeat(starts, block)[:len(counts)]
+            total = counts[-1]
+        return blocks, offsets
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def gc_track(genome_path, cache=None):
+    """Return the GCTrack of a genome FASTA file; the tracks are shared by all calls of a process.
+
+    *Keyword arguments:*
+
+        - genome_path -- path to the genome FASTA file.
+        - cache -- see GCTrack; only used when the GCTrack of the genome is created.
+    """
+    key = (os.getpid(), os.path.abspath(genome_path))
+    if key not in _tracks:
+        _tracks[key] = GCTrack(genome_path, cache)
+    return _tracks[key]
+
+
+def _gc_cache(cache):
+    if cache is False or isinstance(cache, CoverageCache):
+        return cache or None
+    try:
+        config = CacheData()
+        return CoverageCache(cache_dir=os.path.join(config.get_cache_dir(), "gc"), max_size=config.get_gc_max_size())
+    except (IOError, OSError, ConfigParser.Error):
+        if cache:
+            raise
+        return None
@@ -47,25 +47,13 @@ class GenomicRegion:
 
     def __str__(self):
         """Give informal string representation."""
-        s = '\t'.join( [self.chrom, str(self.initial), str(self.final)] )
-        # Name
-        if self.name is not None: s += '\t' + self.name
-        else: s += '\t' + self.toString()
-        # Score
-        if not self.data: score = "."
-        else:
-            data = self.data.split("\t")
-            try: 
-                score = data[0]
-            except: score = "."
-        s += '\t' + score
-        # Orientation
-        if self.orientation: s += '\t' + self.orientation
-        else: s += '\t' + "."
-        # Else
-        if self.data:
-            s += '\t' + "\t".join(data[1:])
-        return s
+        name = self.name if self.name is not None else self.toString()
+        orientation = self.orientation or "."
+        if not self.data:
+            return "\t".join([self.chrom, str(self.initial), str(self.final), name, ".", orientation])
+        # The first data column is the score, the others follow the orientation
+        score, tab, rest = self.data.partition("\t")
+        return "\t".join([self.chrom, str(self.initial), str(self.final), name, score, orientation, rest])
 
     def __hash__(self):
         return hash(tuple([self.chrom, self.initial, self.final, self.orientation]))
@@ -0,0 +1,686 @@
+"""
+GenomicRegionArray
+===================
+GenomicRegionArray is a column-oriented alternative to GenomicRegionSet. The
+regions are kept in NumPy arrays (chromosome codes, initials, finals and
+orientation codes) plus object columns for names and data. GenomicRegion
+objects are only created when the set is iterated or indexed.
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+from __future__ import division
+import numpy as np
+# Internal
+from rgt.GenomicRegion import GenomicRegion
+from rgt.BedReader import BedReader
+from rgt.BedWriter import BedWriter
+from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.Util import OverlapType
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class GenomicRegionArray:
+    """*Keyword arguments:*
+
+        - name -- Name of the GenomicRegionArray
+
+    The columns are:
+
+        - chroms -- int32 codes into chrom_names
+        - initials, finals -- int64 positions
+        - orientations -- int8 codes into orientation_names
+        - names, data -- object arrays (None when missing), or TextColumns when read from the region cache
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.sorted = False
+        self.fileName = ""
+        self.chrom_names = []
+        self._chrom_codes = {}
+        self.orientation_names = [None, "+", "-"]
+        self._orientation_codes = {None: 0, "+": 1, "-": 2}
+        self.chroms = np.zeros(0, dtype=np.int32)
+        self.initials = np.zeros(0, dtype=np.int64)
+        self.finals = np.zeros(0, dtype=np.int64)
+        self.orientations = np.zeros(0, dtype=np.int8)
+        self.names = np.zeros(0, dtype=object)
+        self.data = np.zeros(0, dtype=object)
+        self._pending = []
+
+    ###########################################################################
+    # Storage
+    ###########################################################################
+
+    def _chrom_code(self, chrom):
+        """Return the code of the given chromosome, adding it to the table if necessary."""
+        try:
+            return self._chrom_codes[chrom]
+        except KeyError:
+            code = len(self.chrom_names)
+            self.chrom_names.append(chrom)
+            self._chrom_codes[chrom] = code
+            return code
+
+    def _orientation_code(self, orientation):
+        """Return the code of the given orientation, adding it to the table if necessary."""
+        try:
+            return self._orientation_codes[orientation]
+        except KeyError:
+            code = len(self.orientation_names)
+            self.orientation_names.append(orientation)
+            self._orientation_codes[orientation] = code
+            return code
+
+    def _flush(self):
+        """Move the regions buffered by add() into the column arrays."""
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        chroms, initials, finals, names, orientations, data = zip(*pending)
+        self._append_columns(np.array(chroms, dtype=np.int32),
+                             np.array(initials, dtype=np.int64),
+                             np.array(finals, dtype=np.int64),
+                             np.array(orientations, dtype=np.int8),
+                             _object_array(names), _object_array(data))
+
+    def _append_columns(self, chroms, initials, finals, orientations, names, data):
+        self.chroms = np.concatenate((self.chroms, chroms))
+        self.initials = np.concatenate((self.initials, initials))
+        self.finals = np.concatenate((self.finals, finals))
+        self.orientations = np.concatenate((self.orientations, orientations))
+        self.names = np.concatenate((self.names, names))
+        self.data = np.concatenate((self.data, data))
+
+    def _empty_like(self, name=None):
+        """Return an empty GenomicRegionArray sharing the chromosome and orientation tables."""
+        z = GenomicRegionArray(self.name if name is None else name)
+        z.chrom_names = list(self.chrom_names)
+        z._chrom_codes = dict(self._chrom_codes)
+        z.orientation_names = list(self.orientation_names)
+        z._orientation_codes = dict(self._orientation_codes)
+        return z
+
+    def take(self, indices, name=None):
+        """Return a new GenomicRegionArray with the regions at the given indices (array, list or slice)."""
+        self._flush()
+        z = self._empty_like(name)
+        z.chroms = self.chroms[indices]
+        z.initials = self.initials[indices]
+        z.finals = self.finals[indices]
+        z.orientations = self.orientations[indices]
+        z.names = self.names[indices]
+        z.data = self.data[indices]
+        return z
+
+    def _region(self, i):
+        """Create the GenomicRegion of row i."""
+        return GenomicRegion(chrom=self.chrom_names[self.chroms[i]], initial=int(self.initials[i]),
+                             final=int(self.finals[i]), name=self.names[i],
+                             orientation=self.orientation_names[self.orientations[i]], data=self.data[i])
+
+    def _recode(self, other):
+        """Return the chromosome and orientation codes of other translated into the tables of self."""
+        other._flush()
+        chrom_map = np.array([self._chrom_code(c) for c in other.chrom_names], dtype=np.int32)
+        orientation_map = np.array([self._orientation_code(o) for o in other.orientation_names], dtype=np.int8)
+        return chrom_map[other.chroms], orientation_map[other.orientations]
+
+    def _chrom_rank(self):
+        """Return the rank of each chromosome code in lexicographic order of the chromosome names."""
+        rank = np.zeros(len(self.chrom_names), dtype=np.int32)
+        rank[np.argsort(np.array(self.chrom_names, dtype=object))] = np.arange(len(self.chrom_names))
+        return rank
+
+    def _chrom_slices(self):
+        """Return a dictionary chromosome name -> (start, end) row range. The array must be sorted."""
+        self._flush()
+        if len(self.chroms) == 0:
+            return {}
+        bounds = np.flatnonzero(np.diff(self.chroms)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(self.chroms)]))
+        return dict((self.chrom_names[self.chroms[s]], (s, e)) for s, e in zip(starts.tolist(), ends.tolist()))
+
+    ###########################################################################
+    # GenomicRegionSet interface
+    ###########################################################################
+
+    def add(self, region):
+        """Add GenomicRegion.
+
+        *Keyword arguments:*
+            - region -- The GenomicRegion to be added.
+        """
+        self._pending.append((self._chrom_code(region.chrom), region.initial, region.final, region.name,
+                              self._orientation_code(region.orientation), region.data))
+        self.sorted = False
+
+    def add_arrays(self, chroms, initials, finals, names=None, orientations=None, data=None):
+        """Add many regions at once from columns.
+
+        *Keyword arguments:*
+
+            - chroms -- Sequence of chromosome names.
+            - initials -- Sequence of start positions.
+            - finals -- Sequence of end positions.
+            - names -- Sequence of names (optional).
+            - orientations -- Sequence of orientations (optional).
+            - data -- Sequence of extra information (optional).
+        """
+        self._flush()
+        n = len(initials)
+        chrom_codes = np.array([self._chrom_code(c) for c in chroms], dtype=np.int32)
+        if orientations is None:
+            orientation_codes = np.zeros(n, dtype=np.int8)
+        else:
+            orientation_codes = np.array([self._orientation_code(o) for o in orientations], dtype=np.int8)
+        self._append_columns(chrom_codes, np.asarray(initials, dtype=np.int64), np.asarray(finals, dtype=np.int64),
+                             orientation_codes, _object_array(names, n), _object_array(data, n))
+        self.sorted = False
+
+    def __len__(self):
+        return len(self.chroms) + len(self._pending)
+
+    def __iter__(self):
+        self._flush()
+        for i in xrange(len(self.chroms)):
+            yield self._region(i)
+
+    def regions(self):
+        """Return a list with the GenomicRegions of all rows (faster than iterating)."""
+        self._flush()
+        chroms = np.array(self.chrom_names, dtype=object)[self.chroms].tolist()
+        orientations = np.array(self.orientation_names, dtype=object)[self.orientations].tolist()
+        return [GenomicRegion(c, i, f, name=n, orientation=o, data=d) for c, i, f, n, o, d in
+                zip(chroms, self.initials.tolist(), self.finals.tolist(), self.names.tolist(), orientations,
+                    self.data.tolist())]
+
+    def __getitem__(self, key):
+        self._flush()
+        if isinstance(key, (int, long, np.integer)):
+            if key < 0:
+                key += len(self.chroms)
+            if not 0 <= key < len(self.chroms):
+                raise IndexError("GenomicRegionArray index out of range")
+            return self._region(key)
+        return self.take(key)
+
+    def get_chrom(self):
+        """Return all chromosomes."""
+        self._flush()
+        return [self.chrom_names[c] for c in self.chroms.tolist()]
+
+    def get_names(self):
+        """Return a list of all region names. If the name is None, it return the region string."""
+        return [r.name if r.name else r.toString() for r in self]
+
+    def total_coverage(self):
+        """Return the sum of all lengths of regions."""
+        self._flush()
+        return int(np.sum(self.finals - self.initials))
+
+    def sort(self, key=None, reverse=False):
+        """Sort Elements by criteria defined by a GenomicRegion.
+
+        *Keyword arguments:*
+
+            - key -- given the key for comparison.
+            - reverse -- reverse the sorting result.
+        """
+        self._flush()
+        if key:
+            regions = list(self)
+            order = sorted(range(len(regions)), key=lambda i: key(regions[i]), reverse=reverse)
+            self._reorder(np.array(order, dtype=np.int64))
+        else:
+            order = np.lexsort((self.finals, self.initials, self._chrom_rank()[self.chroms]))
+            self._reorder(order)
+            self.sorted = True
+
+    def _reorder(self, order):
+        self.chroms = self.chroms[order]
+        self.initials = self.initials[order]
+        self.finals = self.finals[order]
+        self.orientations = self.orientations[order]
+        self.names = self.names[order]
+        self.data = self.data[order]
+
+    def any_chrom(self, chrom):
+        """Return a GenomicRegionArray of the regions which belong to the given chromosome.
+
+        *Keyword arguments:*
+
+            - chrom -- Define chromosome
+        """
+        self._flush()
+        if chrom not in self._chrom_codes:
+            return self._empty_like(chrom)
+        z = self.take(self.chroms == self._chrom_codes[chrom], name=chrom)
+        z.sorted = self.sorted
+        return z
+
+    def extend(self, left, right, w_return=False):
+        """Perform extend step for every element.
+
+        *Keyword arguments:*
+
+            - left -- Define the length to extend on left.
+            - right -- Define the length to extend on right.
+            - w_return -- If TRUE, it returns a GenomicRegionArray; if FALSE, it extends in place.
+        """
+        self._flush()
+        initials = self.initials - left
+        finals = self.finals + right
+        initials, finals = np.minimum(initials, finals), np.maximum(initials, finals)
+        initials = np.maximum(initials, 0)
+        if w_return:
+            z = self.take(slice(None))
+            z.initials, z.finals = initials, finals
+            return z
+        else:
+            self.initials, self.finals = initials, finals
+            self.sorted = False
+
+    def remove_duplicates(self):
+        """Remove the duplicate regions and remain the unique regions. (No return)"""
+        if not self.sorted:
+            self.sort()
+        if len(self.chroms) < 2:
+            return
+        keep = np.ones(len(self.chroms), dtype=bool)
+        keep[1:] = ((self.chroms[1:] != self.chroms[:-1]) | (self.initials[1:] != self.initials[:-1]) |
+                    (self.finals[1:] != self.finals[:-1]))
+        self._reorder(keep)
+
+    def merge(self, w_return=False, namedistinct=False, strand_specific=False):
+        """Merge the regions within the GenomicRegionArray. A merged region keeps the name, orientation and data of
+        its first region.
+
+        *Keyword arguments:*
+
+            - w_return -- If TRUE, it returns a GenomicRegionArray; if FALSE, it merges the regions in place.
+            - namedistinct -- Merge the regions which have the same names only.
+            - strand_specific -- Merge the regions which have the same orientation only.
+        """
+        if not self.sorted:
+            self.sort()
+        n = len(self.chroms)
+        if n in [0, 1]:
+            if w_return:
+                return self
+            return
+
+        if not namedistinct and not strand_specific:
+            starts = self._merge_starts()
+        else:
+            starts = self._merge_starts_by_key(namedistinct, strand_specific)
+
+        z = self.take(starts)
+        z.finals = np.maximum.reduceat(self.finals, starts)
+        z.sorted = True
+        if w_return:
+            return z
+        self.chroms, self.initials, self.finals = z.chroms, z.initials, z.finals
+        self.orientations, self.names, self.data = z.orientations, z.names, z.data
+
+    def _merge_starts(self):
+        """Return the first row of every group of overlapping regions of a sorted array."""
+        n = len(self.chroms)
+        new_chrom = np.ones(n, dtype=bool)
+        new_chrom[1:] = self.chroms[1:] != self.chroms[:-1]
+        # Running maximum of the finals, restarted on every chromosome by lifting each chromosome above the last
+        offset = np.zeros(n, dtype=np.int64)
+        offset[new_chrom] = self.finals.max() + 1
+        shift = np.cumsum(offset)
+        running = np.maximum.accumulate(self.finals + shift) - shift
+        # A region opens a new group if it does not start before the running end of its predecessors
+        new_group = new_chrom.copy()
+        new_group[1:] |= self.initials[1:] >= running[:-1]
+        return np.flatnonzero(new_group)
+
+    def _merge_starts_by_key(self, namedistinct, strand_specific):
+        """Same as _merge_starts, but regions are only merged with a group of the same name and/or orientation."""
+        chroms = self.chroms.tolist()
+        initials = self.initials.tolist()
+        finals = self.finals.tolist()
+        names = self.names
+        orientations = self.orientations.tolist()
+        starts = [0]
+        first, end = 0, finals[0]
+        for i in xrange(1, len(chroms)):
+            if (chroms[i] == chroms[first] and initials[i] < end and
+                    (not namedistinct or names[i] == names[first]) and
+                    (not strand_specific or orientations[i] == orientations[first])):
+                end = max(end, finals[i])
+            else:
+                starts.append(i)
+                first, end = i, finals[i]
+        return np.array(starts, dtype=np.int64)
+
+    def _overlap_pairs(self, y):
+        """Return the index arrays (ia, ib) of all overlapping pairs between the sorted arrays self and y."""
+        slices_a = self._chrom_slices()
+        slices_b = y._chrom_slices()
+        result_a, result_b = [], []
+        for chrom, (sa, ea) in slices_a.items():
+            if chrom not in slices_b:
+                continue
+            sb, eb = slices_b[chrom]
+            ia, ib = _overlap_pairs_chrom(self.initials[sa:ea], self.finals[sa:ea],
+                                          y.initials[sb:eb], y.finals[sb:eb])
+            result_a.append(ia + sa)
+            result_b.append(ib + sb)
+        if not result_a:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        ia = np.concatenate(result_a)
+        ib = np.concatenate(result_b)
+        order = np.lexsort((ib, ia))
+        return ia[order], ib[order]
+
+    def intersect(self, y, mode=OverlapType.OVERLAP, rm_duplicates=False):
+        """Return the overlapping regions with three different modes, as GenomicRegionSet.intersect does.
+
+        *Keyword arguments:*
+
+            - y -- the GenomicRegionArray (or GenomicRegionSet) which to compare with.
+            - mode -- OverlapType.OVERLAP, OverlapType.ORIGINAL or OverlapType.COMP_INCL.
+            - rm_duplicates -- remove duplicates within the output GenomicRegionArray
+        """
+        y = _as_array(y)
+        if len(self) == 0 or len(y) == 0:
+            return self._empty_like()
+        if not self.sorted:
+            self.sort()
+        if not y.sorted:
+            y.sort()
+
+        a, b = self, y
+        if mode == OverlapType.OVERLAP:
+            a = a.merge(w_return=True)
+            b = b.merge(w_return=True)
+        ia, ib = a._overlap_pairs(b)
+
+        if mode == OverlapType.OVERLAP:
+            result = a.take(ia)
+            result.initials = np.maximum(a.initials[ia], b.initials[ib])
+            result.finals = np.minimum(a.finals[ia], b.finals[ib])
+        elif mode == OverlapType.ORIGINAL:
+            result = a.take(np.unique(ia))
+        elif mode == OverlapType.COMP_INCL:
+            inside = (a.initials[ia] >= b.initials[ib]) & (a.finals[ia] <= b.finals[ib])
+            result = a.take(ia[inside])
+        result.name = self.name
+        if rm_duplicates:
+            result.remove_duplicates()
+        return result
+
+    def subtract(self, y, whole_region=False):
+        """Return a GenomicRegionArray excluded the overlapping regions with y.
+
+        *Keyword arguments:*
+
+            - y -- the GenomicRegionArray (or GenomicRegionSet) which to subtract by
+            - whole_region -- subtract the whole region, not partially
+        """
+        y = _as_array(y)
+        if len(self) == 0 or len(y) == 0:
+            return self
+        if not self.sorted:
+            self.sort()
+        b = y.merge(w_return=True)
+        ia, ib = self._overlap_pairs(b)
+        hit = np.zeros(len(self.chroms), dtype=bool)
+        hit[ia] = True
+
+        if whole_region:
+            z = self.take(~hit, name=self.name + ' - ' + y.name)
+            z.sorted = True
+            return z
+
+        # Untouched regions are kept; each overlapped region is cut into the gaps between its merged hits:
+        # [a.initial, b1.initial), [b1.final, b2.initial), ..., [bk.final, a.final)
+        first = np.ones(len(ia), dtype=bool)
+        first[1:] = ia[1:] != ia[:-1]
+        last = np.ones(len(ia), dtype=bool)
+        last[:-1] = ia[1:] != ia[:-1]
+        piece_rows = np.concatenate((ia, ia[last]))
+        piece_initials = np.concatenate((np.where(first, self.initials[ia], np.roll(b.finals[ib], 1)),
+                                         b.finals[ib][last]))
+        piece_finals = np.concatenate((b.initials[ib], self.finals[ia][last]))
+        keep = piece_initials < piece_finals
+        piece_rows, piece_initials, piece_finals = piece_rows[keep], piece_initials[keep], piece_finals[keep]
+
+        rows = np.concatenate((np.flatnonzero(~hit), piece_rows))
+        initials = np.concatenate((self.initials[~hit], piece_initials))
+        finals = np.concatenate((self.finals[~hit], piece_finals))
+        z = self.take(rows, name=self.name + ' - ' + y.name)
+        z.initials, z.finals = initials, finals
+        order = np.lexsort((finals, initials, rows))
+        z._reorder(order)
+        z.sorted = True
+        return z
+
+    def combine(self, region_set, change_name=True, output=False):
+        """Adding another GenomicRegionArray (or GenomicRegionSet) without merging the overlapping regions.
+
+        *Keyword arguments:*
+
+            - region_set -- the regions which to combine with
+            - change_name -- Combine the names as a new name for the combined regions
+            - output -- If TRUE, it returns a GenomicRegionArray; if FALSE, it combines the regions in place.
+        """
+        other = _as_array(region_set)
+        if output:
+            a = self.take(slice(None), name="")
+        else:
+            self._flush()
+            a = self
+        chroms, orientations = a._recode(other)
+        a._append_columns(chroms, other.initials, other.finals, orientations, other.names, other.data)
+        if change_name:
+            if a.name == "":
+                a.name = region_set.name
+            else:
+                a.name = a.name + " + " + region_set.name
+        a.sorted = False
+        if output:
+            return a
+
+    ###########################################################################
+    # Input / output
+    ###########################################################################
+
+    def read_bed(self, filename, regions=None, cache=None):
+        """Read BED file and add every row as a region. The columns are interpreted as in GenomicRegionSet.read_bed.
+
+        *Keyword arguments:*
+
+            - filename -- define the path to the BED file (plain, gzip or bgzip compressed).
+            - regions -- read only the rows overlapping these regions (see GenomicRegionSet.read_bed).
+            - cache -- use the binary cache (see GenomicRegionSet.read_bed).
+        """
+        from rgt.RegionCache import read_cached
+        self.fileName = filename
+        was_empty = len(self) == 0
+        reader = BedReader(filename, regions=regions)
+        cached = read_cached(reader, cache)
+        if cached is not None:
+            if was_empty:
+                # Take over the (memory mapped) columns
+                for attribute in ["chrom_names", "_chrom_codes", "orientation_names", "_orientation_codes", "chroms",
+                                  "initials", "finals", "orientations", "names", "data"]:
+                    setattr(self, attribute, getattr(cached, attribute))
+            else:
+                self.combine(cached, change_name=False)
+            is_sorted = cached.sorted
+        else:
+            for columns in reader.chunks():
+                self.add_arrays(*columns)
+            is_sorted = reader.sorted
+        if was_empty and is_sorted:
+            self.sorted = True
+        else:
+            self.sort()
+
+    def write_bed(self, filename, compress=None, index=False):
+        """Write the regions to BED file, in the same format as GenomicRegionSet.write_bed.
+
+        *Keyword arguments:*
+
+            - filename -- define the path to the BED file.
+            - compress -- compress the file with bgzip (default: if the filename ends with .gz).
+            - index -- compress the file and create a tabix index; the regions must be sorted.
+        """
+        self._flush()
+        chroms = np.array(self.chrom_names, dtype=object)[self.chroms].tolist()
+        initials = self.initials.astype(str).tolist()
+        finals = self.finals.astype(str).tolist()
+        names = [n if n is not None else c + ":" + i + "-" + e
+                 for c, i, e, n in zip(chroms, initials, finals, self.names)]
+        orientations = np.array([o or "." for o in self.orientation_names], dtype=object)[self.orientations].tolist()
+        with BedWriter(filename, compress=compress, index=index) as f:
+            if not any(d for d in self.data):
+                f.write_columns(chroms, initials, finals, names, ["."] * len(names), orientations)
+                return
+            # The first data column is the score, the others follow the orientation
+            data = [d.partition("\t") if d else (".", None, None) for d in self.data]
+            f.write_lines([c + "\t" + i + "\t" + e + "\t" + n + "\t" + d[0] + "\t" + o +
+                           ("\t" + d[2] if d[1] is not None else "")
+                           for c, i, e, n, o, d in zip(chroms, initials, finals, names, orientations, data)])
+
+    ###########################################################################
+    # Conversion
+    ###########################################################################
+
+    @staticmethod
+    def from_regionset(regionset):
+        """Return a GenomicRegionArray with the regions of the given GenomicRegionSet."""
+        z = GenomicRegionArray(regionset.name)
+        z.fileName = regionset.fileName
+        regions = regionset.sequences
+        z.add_arrays([r.chrom for r in regions], [r.initial for r in regions], [r.final for r in regions],
+                     [r.name for r in regions], [r.orientation for r in regions], [r.data for r in regions])
+        z.sorted = regionset.sorted
+        return z
+
+    def to_regionset(self):
+        """Return a GenomicRegionSet with the regions of this GenomicRegionArray."""
+        z = GenomicRegionSet(self.name)
+        z.fileName = self.fileName
+        z.sequences = self.regions()
+        z.sorted = self.sorted
+        return z
+
+
+class TextColumn:
+    """Column of strings (or None) stored as one byte buffer, as the names and data of a GenomicRegionArray read from
+    the region cache. Strings are only decoded when they are accessed; indexing with a slice, an index array or a mask
+    returns a TextColumn on the same buffer, and NumPy functions see an object array.
+
+    *Keyword arguments:*
+
+        - buffer -- uint8 array with the concatenated strings.
+        - bounds -- int64 array of shape (n, 2) with the start and end of every string in buffer; (-1, -1) stands for
+          None.
+    """
+
+    def __init__(self, buffer, bounds):
+        self.buffer = buffer
+        self.bounds = bounds
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, long, np.integer)):
+            start, end = self.bounds[key]
+            if start < 0:
+                return None
+            return self.buffer[start:end].tostring()
+        return TextColumn(self.buffer, self.bounds[key])
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None):
+        return _object_array(self.tolist())
+
+    def tolist(self):
+        """Return the strings as a list."""
+        bounds = self.bounds.tolist()
+        if len(bounds) * 64 < len(self.buffer):
+            # a small part of a large buffer
+            return [self.buffer[s:e].tostring() if s >= 0 else None for s, e in bounds]
+        text = self.buffer.tostring()
+        return [text[s:e] if s >= 0 else None for s, e in bounds]
+
+    @staticmethod
+    def from_values(values):
+        """Return a TextColumn with the given strings (or None)."""
+        parts = []
+        bounds = np.empty((len(values), 2), dtype=np.int64)
+        position = 0
+        for i, v in enumerate(values):
+            if v is None:
+                bounds[i] = -1
+            else:
+                v = str(v)
+                parts.append(v)
+                bounds[i] = position, position + len(v)
+                position += len(v)
+        return TextColumn(np.frombuffer("".join(parts), dtype=np.uint8), bounds)
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def _object_array(values, n=None):
+    """Return values as a one-dimensional object array (filled with None if values is None)."""
+    if values is None:
+        return np.full(n, None, dtype=object)
+    result = np.empty(len(values), dtype=object)
+    result[:] = list(values)
+    return result
+
+
+def _as_array(regions):
+    """Return regions as GenomicRegionArray, converting a GenomicRegionSet if necessary."""
+    if isinstance(regions, GenomicRegionArray):
+        regions._flush()
+        return regions
+    return GenomicRegionArray.from_regionset(regions)
+
+
+def _overlap_pairs_chrom(initials_a, finals_a, initials_b, finals_b):
+    """Return the index arrays of all overlapping pairs of two interval lists on the same chromosome.
+
+    The overlap predicate is the one of GenomicRegion.overlap: a overlaps b if a.initial <= b.initial < a.final or
+    b.initial < a.initial < b.final. The regions of b are split into the layers of OverlapIndex, so that nested or long
+    regions of b do not widen the candidate ranges: every range of a layer contains hits only.
+    """
+    if len(initials_a) == 0 or len(initials_b) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    from rgt.OverlapIndex import _build_layers, _layer_ranges
+    result_a, result_b = [], []
+    for layer in _build_layers(np.arange(len(initials_b)), initials_b, finals_b):
+        lo, hi = _layer_ranges(layer, initials_a, finals_a, query_first=True)
+        counts = np.maximum(hi - lo, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        offsets = np.cumsum(counts) - counts
+        result_a.append(np.repeat(np.arange(len(initials_a)), counts))
+        result_b.append(layer[0][np.arange(total) - np.repeat(offsets, counts) + np.repeat(lo, counts)])
+    if not result_a:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(result_a), np.concatenate(result_b)
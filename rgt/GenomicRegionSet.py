@@ -13,7 +13,8 @@ from __future__ import division
 import os
 import sys
 import random
-from ctypes import *
+import bisect
+import numpy as np
 from scipy import stats
 from copy import deepcopy
 from collections import OrderedDict
@@ -21,7 +22,10 @@ from collections import OrderedDict
 from rgt.SequenceSet import *
 from rgt.GeneSet import GeneSet
 from rgt.GenomicRegion import GenomicRegion
-from rgt.Util import GenomeData, OverlapType, AuxiliaryFunctions, Library_path
+from rgt.BedReader import BedReader
+from rgt.BedWriter import BedWriter
+from rgt.Util import GenomeData, OverlapType, AuxiliaryFunctions
+from rgt import librgt
 
 
 ###############################################################################
@@ -40,6 +44,7 @@ class GenomicRegionSet:
         self.sorted = False
         self.fileName = ""
         self.genome_path = ""
+        self._index = None
 
     def get_chrom(self):
         """Return all chromosomes."""
@@ -63,8 +68,20 @@ class GenomicRegionSet:
         """
         self.sequences.append(region)
         self.sorted = False
+        self._index = None
+
+    def __getattr__(self, name):
+        # The regions of a set read from the region cache are only created when self.sequences is first used
+        columns = self.__dict__.get("_columns")
+        if name != "sequences" or columns is None:
+            raise AttributeError(name)
+        self.sequences = columns.regions()
+        del self._columns
+        return self.sequences
 
     def __len__(self):
+        if "_columns" in self.__dict__:
+            return len(self._columns)
         return len(self.sequences)
 
     def __iter__(self):
@@ -81,6 +98,7 @@ class GenomicRegionSet:
             - percentage -- input value of left and right can be any positive value or negative value larger than -50 %
         """
         z = GenomicRegionSet(name=self.name)
+        self._index = None
 
         if percentage:
             if percentage > -50:
@@ -102,6 +120,7 @@ class GenomicRegionSet:
         if w_return:
             return z
         else:
+            self.sorted = False
             return
 
     def extend_upstream(self, length=1000, w_return=False):
@@ -112,6 +131,7 @@ class GenomicRegionSet:
             - length -- Extending length
         """
         z = GenomicRegionSet(name=self.name)
+        self._index = None
         for s in self.sequences:
             if w_return:
                 if s.orientation == "+":
@@ -126,6 +146,7 @@ class GenomicRegionSet:
         if w_return:
             return z
         else:
+            self.sorted = False
             return
 
     def extend_downstream(self, length=1000, w_return=False):
@@ -136,6 +157,7 @@ class GenomicRegionSet:
             - length -- Extending length
         """
         z = GenomicRegionSet(name=self.name)
+        self._index = None
         for s in self.sequences:
             if w_return:
                 if s.orientation == "+":
@@ -150,6 +172,7 @@ class GenomicRegionSet:
         if w_return:
             return z
         else:
+            self.sorted = False
             return
 
     def sort(self, key=None, reverse=False):
@@ -161,55 +184,171 @@ class GenomicRegionSet:
             - reverse -- reverse the sorting result.
         """
         if key:
+            self._index = None
             self.sequences.sort(key=key, reverse=reverse)
+            self.sorted = False
         else:
-            self.sequences.sort(cmp=GenomicRegion.__cmp__)
+            # regions may have been changed in place since the set was sorted, so the order is always checked and
+            # the index is built again
+            self._index = None
+            order = _sort_order(self.sequences)
+            if order is not None:
+                self.sequences = [self.sequences[i] for i in order.tolist()]
             self.sorted = True
 
-    def read_bed(self, filename):
+    def get_index(self):
+        """Return the per-chromosome index of the set. It is built lazily on the sorted order of the regions, without
+        reordering self.sequences, and kept until the set is changed by one of its methods or self.sequences is
+        replaced or resized. Regions or list items which are changed in place from outside have to be followed by
+        sort() or reset_index().
+
+        *Return:*
+
+            - A dictionary chromosome -> (lo, hi, initials, finals, max_finals): the rows lo:hi of the sorted order
+              (see sorted_rows) are the regions of the chromosome, initials and finals are their positions as arrays
+              and max_finals is the running maximum of finals, which bounds binary searches for overlapping regions.
+        """
+        key = (id(self.sequences), len(self.sequences))
+        if self._index is not None and self._index[0] == key:
+            return self._index[1]
+
+        order = None if self.sorted else _sort_order(self.sequences)
+        regions = self.sequences if order is None else [self.sequences[i] for i in order.tolist()]
+        index = {}
+        lo = 0
+        n = len(regions)
+        while lo < n:
+            chrom = regions[lo].chrom
+            hi = lo + 1
+            while hi < n and regions[hi].chrom == chrom:
+                hi += 1
+            initials = np.array([r.initial for r in regions[lo:hi]], dtype=np.int64)
+            finals = np.array([r.final for r in regions[lo:hi]], dtype=np.int64)
+            index[chrom] = (lo, hi, initials, finals, np.maximum.accumulate(finals))
+            lo = hi
+        self._index = (key, index, {}, order)
+        return index
+
+    def reset_index(self):
+        """Drop the index of get_index, after regions of the set have been changed in place."""
+        self._index = None
+
+    def sorted_rows(self, lo, hi):
+        """Return the regions lo:hi of the sorted order of get_index (a slice of self.sequences if the set is
+        sorted)."""
+        self.get_index()
+        order = self._index[3]
+        if order is None:
+            return self.sequences[lo:hi]
+        return [self.sequences[i] for i in order[lo:hi].tolist()]
+
+    def get_columns(self):
+        """Return the sorted set as columns for the C library, cached together with the index. The set is sorted if
+        necessary, since the row indices of the C functions refer to self.sequences.
+
+        *Return:*
+
+            - chroms -- list of (chromosome, lo, hi) with the row range of every chromosome, in sorted order
+            - initials, finals -- int32 arrays of the positions
+        """
+        if not self.sorted:
+            self.sort()
+        index = self.get_index()
+        cache = self._index[2]
+        if "columns" not in cache:
+            chroms = sorted([(chrom, v[0], v[1]) for chrom, v in index.items()], key=lambda x: x[1])
+            initials = np.zeros(len(self.sequences), dtype=np.int32)
+            finals = np.zeros(len(self.sequences), dtype=np.int32)
+            for chrom, lo, hi in chroms:
+                initials[lo:hi] = index[chrom][2]
+                finals[lo:hi] = index[chrom][3]
+            cache["columns"] = (chroms, initials, finals)
+        return cache["columns"]
+
+    def _from_arrays(self, name, indices, initials, finals, is_sorted=False):
+        """Return a new GenomicRegionSet from the result arrays of rgt.librgt. Every result region takes the meta
+        data of the region of self at the given index; the region itself is reused if its positions did not change."""
+        z = GenomicRegionSet(name)
+        for i, initial, final in zip(indices.tolist(), initials.tolist(), finals.tolist()):
+            r = self.sequences[i]
+            if r.initial != initial or r.final != final:
+                r = GenomicRegion(r.chrom, initial, final, name=r.name, orientation=r.orientation, data=r.data,
+                                  proximity=r.proximity)
+            z.sequences.append(r)
+        z.sorted = is_sorted
+        return z
+
+    def _overlap_range(self, region):
+        """Return the range lo:hi of sorted_rows which contains every region overlapping the given region (and
+        possibly some more, which have to be checked with overlap()). lo == hi if there is none."""
+        index = self.get_index()
+        if region.chrom not in index:
+            return 0, 0
+        lo, hi, initials, finals, max_finals = index[region.chrom]
+        # Regions ending before region.initial cannot overlap; neither can regions starting after region.final
+        first = int(np.searchsorted(max_finals, region.initial, side="right"))
+        if region.final > region.initial:
+            last = int(np.searchsorted(initials, region.final, side="left"))
+        else:
+            last = int(np.searchsorted(initials, region.initial, side="right"))
+        return lo + first, lo + max(first, last)
+
+    def read_bed(self, filename, regions=None, cache=None):
         """Read BED file and add every row as a GenomicRegion.
 
         *Keyword arguments:*
 
-            - filename -- define the path to the BED file.
+            - filename -- define the path to the BED file (plain, gzip or bgzip compressed).
+            - regions -- GenomicRegionSet; if given, only the rows overlapping these regions are read. A bgzip
+              compressed file is then read through its tabix index, which is created if necessary.
+            - cache -- Keep the parsed file in the binary cache of rgt.RegionCache and reuse it while the file is
+              unchanged. True: always; False: never; None: for large files; or the RegionCache to use.
 
             .. note:: Chrom (1), start (2), end (2), name (4) and orientation (6) is used for GenomicRegion. All other columns (5, 7, 8, ...) are put to the data attribute of the GenomicRegion. The numbers in parentheses are the columns of the BED format.
         """
         self.fileName = filename
-        with open(filename) as f:
-            error_line = 0  # Count error line
-            for line in f:
-                line = line.strip("\n")
-                line = line.split()
-                try:
-                    name, orientation, data = None, None, None
-                    size = len(line)
-                    chrom = line[0]
-                    start, end = int(line[1]), int(line[2])
-
-                    if start > end:
-                        start, end = end, start
-                    if size > 3:
-                        name = line[3]
-
-                    if size > 5:
-                        orientation = line[5]
-                        data = "\t".join([line[4]] + line[6:])
-                    if size == 5:
-                        data = line[4]
-
-                    if start == end:
-                        raise Exception("zero-length region: " + self.chrom + "," + str(self.initial) + "," + str(self.final))
-
-                    self.add(GenomicRegion(chrom, start, end, name, orientation, data))
-                except:
-                    if line == []:
-                        continue
-                    else:
-                        error_line += 1
-                        if error_line > 2:
-                            # Skip the first error line which contains the track information
-                            print("Error at line", line, self.fileName)
+        self._read(BedReader(filename, regions=regions), cache)
+
+    @staticmethod
+    def from_tabix(filename, regions, name=None):
+        """Return a GenomicRegionSet with the rows of a bgzip compressed, tabix indexed BED file which overlap the
+        given regions (see read_bed).
+
+        *Keyword arguments:*
+
+            - filename -- define the path to the BED file.
+            - regions -- GenomicRegionSet with the regions of interest.
+            - name -- name of the new GenomicRegionSet (default: the file name).
+        """
+        z = GenomicRegionSet(name if name is not None else os.path.basename(filename))
+        z.read_bed(filename, regions=regions)
+        return z
+
+    def _read(self, reader, cache=None):
+        """Add the regions of a BedReader, through the cache if it is used. Sorting is skipped if the set was empty
+        and the file is sorted; the set then keeps the cached columns and creates its GenomicRegions when
+        self.sequences is first used."""
+        from rgt.RegionCache import read_cached
+        was_empty = len(self) == 0
+        cached = read_cached(reader, cache)
+        if cached is not None and was_empty and cached.sorted:
+            # Keep the memory mapped columns; the GenomicRegions are created on first use of self.sequences
+            self.__dict__.pop("sequences", None)
+            self._columns = cached
+            self._index = None
+            self.sorted = True
+            return
+        if cached is not None:
+            self.sequences.extend(cached.regions())
+            is_sorted = cached.sorted
+        else:
+            for region in reader:
+                self.sequences.append(region)
+            is_sorted = reader.sorted
+        self._index = None
+        if was_empty and is_sorted:
+            self.sorted = True
+        else:
             self.sort()
 
     def read_sequence(self, genome_file_dir):
@@ -258,28 +397,16 @@ class GenomicRegionSet:
             pass
                  
 
-    def read_bedgraph(self, filename):
+    def read_bedgraph(self, filename, cache=None):
         """Read BEDGRAPH file and add every row as a GenomicRegion.
 
         *Keyword arguments:*
 
-            - filename -- define the path to the BEDGRAPH file.
+            - filename -- define the path to the BEDGRAPH file (plain, gzip or bgzip compressed).
+            - cache -- Use the binary cache as in read_bed.
         """
         self.fileName = filename
-        with open(filename) as f:
-            for line in f:
-                try:
-                    line = line.strip("\n")
-                    line = line.split("\t")
-                    assert len(line) == 4
-
-                    chrom, start, end, data = line[0], int(line[1]), int(line[2]), str(line[3])
-
-                    self.add(GenomicRegion(chrom=chrom, initial=start, final=end, data=data))
-                except:
-                    print("Error at line", line, self.fileName)
-
-            self.sort()
+        self._read(BedReader(filename, bedgraph=True), cache)
 
     def random_subregions(self, size, name=None):
         """Return a subsampling of the genomic region set with a specific number of regions.
@@ -311,16 +438,20 @@ class GenomicRegionSet:
                 b.add(self.sequences[i])
         return a, b
 
-    def write_bed(self, filename):
+    def write_bed(self, filename, compress=None, index=False):
         """Write GenomicRegions to BED file.
 
         *Keyword arguments:*
 
             - filename -- define the path to the BED file.
+            - compress -- compress the file with bgzip (default: if the filename ends with .gz).
+            - index -- compress the file and create a tabix index; the set must be sorted.
         """
-        with open(filename, 'w') as f:
-            for s in self:
-                print(s, file=f)
+        if "_columns" in self.__dict__:
+            self._columns.write_bed(filename, compress=compress, index=index)
+            return
+        with BedWriter(filename, compress=compress, index=index) as f:
+            f.write_regions(self.sequences)
 
     def gene_association_old(self, gene_set=None, organism="hg19", promoterLength=1000,
                          threshDist=50000, show_dis=False, strand_specific=False):
@@ -880,6 +1011,7 @@ class GenomicRegionSet:
         self.name = updated_grs.name
         self.sequences = updated_grs.sequences
         self.sorted = False
+        self._index = None
 
         return all_genes, mapped_genes, all_proxs, mapped_proxs
 
@@ -1081,31 +1213,7 @@ class GenomicRegionSet:
             return z
 
     def intersect_c(self, y, mode=OverlapType.OVERLAP, rm_duplicates=False):
-        # Determine path of shared library
-        Lib = Library_path()
-        lib = cdll.LoadLibrary(Lib.get_c_rgt())
-        # C-Binding of intersect overlap function
-        intersect_overlap_c = lib.intersectGenomicRegionSetsOverlap
-        intersect_overlap_c.argtypes = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int, POINTER(c_char_p),
-                                        POINTER(c_int), POINTER(c_int), c_int, POINTER(POINTER(c_int)),
-                                        POINTER(POINTER(c_int)), POINTER(POINTER(c_int)), POINTER(c_int)]
-        intersect_overlap_c.restype = None
-
-        # C-Binding of intersect original function
-        intersect_original_c = lib.intersectGenomicRegionSetsOriginal
-        intersect_original_c.argtypes = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int, POINTER(c_char_p),
-                                         POINTER(c_int), POINTER(c_int), c_int, POINTER(POINTER(c_int)),
-                                         POINTER(POINTER(c_int)), POINTER(POINTER(c_int)), POINTER(c_int)]
-        intersect_original_c.restype = None
-
-        # C-Binding of intersect completely function
-        intersect_completely_included_c = lib.intersectGenomicRegionSetsCompletelyIncluded
-        intersect_completely_included_c.argtypes = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int,
-                                                    POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int,
-                                                    POINTER(POINTER(c_int)), POINTER(POINTER(c_int)),
-                                                    POINTER(POINTER(c_int)), POINTER(c_int)]
-        intersect_completely_included_c.restype = None
-
+        """Return the intersection like intersect(), computed by the C library (see rgt.librgt)."""
         # If one of the sets is empty, the intersection is trivially empty as well
         result = GenomicRegionSet(self.name)
         if len(self) == 0 or len(y) == 0:
@@ -1128,56 +1236,14 @@ class GenomicRegionSet:
                 a = a.merge(w_return=True)
                 b = b.merge(w_return=True)
 
-            # Convert to ctypes
-            len_self = len(a)
-            len_y = len(b)
-            max_len_result = len_self + len_y
-
-            chromosomes_self_python = [gr.chrom for gr in a.sequences]
-            chromosomes_self_c = (c_char_p * len_self)(*chromosomes_self_python)
-
-            chromosomes_y_python = [gr.chrom for gr in b.sequences]
-            chromosomes_y_c = (c_char_p * len_y)(*chromosomes_y_python)
-
-            initials_self_python = [gr.initial for gr in a.sequences]
-            initials_self_c = (c_int * len_self)(*initials_self_python)
-
-            initials_y_python = [gr.initial for gr in b.sequences]
-            initials_y_c = (c_int * len_y)(*initials_y_python)
-
-            finals_self_python = [gr.final for gr in a.sequences]
-            finals_self_c = (c_int * len_self)(*finals_self_python)
-
-            finals_y_python = [gr.final for gr in b.sequences]
-            finals_y_c = (c_int * len_y)(*finals_y_python)
-
-            indices_c = POINTER(c_int)((c_int * max_len_result)())
-            initials_result_c = POINTER(c_int)((c_int * max_len_result)())
-            finals_result_c = POINTER(c_int)((c_int * max_len_result)())
-            size_result_c = c_int()
-
             # Call C-function
-            if mode == OverlapType.OVERLAP:
-                intersect_overlap_c(chromosomes_self_c, initials_self_c, finals_self_c, len_self, chromosomes_y_c,
-                                    initials_y_c, finals_y_c, len_y, pointer(indices_c), pointer(initials_result_c),
-                                    pointer(finals_result_c), byref(size_result_c))
-            elif mode == OverlapType.ORIGINAL:
-                intersect_original_c(chromosomes_self_c, initials_self_c, finals_self_c, len_self, chromosomes_y_c,
-                                     initials_y_c, finals_y_c, len_y, pointer(indices_c), pointer(initials_result_c),
-                                     pointer(finals_result_c), byref(size_result_c))
-            elif mode == OverlapType.COMP_INCL:
-                intersect_completely_included_c(chromosomes_self_c, initials_self_c, finals_self_c, len_self,
-                                                chromosomes_y_c, initials_y_c, finals_y_c, len_y, pointer(indices_c),
-                                                pointer(initials_result_c), pointer(finals_result_c),
-                                                byref(size_result_c))
+            indices, initials, finals = librgt.intersect(a, b, mode)
 
             # Construct result set
-            for i in range(size_result_c.value):
-                ci = indices_c[i]
-                result.add(GenomicRegion(chromosomes_self_c[ci], initials_result_c[i],
-                                         finals_result_c[i], name=a.sequences[ci].name,
-                                         orientation=a.sequences[ci].orientation, data=a.sequences[ci].data,
-                                         proximity=a.sequences[ci].proximity))
+            for ci, initial, final in zip(indices.tolist(), initials.tolist(), finals.tolist()):
+                r = a.sequences[ci]
+                result.add(GenomicRegion(r.chrom, initial, final, name=r.name, orientation=r.orientation,
+                                         data=r.data, proximity=r.proximity))
             if rm_duplicates:
                 result.remove_duplicates()
             return result
@@ -1244,12 +1310,28 @@ class GenomicRegionSet:
         if y.sorted == False: y.sort()
 
         targets = self.window(y=y, adding_length = max_dis)
+        target_index = targets.get_index()
 
         chroms = self.get_chrom()
         uni_chrom = list(set(chroms))
         target_dict = {}
+        disjoint = {}
         for ch in uni_chrom:
             target_dict[ch] = targets.any_chrom(chrom=ch)
+            if ch in target_index:
+                disjoint[ch] = np.array_equal(target_index[ch][3], target_index[ch][4])
+
+        def candidates(region):
+            """Return the targets which can be the closest to the region. If the targets do not contain each
+            other, their finals are sorted as well and only the targets around the region have to be checked."""
+            if not disjoint.get(region.chrom):
+                return target_dict[region.chrom]
+            lo, hi, initials, finals = target_index[region.chrom][:4]
+            first = int(np.searchsorted(finals, region.initial, side="right"))
+            if first > 0:
+                first = int(np.searchsorted(finals, finals[first - 1], side="left"))
+            last = int(np.searchsorted(initials, region.final, side="right")) + 1
+            return targets.sorted_rows(lo + first, lo + min(last, hi - lo))
 
         if not top_N:
             if return_list: z_list = []
@@ -1257,21 +1339,13 @@ class GenomicRegionSet:
             z = GenomicRegionSet(self.name)
 
             for region in self:
-                distances = []
-                if len(target_dict[region.chrom]) == 0:
+                targets_region = candidates(region)
+                if len(targets_region) == 0:
                     continue
-                elif len(target_dict[region.chrom]) == 1:
-                    d = region.distance(target_dict[region.chrom][0])
-                    z.add(target_dict[region.chrom][0])
-                    if return_list: z_list.append(d)
-                else:
-
-                    for r in target_dict[region.chrom]:
-                        d = region.distance(r)
-                        distances.append(d)
-                    min_ind = distances.index(min(distances)) 
-                    z.add(target_dict[region.chrom][min_ind])
-                    if return_list: z_list.append(distances[min_ind])
+                distances = [region.distance(r) for r in targets_region]
+                min_ind = distances.index(min(distances))
+                z.add(targets_region[min_ind])
+                if return_list: z_list.append(distances[min_ind])
 
             if return_list:
                 return z, z_list
@@ -1331,6 +1405,7 @@ class GenomicRegionSet:
                     i += 1
             except:
                 loop = False
+        self._index = None
             
     def window(self,y,adding_length = 1000):
         """Return the overlapping regions of self and y with adding a specified number (1000, by default) of base pairs upstream and downstream of each region in self. In effect, this allows regions in y that are near regions in self to be detected.
@@ -1347,8 +1422,7 @@ class GenomicRegionSet:
         if len(self) == 0 or len(y) == 0:
             return GenomicRegionSet('None region')
         # Establish an extended GenomicRegionSet
-        extended_self = deepcopy(self)
-        extended_self.extend(adding_length,adding_length)
+        extended_self = self.extend(adding_length, adding_length, w_return=True)
         # Find their intersections
         return extended_self.intersect(y)
     
@@ -1378,6 +1452,10 @@ class GenomicRegionSet:
         if self.sorted == False: 
             self.sort()
         b = y.merge(w_return=True)
+
+        if librgt.has_sweeps():
+            indices, initials, finals = librgt.subtract(self, b, whole_region)
+            return self._from_arrays(z.name, indices, initials, finals)
         
         iter_a = iter(self)
         s = iter_a.next()
@@ -1521,6 +1599,8 @@ class GenomicRegionSet:
             else:
                 dict_re[r.name] = r
 
+        # The first region of every name has been changed in place
+        self._index = None
         z = GenomicRegionSet(self.name)
         for r in dict_re.values():
             z.add(r)
@@ -1537,12 +1617,29 @@ class GenomicRegionSet:
             - namedistinct -- Merge the regions which have the same names only.
         """
         if self.sorted == False: self.sort()
+        self._index = None
         
         if len(self.sequences) in [0, 1]:
             if w_return:
                 return self
             else:
                 pass
+        elif librgt.has_sweeps():
+            keys = None
+            if namedistinct or strand_specific:
+                codes = {}
+                keys = [codes.setdefault((r.name if namedistinct else None,
+                                          r.orientation if strand_specific else None), len(codes))
+                        for r in self.sequences]
+            indices, initials, finals = librgt.merge(self, keys)
+            if w_return:
+                return self._from_arrays(self.name, indices, initials, finals, is_sorted=True)
+            sequences = []
+            for i, initial, final in zip(indices.tolist(), initials.tolist(), finals.tolist()):
+                r = self.sequences[i]
+                r.initial, r.final = initial, final
+                sequences.append(r)
+            self.sequences = sequences
         else:
             z = GenomicRegionSet(name=self.name)
             prev_region = self.sequences[0]
@@ -1613,14 +1710,41 @@ class GenomicRegionSet:
             a.sorted = False
             return a
         else:
+            # The set stays sorted if the other one is sorted and follows it
+            is_sorted = not region_set.sequences or (region_set.sorted and (not self.sequences or (
+                self.sorted and _region_key(self.sequences[-1]) <= _region_key(region_set.sequences[0]))))
             self.sequences.extend(region_set.sequences)
+            self._index = None
             if change_name:
                 if self.name == "":
                     self.name = region_set.name
                 else:
                     self.name = self.name + " + " + region_set.name
-            self.sorted = False
-        
+            self.sorted = is_sorted
+
+    @staticmethod
+    def concatenate(region_sets, name=""):
+        """Return a new GenomicRegionSet with the regions of all given sets. If every set is sorted, they are merged
+        into a sorted set (keeping the order of equal regions as in the list); otherwise the regions follow each
+        other and the result is not sorted.
+
+        *Keyword arguments:*
+
+            - region_sets -- list of GenomicRegionSets.
+            - name -- name of the new set.
+        """
+        z = GenomicRegionSet(name)
+        region_sets = [r for r in region_sets if len(r)]
+        for s in region_sets:
+            z.sequences.extend(s.sequences)
+        if all(r.sorted for r in region_sets):
+            if all(_region_key(a[-1]) <= _region_key(b[0]) for a, b in zip(region_sets, region_sets[1:])):
+                z.sorted = True
+            else:
+                # The stable sort of the concatenated runs is the k-way merge
+                z.sort()
+        return z
+
     def cluster(self, max_distance):
         """Cluster the regions with a certain distance and return the result as a new GenomicRegionSet.
         
@@ -1641,11 +1765,15 @@ class GenomicRegionSet:
         """
         
         if self.sorted == False: self.sort()
+        self._index = None
         
         if len(self) == 0:
             return GenomicRegionSet('None region')
         elif len(self) == 1:
             return self
+        elif librgt.has_sweeps():
+            indices, initials, finals = librgt.cluster(self, max_distance)
+            return self._from_arrays('Clustered region set', indices, initials, finals, is_sorted=True)
         else:
             z = GenomicRegionSet('Clustered region set')
             previous = self.sequences[0]
@@ -1659,6 +1787,7 @@ class GenomicRegionSet:
                     z.add(previous)
                     previous = s
             z.add(previous)
+            self._index = None
             return z
         
     def flank(self,size):
@@ -1737,18 +1866,7 @@ class GenomicRegionSet:
         return similarity
 
     def jaccard_c(self, query):
-        # Determine path of shared library
-        Lib = Library_path()
-        lib = cdll.LoadLibrary(Lib.get_c_rgt())
-
-        # Bind library
-        ctypes_jaccardC = lib.jaccard
-
-        # Specify data types
-        ctypes_jaccardC.argtypes = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int, POINTER(c_char_p),
-                                    POINTER(c_int), POINTER(c_int), c_int]
-        ctypes_jaccardC.restype = c_double
-
+        """Return the jaccard index like jaccard(), computed by the C library (see rgt.librgt)."""
         if not self.sorted:
             self.sort()
         if not query.sorted:
@@ -1757,36 +1875,8 @@ class GenomicRegionSet:
         assert self.sorted
         assert query.sorted
 
-        # Convert to ctypes
-        chroms_self_python = [gr.chrom for gr in self.sequences]
-        chroms_self_c = (c_char_p * len(chroms_self_python))(*chroms_self_python)
-        #print('Converted self.chroms to c', str(chroms_self_python[:4]), '...')
-
-        chroms_query_python = [gr.chrom for gr in query.sequences]
-        chroms_query_c = (c_char_p * len(chroms_query_python))(*chroms_query_python)
-        #print('Converted query.chroms to c', str(chroms_query_python[:4]), '...')
-
-        initials_self_python = [gr.initial for gr in self.sequences]
-        initials_self_c = (c_int * len(initials_self_python))(*initials_self_python)
-        #print('Converted self.initials to c', str(initials_self_python[:4]), '...')
-
-        initials_query_python = [gr.initial for gr in query.sequences]
-        initials_query_c = (c_int * len(initials_query_python))(*initials_query_python)
-        #print('Converted query.initials to c', str(initials_query_python[:4]), '...')
-
-        finals_self_python = [gr.final for gr in self.sequences]
-        finals_self_c = (c_int * len(finals_self_python))(*finals_self_python)
-        #print('Converted self.finals to c', str(finals_self_python[:4]), '...')
-
-        finals_query_python = [gr.final for gr in query.sequences]
-        finals_query_c = (c_int * len(finals_query_python))(*finals_query_python)
-        #print('Converted query.finals to c', str(finals_query_python[:4]), '...')
-
-        #print('Converted to ctypes')
-
         # Call C-function
-        return ctypes_jaccardC(chroms_self_c, initials_self_c, finals_self_c, len(self), chroms_query_c,
-                               initials_query_c, finals_query_c, len(query))
+        return librgt.jaccard(self, query)
 
     def within_overlap(self):
         """Check whether there is overlapping within or not."""
@@ -1855,39 +1945,30 @@ class GenomicRegionSet:
             - z -- A GenomicRegionSet which contains the random regions
         """
 
-        def list_max(chrom_list, result_map):
+        def length_order(result_map, ch):
+            """Return the regions of a chromosome sorted by length, and their lengths."""
+            regions = sorted(result_map.any_chrom(ch), key=len)
+            return regions, [len(s) for s in regions]
+
+        def list_max(chrom_list, by_length):
             """Generate a list containing maximum length for each chromosome."""
             map_max = []  # Store the minimum length corresponding to chrom_list
             for ch in chrom_list:
-                map_max.append(max([len(s) for s in result_map.any_chrom(ch)]))
+                map_max.append(max(by_length[ch][1]))
             return map_max
 
-        def randoming(length, result_map, chrom_list, map_max, choices):
+        def randoming(length, by_length, chrom_list, map_max, choices):
             """Return a new GenomicRegion as the result of randomization."""
-            cont_loop = True
             candidate_chrom = [chrom_list[i] for i, l in enumerate(map_max) if l > length]
 
             while True:
                 ch = weighted_choice(choices)
                 if ch in candidate_chrom: break
 
-            while cont_loop:
-                # try:
-                regions = result_map.any_chrom(ch, len_min=length)
-                sample = random.choice(regions)
-                if len(sample) < length:
-                    print("1", end="")
-                    continue
-                else:
-                    # print("2", end="")
-                    random_posi = random.randint(sample.initial, sample.final - length)
-                    # print(sample.toString())
-                    # print(random_posi)
-                    cont_loop = False
-
-                #except:
-                    #print("3", end="")
-                #    continue
+            # Regions long enough for the random region are a suffix of the length-sorted list
+            regions, lengths = by_length[ch]
+            sample = regions[random.randrange(bisect.bisect_left(lengths, length), len(regions))]
+            random_posi = random.randint(sample.initial, sample.final - length)
 
             return GenomicRegion(chrom=sample.chrom,initial=random_posi,final=random_posi + length)
 
@@ -1934,7 +2015,8 @@ class GenomicRegionSet:
             result_map = chrom_map.subtract(input_map)
 
         z = GenomicRegionSet(name="random regions")
-        map_max = list_max(chrom_list, result_map)
+        by_length = dict((ch, length_order(result_map, ch)) for ch in chrom_list)
+        map_max = list_max(chrom_list, by_length)
 
         # Generate pk which stores the total length of all regions in each chromosome
         choices = []
@@ -1946,12 +2028,12 @@ class GenomicRegionSet:
 
 
         for length in result_list:
-            new_region = randoming(length, result_map, chrom_list, map_max, choices)
+            new_region = randoming(length, by_length, chrom_list, map_max, choices)
             z.add(new_region)
             if overlap_result == False:
                 result_map = result_map.subtract_aregion(new_region)
-                map_max[chrom_list.index(new_region.chrom)] = max(
-                    [len(s) for s in result_map.any_chrom(new_region.chrom)])
+                by_length[new_region.chrom] = length_order(result_map, new_region.chrom)
+                map_max[chrom_list.index(new_region.chrom)] = max(by_length[new_region.chrom][1])
                 choices[chrom_list.index(new_region.chrom)][1] -= len(new_region)
         return z
 
@@ -2023,14 +2105,22 @@ class GenomicRegionSet:
 
             - A list of regions which belongs to given chromosome.
         """
+        index = self.get_index()
+        if chrom not in index:
+            rows = []
+        elif self._index[3] is None:
+            rows = self.sequences[index[chrom][0]:index[chrom][1]]
+        else:
+            # the regions in the order of the set
+            rows = [self.sequences[i] for i in np.sort(self._index[3][index[chrom][0]:index[chrom][1]]).tolist()]
         if len_min == False and len_max == False:
-            res = [s for s in self if s.chrom == chrom]      
+            res = rows
         elif len_min > 0 and len_max == False:
-            res = [s for s in self if s.chrom == chrom and len(s) >= len_min]
+            res = [s for s in rows if len(s) >= len_min]
         elif len_max > 0 and len_min == False:
-            res = [s for s in self if s.chrom == chrom and len(s) <= len_max]
+            res = [s for s in rows if len(s) <= len_max]
         else:
-            res = [s for s in self if s.chrom == chrom and len_min <= len(s) <= len_max]
+            res = [s for s in rows if len_min <= len(s) <= len_max]
                     
         if return_list:
             return res
@@ -2040,6 +2130,7 @@ class GenomicRegionSet:
             return z
         else:
             self.sequences = res
+            self._index = None
 
     def relocate_regions(self, center='midpoint',left_length=2000,right_length=2000):
         """Return a new GenomicRegionSet which relocates the regions by given center and extend length.
@@ -2120,9 +2211,9 @@ class GenomicRegionSet:
 
             - region -- A GenomicRegion to be checked.
         """
-        for s in self:
+        lo, hi = self._overlap_range(region)
+        for s in self.sorted_rows(lo, hi):
             if s.overlap(region): return True
-            else: continue
         return False
 
     def complement(self, organism, chrom_X=True, chrom_Y=False, chrom_M=False):
@@ -2151,9 +2242,21 @@ class GenomicRegionSet:
 
             - region -- A GenomicRegion defining the interval for counting.
         """
-        query = GenomicRegionSet("query")
-        query.add(region)
-        return len(self.intersect(query))
+        # Overlapping regions which belong to the same merged cluster of self are counted once, as intersect does
+        lo, hi = self._overlap_range(region)
+        count = 0
+        cluster_final = None
+        counted = False
+        for s in self.sorted_rows(lo, hi):
+            if cluster_final is None or s.initial >= cluster_final:
+                cluster_final = s.final
+                counted = False
+            else:
+                cluster_final = max(cluster_final, s.final)
+            if not counted and s.overlap(region):
+                count += 1
+                counted = True
+        return count
 
     def count_by_regionset(self, regionset):
         """Return the number of intersection regions with the given GenomicRegionSet.
@@ -2173,67 +2276,13 @@ class GenomicRegionSet:
 
         .. note:: The length of the result list is the same as self GenomicRegionSet
         """
+        from rgt.OverlapIndex import OverlapIndex
         if len(self) == 0: return None
         if len(regionset) == 0: return [0]*len(self)
 
-        #a = copy.deepcopy(con_self)
-        #b = copy.deepcopy(regionset)
         if not self.sorted: self.sort()
-        if not regionset.sorted: regionset.sort()
-        counts = []
-        
-        iter_a = iter(self)
-        s = iter_a.next()
-        last_j = len(regionset)-1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-        c = 0
-        while cont_loop:
-            # When the regions overlap
-            #print(str(s)+"\t\t"+str(b[j]))
-            if s.overlap(regionset[j]):
-                c += 1
-                if not cont_overlap: pre_inter = j
-                if j == last_j: 
-                    try: 
-                        s = iter_a.next()
-                        counts.append(c)
-                        c = 0
-                        j = pre_inter
-                    except: 
-                        cont_loop = False
-                        counts.append(c)
-                else: 
-                    j += 1
-                cont_overlap = True
-            
-            elif s < regionset[j]:
-                try: 
-                    s = iter_a.next()
-                    counts.append(c)
-                    c = 0
-                    j = pre_inter
-                    cont_overlap = False
-                except: 
-                    cont_loop = False
-                    counts.append(c)
-            
-            elif s > regionset[j]:
-                if j == last_j:
-                    try:
-                        s = iter_a.next()
-                        counts.append(c)
-                        c = 0
-
-                    except:
-                        cont_loop = False
-                        counts.append(c)
-                else:
-                    j = j + 1
-                    cont_overlap = False
-        return counts
+        index = OverlapIndex(regionset)
+        return index.count_regionset(self, query_first=True).tolist()
         
     def covered_by_aregion(self, region):
         """Return a GenomicRegionSet which includes all the regions covered by a given region.
@@ -2246,9 +2295,11 @@ class GenomicRegionSet:
 
             - A GenomicRegionSet containing the regions within the defined interval.
         """
-        region_set = GenomicRegionSet("Query")
-        region_set.add(region)
-        return self.intersect(region_set, mode=OverlapType.ORIGINAL)
+        z = GenomicRegionSet(self.name)
+        lo, hi = self._overlap_range(region)
+        for s in self.sorted_rows(lo, hi):
+            if s.overlap(region): z.add(s)
+        return z
 
     def replace_region_name(self, regions, combine=False):
         """Replace the region names by the given GenomicRegionSet.
@@ -2465,64 +2516,14 @@ class GenomicRegionSet:
         if len(self) == 0: return None
         if len(regionset) == 0: return [0]*len(self)
 
+        from rgt.OverlapIndex import OverlapIndex
         if not self.sorted: self.sort()
-        if not regionset.sorted: regionset.sort()
-        coverages = []
-        
-        iter_a = iter(self)
-        s = iter_a.next()
-        last_j = len(regionset)-1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-        c = GenomicRegionSet("coverage")
-
-        while cont_loop:
-            # When the regions overlap
-            #print(str(s)+"\t\t"+str(b[j]))
-            if s.overlap(regionset[j]):
-
-                c.add(regionset[j])
-                if not cont_overlap: pre_inter = j
-                if j == last_j: 
-                    coverages.append(c.total_coverage()/len(s))
-                    try: 
-                        s = iter_a.next()
-                        c = GenomicRegionSet("coverage")
-                        j = pre_inter
-                    except: 
-                        cont_loop = False
-                else: 
-                    j += 1
-                cont_overlap = True
-
-            
-            elif s < regionset[j]:
-                overlapping = False
-                coverages.append(c.total_coverage()/len(s))
-                try: 
-                    s = iter_a.next()
-                    c = GenomicRegionSet("coverage")
-                    j = pre_inter
-                    cont_overlap = False
-                except: 
-                    cont_loop = False
-
-            elif s > regionset[j]:
-                overlapping = False
-                if j == last_j:
-                    coverages.append(c.total_coverage()/len(s))
-                    try:
-                        s = iter_a.next()
-                        c = GenomicRegionSet("coverage")
-
-                    except:
-                        cont_loop = False
-                else:
-                    j = j + 1
-                    cont_overlap = False
-        return coverages
+        # Sum up the lengths of the overlapping regions of regionset for every region of self
+        index = OverlapIndex(regionset)
+        rows, hits = index.overlap_pairs(self, query_first=True)
+        lengths = np.array([len(r) for r in regionset.sequences], dtype=np.int64)
+        covered = np.bincount(rows, weights=lengths[hits], minlength=len(self)).tolist()
+        return [c / len(s) for c, s in zip(covered, self.sequences)]
 
     def extract_blocks(self, keep_name=False):
         """Extract the exon information from self.data and add them into the self GenomicRegionSet."""
@@ -2534,6 +2535,8 @@ class GenomicRegionSet:
                 z = [ rg ]
             regions = regions + z
         self.sequences = regions
+        self.sorted = False
+        self._index = None
 
     def sort_score(self):
         """Sort the regions by their scores."""
@@ -2790,6 +2793,9 @@ class GenomicRegionSet:
             else:
                 s.initial, s.final = s.final, s.final + length
             promoters.add(s)
+        # The regions of self have been changed in place
+        self.sorted = False
+        self._index = None
         return promoters
 
     def get_GeneSet(self):
@@ -2797,3 +2803,31 @@ class GenomicRegionSet:
         for r in self:
             genes.add(gene_name=r.name, value=float(r.data.split("\t")[0]))
         return genes
+
+
+def _region_key(region):
+    """Return the key of a GenomicRegion in the order of GenomicRegion.__cmp__."""
+    return region.chrom, region.initial, region.final
+
+
+def _sort_order(regions):
+    """Return the indices which sort the list of GenomicRegions in the order of GenomicRegion.__cmp__ (keeping equal
+    regions in order), or None if the list is sorted already. The chromosomes are replaced by the ranks of their
+    names, so that the sorting is done by NumPy on integer columns."""
+    n = len(regions)
+    chroms = [r.chrom for r in regions]
+    ranks = dict((c, i) for i, c in enumerate(sorted(set(chroms))))
+    codes = np.fromiter((ranks[c] for c in chroms), dtype=np.int64, count=n)
+    initials = np.fromiter((r.initial for r in regions), dtype=np.int64, count=n)
+    finals = np.fromiter((r.final for r in regions), dtype=np.int64, count=n)
+    same_chrom = codes[1:] == codes[:-1]
+    ordered = (codes[1:] > codes[:-1]) | same_chrom & (
+        (initials[1:] > initials[:-1]) | (initials[1:] == initials[:-1]) & (finals[1:] >= finals[:-1]))
+    if np.all(ordered):
+        return None
+    if n and 0 <= initials.min() and initials.max() < 2 ** 40:
+        # Two stable passes as in a radix sort: by final, then by chromosome and initial packed into one integer
+        order = np.argsort(finals, kind="mergesort")
+        keys = (codes << 40) | initials
+        return order[np.argsort(keys[order], kind="mergesort")]
+    return np.lexsort((finals, initials, codes))
@@ -30,6 +30,7 @@ class GenomicVariantSet(GenomicRegionSet):
         
         """
         self.sequences.sort(cmp = GenomicVariant.__cmp__)
+        self._index = None
         self.sorted = True
          
     def read_vcf(self, vcf_path):
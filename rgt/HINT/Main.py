@@ -969,6 +969,7 @@ def main():
                 mid = (f.initial + f.final) / 2
                 f.initial = max(mid - fp_limit, 0)
                 f.final = f.final + fp_limit
+        footprints.reset_index()
 
         # Evaluating TC
         for f in footprints.sequences:
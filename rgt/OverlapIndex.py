@@ -0,0 +1,232 @@
+"""
+OverlapIndex
+===================
+OverlapIndex answers overlap, count and containment queries against a fixed
+set of regions. The regions of every chromosome are split into layers in
+which both the starts and the ends are sorted (a nested containment list
+flattened into levels), so that the regions overlapping a query form one
+contiguous run found by binary search. A query costs O(L log n + k) for L
+layers (the nesting depth, usually 1 or 2) and k hits, and batches of
+queries are answered with NumPy at once.
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+from __future__ import division
+import numpy as np
+# Internal
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class OverlapIndex:
+    """*Keyword arguments:*
+
+        - regions -- GenomicRegionSet (or GenomicRegionArray) to be indexed. It is not modified.
+
+    The queries use the overlap definition of GenomicRegion.overlap. By default a region r of the index is a hit of
+    the query q if r.overlap(q); with query_first=True it is a hit if q.overlap(r). Both only differ for zero-length
+    regions starting at the same position. Indices refer to the order of the regions in the indexed set.
+    """
+
+    def __init__(self, regions):
+        self.regions = regions
+        if hasattr(regions, "chrom_names"):
+            # GenomicRegionArray
+            regions._flush()
+            chroms = np.array(regions.chrom_names, dtype=object)[regions.chroms]
+            initials, finals = regions.initials, regions.finals
+        else:
+            chroms = np.array([r.chrom for r in regions.sequences], dtype=object)
+            initials = np.array([r.initial for r in regions.sequences], dtype=np.int64)
+            finals = np.array([r.final for r in regions.sequences], dtype=np.int64)
+        self.size = len(initials)
+        self.chroms = {}
+        for chrom in set(chroms.tolist()):
+            rows = np.flatnonzero(chroms == chrom)
+            self.chroms[chrom] = _build_layers(rows, initials[rows], finals[rows])
+
+    def __len__(self):
+        return self.size
+
+    def depth(self):
+        """Return the maximum number of layers of a chromosome (the nesting depth of the regions)."""
+        return max([len(layers) for layers in self.chroms.values()] + [0])
+
+    def _region(self, i):
+        return self.regions[int(i)]
+
+    ###########################################################################
+    # Batched queries
+    ###########################################################################
+
+    def overlap_pairs(self, queries, query_first=False):
+        """Return all overlapping pairs between the query regions and the index.
+
+        *Keyword arguments:*
+
+            - queries -- GenomicRegionSet, GenomicRegionArray or list of GenomicRegions.
+            - query_first -- Use q.overlap(r) instead of r.overlap(q).
+
+        *Return:*
+
+            - Two index arrays (query indices, index indices), sorted by query and then by index.
+        """
+        result_q, result_r = [], []
+        for chrom, rows, initials, finals in _query_columns(queries):
+            for layer in self.chroms.get(chrom, []):
+                lo, hi = _layer_ranges(layer, initials, finals, query_first)
+                counts = np.maximum(hi - lo, 0)
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                offsets = np.cumsum(counts) - counts
+                positions = np.arange(total) - np.repeat(offsets, counts) + np.repeat(lo, counts)
+                result_q.append(np.repeat(rows, counts))
+                result_r.append(layer[0][positions])
+        if not result_q:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        qi = np.concatenate(result_q)
+        ri = np.concatenate(result_r)
+        order = np.lexsort((ri, qi))
+        return qi[order], ri[order]
+
+    def count_regionset(self, queries, query_first=False):
+        """Return an array with the number of overlapping regions for every query region.
+
+        *Keyword arguments:*
+
+            - queries -- GenomicRegionSet, GenomicRegionArray or list of GenomicRegions.
+            - query_first -- Use q.overlap(r) instead of r.overlap(q).
+        """
+        counts = np.zeros(len(queries), dtype=np.int64)
+        for chrom, rows, initials, finals in _query_columns(queries):
+            for layer in self.chroms.get(chrom, []):
+                lo, hi = _layer_ranges(layer, initials, finals, query_first)
+                counts[rows] += np.maximum(hi - lo, 0)
+        return counts
+
+    def include_regionset(self, queries, query_first=False):
+        """Return a boolean array telling for every query region whether it overlaps any region of the index."""
+        return self.count_regionset(queries, query_first) > 0
+
+    ###########################################################################
+    # Single queries
+    ###########################################################################
+
+    def overlap_indices(self, region, query_first=False):
+        """Return the sorted indices of the regions overlapping the given GenomicRegion."""
+        hits = []
+        initials = np.array([region.initial], dtype=np.int64)
+        finals = np.array([region.final], dtype=np.int64)
+        for layer in self.chroms.get(region.chrom, []):
+            lo, hi = _layer_ranges(layer, initials, finals, query_first)
+            if hi[0] > lo[0]:
+                hits.append(layer[0][lo[0]:hi[0]])
+        if not hits:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(hits))
+
+    def overlap(self, region, query_first=False):
+        """Return a GenomicRegionSet with the regions overlapping the given GenomicRegion."""
+        z = GenomicRegionSet("overlap:" + region.toString())
+        for i in self.overlap_indices(region, query_first):
+            z.add(self._region(i))
+        return z
+
+    def count(self, region, query_first=False):
+        """Return the number of regions overlapping the given GenomicRegion."""
+        total = 0
+        initials = np.array([region.initial], dtype=np.int64)
+        finals = np.array([region.final], dtype=np.int64)
+        for layer in self.chroms.get(region.chrom, []):
+            lo, hi = _layer_ranges(layer, initials, finals, query_first)
+            total += max(int(hi[0] - lo[0]), 0)
+        return total
+
+    def include(self, region, query_first=False):
+        """Return True if any region overlaps the given GenomicRegion."""
+        return self.count(region, query_first) > 0
+
+    def contained(self, region):
+        """Return a GenomicRegionSet with the overlapping regions which lie completely within the given region."""
+        z = GenomicRegionSet("contained:" + region.toString())
+        for i in self.overlap_indices(region):
+            r = self._region(i)
+            if r.initial >= region.initial and r.final <= region.final:
+                z.add(r)
+        return z
+
+    def containing(self, region):
+        """Return a GenomicRegionSet with the regions which contain the given region completely."""
+        z = GenomicRegionSet("containing:" + region.toString())
+        for i in self.overlap_indices(region, query_first=True):
+            r = self._region(i)
+            if region.initial >= r.initial and region.final <= r.final:
+                z.add(r)
+        return z
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def _build_layers(rows, initials, finals):
+    """Split the regions of one chromosome into layers with sorted ends.
+
+    The regions are ordered by initial (and longest first); a region goes to the current layer if it does not end
+    before any previous region of the layer, otherwise it is left for the next layer. Regions with the same end, such
+    as duplicates, share a layer. Every layer is a tuple (rows, initials, finals) with both initials and finals
+    sorted.
+    """
+    order = np.lexsort((-finals, initials))
+    rows, initials, finals = rows[order], initials[order], finals[order]
+    layers = []
+    while len(rows):
+        previous = np.maximum.accumulate(finals)
+        keep = np.ones(len(rows), dtype=bool)
+        keep[1:] = finals[1:] >= previous[:-1]
+        layers.append((rows[keep], initials[keep], finals[keep]))
+        rows, initials, finals = rows[~keep], initials[~keep], finals[~keep]
+    return layers
+
+
+def _layer_ranges(layer, initials, finals, query_first):
+    """Return the arrays lo, hi such that layer[0][lo:hi] are the regions overlapping each query.
+
+    In a layer both starts and ends are sorted, so the regions ending after the query start are a suffix and the
+    regions starting before the query end are a prefix; the overlap is their intersection.
+    """
+    layer_initials, layer_finals = layer[1], layer[2]
+    if query_first:
+        # q.overlap(r): r.initial in [q.initial, q.final) or r.initial < q.initial < r.final
+        lo = np.minimum(np.searchsorted(layer_finals, initials, side="right"),
+                        np.searchsorted(layer_initials, initials, side="left"))
+        hi = np.searchsorted(layer_initials, finals, side="left")
+    else:
+        # r.overlap(q): q.initial in [r.initial, r.final) or q.initial < r.initial < q.final
+        lo = np.searchsorted(layer_finals, initials, side="right")
+        hi = np.maximum(np.searchsorted(layer_initials, finals, side="left"),
+                        np.searchsorted(layer_initials, initials, side="right"))
+    return lo, hi
+
+
+def _query_columns(queries):
+    """Yield (chrom, rows, initials, finals) for the query regions of every chromosome."""
+    if hasattr(queries, "chrom_names"):
+        queries._flush()
+        chroms = np.array(queries.chrom_names, dtype=object)[queries.chroms]
+        initials, finals = queries.initials, queries.finals
+    else:
+        chroms = np.array([r.chrom for r in queries], dtype=object)
+        initials = np.array([r.initial for r in queries], dtype=np.int64)
+        finals = np.array([r.final for r in queries], dtype=np.int64)
+    for chrom in set(chroms.tolist()):
+        rows = np.flatnonzero(chroms == chrom)
+        yield chrom, rows, initials[rows], finals[rows]
@@ -0,0 +1,187 @@
+"""
+RegionCache
+===================
+RegionCache keeps parsed BED and bedGraph files in a binary, columnar form
+in a cache directory under the RGT data folder, so that the next read of an
+unchanged file maps NumPy arrays from disk instead of parsing text. Entries
+are keyed by the absolute path, size and modification time of the source
+file; an entry is replaced when its source file changes. When the cache
+grows beyond its size budget, the least recently used entries are removed.
+
+Every entry is a directory with the NumPy columns of a GenomicRegionArray
+(chroms.npy, initials.npy, finals.npy, orientations.npy), the names and
+data columns as byte buffers (names.bin, data.bin) with the bounds of every
+value (names.npy, data.npy), and meta.json with the chromosome and
+orientation tables. All columns are loaded as memory maps; names and data
+become TextColumns, which decode a value only when it is used.
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import ConfigParser
+import numpy as np
+# Internal
+from rgt.Util import CacheData
+from rgt.CoverageCache import evict_entries
+from rgt.GenomicRegionArray import GenomicRegionArray, TextColumn
+
+FORMAT_VERSION = 2
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class RegionCache:
+    """*Keyword arguments:*
+
+        - cache_dir -- directory of the cache (default: regions/ in the [Cache] path of data.config).
+        - max_size -- size budget of the cache in bytes (default: [Cache] max_size of data.config, or 10 GB).
+        - min_file_size -- files smaller than this (in bytes) are not cached by read() unless it is forced
+          (default: [Cache] min_file_size of data.config, or 10 MB).
+    """
+
+    def __init__(self, cache_dir=None, max_size=None, min_file_size=None):
+        if cache_dir is None or max_size is None or min_file_size is None:
+            config = CacheData()
+            if cache_dir is None:
+                cache_dir = os.path.join(config.get_cache_dir(), "regions")
+            if max_size is None:
+                max_size = config.get_max_size()
+            if min_file_size is None:
+                min_file_size = config.get_min_file_size()
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.min_file_size = min_file_size
+
+    def path(self, filename, bedgraph=False):
+        """Return the directory of the cache entry of the given file in its current state."""
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        source = hashlib.sha1(filename).hexdigest()[:16]
+        state = hashlib.sha1(repr((FORMAT_VERSION, stat.st_size, stat.st_mtime, bool(bedgraph)))).hexdigest()[:16]
+        return os.path.join(self.cache_dir, source + "_" + state)
+
+    def load(self, filename, bedgraph=False):
+        """Return the cached GenomicRegionArray of the given file, or None if there is no valid entry."""
+        path = self.path(filename, bedgraph)
+        if not os.path.isdir(path):
+            return None
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if meta["version"] != FORMAT_VERSION:
+                return None
+            z = GenomicRegionArray(os.path.basename(filename))
+            z.fileName = filename
+            z.chrom_names = [str(c) for c in meta["chrom_names"]]
+            z._chrom_codes = dict((c, i) for i, c in enumerate(z.chrom_names))
+            z.orientation_names = [str(o) if o is not None else None for o in meta["orientation_names"]]
+            z._orientation_codes = dict((o, i) for i, o in enumerate(z.orientation_names))
+            for column in ["chroms", "initials", "finals", "orientations"]:
+                setattr(z, column, np.load(os.path.join(path, column + ".npy"), mmap_mode="c"))
+            z.names = _read_text(os.path.join(path, "names"))
+            z.data = _read_text(os.path.join(path, "data"))
+            z.sorted = meta["sorted"]
+            # the modification time of the entry marks its last use
+            os.utime(path, None)
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        return z
+
+    def store(self, filename, regions, bedgraph=False):
+        """Store the GenomicRegionArray parsed from the given file, replacing older entries of the file, and remove
+        the least recently used entries if the cache exceeds its size budget."""
+        regions._flush()
+        path = self.path(filename, bedgraph)
+        prefix = os.path.basename(path).split("_")[0] + "_"
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # Write into a temporary directory first, so that no half written entry is ever seen
+        temp = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp")
+        try:
+            for column in ["chroms", "initials", "finals", "orientations"]:
+                np.save(os.path.join(temp, column + ".npy"), getattr(regions, column))
+            _write_text(os.path.join(temp, "names"), regions.names)
+            _write_text(os.path.join(temp, "data"), regions.data)
+            with open(os.path.join(temp, "meta.json"), "w") as f:
+                json.dump({"version": FORMAT_VERSION, "source": os.path.abspath(filename), "size": len(regions),
+                           "chrom_names": regions.chrom_names, "orientation_names": regions.orientation_names,
+                           "sorted": regions.sorted}, f)
+            for entry in os.listdir(self.cache_dir):
+                if entry.startswith(prefix):
+                    shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+            os.rename(temp, path)
+        except (IOError, OSError):
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+        evict_entries(self.cache_dir, self.max_size)
+
+    def read(self, reader, force=False):
+        """Return the regions of a BedReader as GenomicRegionArray, from the cache if possible; otherwise the file
+        is parsed and the result is stored. Returns None if the file is smaller than min_file_size (unless force)
+        or read with query regions."""
+        if reader.regions is not None:
+            return None
+        if not force and os.path.getsize(reader.filename) < self.min_file_size:
+            return None
+        z = self.load(reader.filename, reader.bedgraph)
+        if z is not None:
+            return z
+        z = GenomicRegionArray(os.path.basename(reader.filename))
+        z.fileName = reader.filename
+        for columns in reader.chunks():
+            z.add_arrays(*columns)
+        z.sorted = reader.sorted
+        try:
+            self.store(reader.filename, z, reader.bedgraph)
+        except (IOError, OSError):
+            print("Cannot write the cache of", reader.filename)
+        return z
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def read_cached(reader, cache=None):
+    """Return the regions of a BedReader as GenomicRegionArray through the default RegionCache, or None if the cache
+    is not used.
+
+    *Keyword arguments:*
+
+        - reader -- BedReader.
+        - cache -- RegionCache to use; True: always use the default cache; False: never; None: for files of at least
+          min_file_size, if the cache is configured and usable.
+    """
+    if cache is False:
+        return None
+    if isinstance(cache, RegionCache):
+        return cache.read(reader, force=True)
+    try:
+        return RegionCache().read(reader, force=bool(cache))
+    except (IOError, OSError, ConfigParser.Error):
+        if cache:
+            raise
+        return None
+
+
+def _write_text(prefix, values):
+    column = values if isinstance(values, TextColumn) else TextColumn.from_values(values)
+    column.buffer.tofile(prefix + ".bin")
+    np.save(prefix + ".npy", column.bounds)
+
+
+def _read_text(prefix):
+    bounds = np.load(prefix + ".npy", mmap_mode="r")
+    if os.path.getsize(prefix + ".bin") == 0:
+        return TextColumn(np.zeros(0, dtype=np.uint8), bounds)
+    return TextColumn(np.memmap(prefix + ".bin", dtype=np.uint8, mode="r"), bounds)
@@ -23,7 +23,7 @@ import numpy as np
 from os import path
 from random import sample
 from rgt.CoverageSet import CoverageSet
-from rgt.CoverageSet import get_gc_context
+from rgt.CoverageSet import get_gc_context, coverage_matrix
 from normalize import get_normalization_factor
 
 EPSILON=1e-320
@@ -81,7 +81,7 @@ class DualCoverageSet():
 
             if not no_gc_content and input['input'] is not None:
                 gc_content_cov, avg_gc_content, gc_hist = get_gc_context(stepsize, binsize, genome_path,
-                                                                         input['cov-input'].coverage, chrom_sizes_dict)
+                                                                         input['cov-input'].coverage, region)
 
                 self._norm_gc_content(input['cov-ip'].coverage, gc_content_cov, avg_gc_content)
                 self._norm_gc_content(input['cov-input'].coverage, gc_content_cov, avg_gc_content)
@@ -106,10 +106,8 @@ class DualCoverageSet():
             input['cov-ip'].write_bigwig(name + '-' + name_bam + '-normalized.bw', chrom_sizes)
 
         # make one array for the coverage
-        self.first_overall_coverage = reduce(lambda x, y: np.concatenate((x, y)),
-                                             [self.cov1.coverage[i] for i in range(len(self.cov1.genomicRegions))])
-        self.second_overall_coverage = reduce(lambda x, y: np.concatenate((x, y)),
-                                              [self.cov2.coverage[i] for i in range(len(self.cov2.genomicRegions))])
+        self.first_overall_coverage = coverage_matrix([self.cov1.coverage])[0]
+        self.second_overall_coverage = coverage_matrix([self.cov2.coverage])[0]
         assert (len(self.first_overall_coverage) == len(self.second_overall_coverage))
 
         self.scores = np.zeros(len(self.first_overall_coverage))
@@ -223,15 +221,16 @@ class DualCoverageSet():
         f.close()
 
     def _norm_gc_content(self, cov, gc_cov, gc_avg):
-        for i in range(len(cov)):
-            assert len(cov[i]) == len(gc_cov[i])
-            #            cov[i] = gc_cov[i]
-            cov[i] = np.array(cov[i])
-            gc_cov[i] = np.array(gc_cov[i])
-            gc_cov[i][gc_cov[i] < EPSILON] = gc_avg  # sometimes zeros occur, do not consider
-            cov[i] = cov[i] * gc_avg / gc_cov[i]
-            cov[i] = cov[i].clip(0, max(max(cov[i]), 0))  # neg. values to 0
-            cov[i] = cov[i].astype(int)
+        assert [len(c) for c in cov] == [len(g) for g in gc_cov]
+        if not cov:
+            return
+        gc = np.concatenate(gc_cov)
+        gc[gc < EPSILON] = gc_avg  # sometimes zeros occur, do not consider
+        # all bins at once; written back in place (truncated to int), the regions stay views of the coverage array
+        values = np.maximum(np.concatenate(cov) * gc_avg / gc, 0)  # neg. values to 0
+        bounds = np.cumsum([0] + [len(c) for c in cov])
+        for c, first, last in zip(cov, bounds[:-1], bounds[1:]):
+            c[:] = values[first:last]
 
     def _index2coordinates(self, index):
         """Translate index within coverage array to genomic coordinates."""
@@ -28,7 +28,7 @@ import numpy as np
 from normalize import get_normalization_factor
 from DualCoverageSet import DualCoverageSet
 from norm_genelevel import norm_gene_level
-from rgt.CoverageSet import CoverageSet, get_gc_context
+from rgt.CoverageSet import CoverageSet, get_gc_context, gc_percent, compute_coverages, coverage_matrix
 
 EPSILON = 1**-320
 ROUND_PRECISION = 3
@@ -37,31 +37,33 @@ VERBOSE = None
 
 
 class MultiCoverageSet(DualCoverageSet):
-    def _help_init(self, path_bamfiles, exts, rmdup, binsize, stepsize, path_inputs, exts_inputs, dim, regions, norm_regionset, strand_cov):
+    def _help_init(self, path_bamfiles, exts, rmdup, binsize, stepsize, path_inputs, exts_inputs, dim, regions, norm_regionset, strand_cov, workers=1):
         """Return self.covs and self.inputs as CoverageSet"""
         self.exts = exts
         self.covs = [CoverageSet('file' + str(i), regions) for i in range(dim)]
-        for i, c in enumerate(self.covs):
-            c.coverage_from_bam(bam_file=path_bamfiles[i], extension_size=exts[i], rmdup=rmdup, binsize=binsize,\
-                                stepsize=stepsize, get_strand_info = strand_cov)
+        jobs = [(c, "coverage_from_bam", dict(bam_file=path_bamfiles[i], extension_size=exts[i], rmdup=rmdup,
+                                               binsize=binsize, stepsize=stepsize, get_strand_info=strand_cov))
+                for i, c in enumerate(self.covs)]
         self.covs_avg = [CoverageSet('cov_avg'  + str(i) , regions) for i in range(2)]
         if path_inputs:
             self.inputs = [CoverageSet('input' + str(i), regions) for i in range(len(path_inputs))]
-            for i, c in enumerate(self.inputs):
-                c.coverage_from_bam(bam_file=path_inputs[i], extension_size=exts_inputs[i], rmdup=rmdup, binsize=binsize,\
-                                stepsize=stepsize, get_strand_info = strand_cov)
+            jobs += [(c, "coverage_from_bam", dict(bam_file=path_inputs[i], extension_size=exts_inputs[i], rmdup=rmdup,
+                                                    binsize=binsize, stepsize=stepsize, get_strand_info=strand_cov))
+                     for i, c in enumerate(self.inputs)]
             self.input_avg = [CoverageSet('input_avg'  + str(i), regions) for i in range(2)]
         else:
             self.inputs = []
             
         if norm_regionset:
             self.norm_regions = [CoverageSet('norm_region' + str(i), norm_regionset) for i in range(dim)]
-            for i, c in enumerate(self.norm_regions):
-                c.coverage_from_bam(bam_file=path_bamfiles[i], extension_size=exts[i], rmdup=rmdup, binsize=binsize,\
-                                    stepsize=stepsize, get_strand_info = strand_cov)
+            jobs += [(c, "coverage_from_bam", dict(bam_file=path_bamfiles[i], extension_size=exts[i], rmdup=rmdup,
+                                                    binsize=binsize, stepsize=stepsize, get_strand_info=strand_cov))
+                     for i, c in enumerate(self.norm_regions)]
             self.input_avg = [CoverageSet('input_avg'  + str(i), regions) for i in range(2)]
         else:
             self.norm_regions = None
+        # all BAM files (and their chromosomes) are read in one pool of processes
+        compute_coverages(jobs, workers=workers)
     
     def _get_covs(self, DCS, i):
         """For a multivariant Coverageset, return coverage cov1 and cov2 at position i"""
@@ -74,11 +76,14 @@ class MultiCoverageSet(DualCoverageSet):
         """Compute GC-content"""
         if not no_gc_content and path_inputs and self.gc_content_cov is None:
             print("Compute GC-content", file=sys.stderr)
+            #the GC content of the bins is the same for all replicates
+            gc = gc_percent(stepsize, binsize, genome_path, self.genomicRegions,
+                            [len(c) for c in self.inputs[0].coverage])
             for i, cov in enumerate(self.covs):
                 inputfile = self.inputs[i] #1 to 1 mapping between input and cov
                 rep = i if i < self.dim_1 else i-self.dim_1
                 sig = 1 if i < self.dim_1 else 2
-                self.gc_content_cov, self.avg_gc_content, self.gc_hist = get_gc_context(stepsize, binsize, genome_path, inputfile.coverage, chrom_sizes_dict)
+                self.gc_content_cov, self.avg_gc_content, self.gc_hist = get_gc_context(stepsize, binsize, genome_path, inputfile.coverage, self.genomicRegions, gc=gc)
                 self._norm_gc_content(cov.coverage, self.gc_content_cov, self.avg_gc_content)
                 self._norm_gc_content(inputfile.coverage, self.gc_content_cov, self.avg_gc_content)
             
@@ -94,13 +99,16 @@ class MultiCoverageSet(DualCoverageSet):
             if self.inputs:
                 self.inputs[i].write_bigwig(name + '-' + str(self.counter) + '-input-s%s-rep%s.bw' %(sig, rep), chrom_sizes, save_wig=save_wig, end=self.end)
     
-    def _output_bw(self, name, chrom_sizes, save_wig, save_input):
-        """Output bigwig files"""
+    def _output_bw(self, name, chrom_sizes, save_wig, save_input, bigwig_writers=None):
+        """Output bigwig files, or add the coverage to the open <bigwig_writers> (one per BAM file)"""
         for i in range(len(self.covs)):
             rep = i if i < self.dim_1 else i-self.dim_1
             sig = 1 if i < self.dim_1 else 2
             
-            self.covs[i].write_bigwig(name + '-' + str(self.counter) + '-s%s-rep%s.bw' %(sig, rep), chrom_sizes, save_wig=save_wig, end=self.end)
+            if bigwig_writers:
+                bigwig_writers[i].write_coverage(self.covs[i])
+            else:
+                self.covs[i].write_bigwig(name + '-' + str(self.counter) + '-s%s-rep%s.bw' %(sig, rep), chrom_sizes, save_wig=save_wig, end=self.end)
         
         #ra = [self.covs_avg, self.input_avg] if self.inputs else [self.covs_avg]
         #for k, d in enumerate(ra):
@@ -123,46 +131,20 @@ class MultiCoverageSet(DualCoverageSet):
         gc.collect()
         
     
-    def _help_get_data(self, i, type):
-        if type != 'normregion':
-            for j in range(len(self.covs[i].genomicRegions)):
-                if type == 'cov':
-                    yield self.covs[i].coverage[j]
-                elif type == 'strand':
-                    yield self.covs[i].cov_strand_all[j]
-        elif type == 'normregion':
-            for j in range(len(self.norm_regions[i].genomicRegions)):
-                yield self.norm_regions[i].coverage[j]
-    
     def _help_init_overall_coverage(self, cov_strand=True):
         """Convert coverage data (and optionally strand data) to matrix list"""
-        
-        tmp = [[], []]
-        tmp2 = [[[], []], [[], []]]
-        
-        for k in range(2):
-            it = range(self.dim_1) if k == 0 else range(self.dim_1, self.dim_1 + self.dim_2)
-            for i in it:
-                if cov_strand:
-                    tmp_el = reduce(lambda x,y: np.concatenate((x,y)), self._help_get_data(i, 'cov'))
-                    tmp[k].append(tmp_el)
-                 
-                    tmp_el = map(lambda x: (x[0], x[1]), reduce(lambda x,y: np.concatenate((x,y)), self._help_get_data(i, 'strand')))
-                    tmp2[k][0].append(map(lambda x: x[0], tmp_el))
-                    tmp2[k][1].append(map(lambda x: x[1], tmp_el))
-                else:
-                    tmp_el = reduce(lambda x,y: np.concatenate((x,y)), self._help_get_data(i, 'normregion'))
-                    tmp[k].append(tmp_el)
-
-        if cov_strand:
-            #1. or 2. signal -> pos/neg strand -> matrix with rep x bins
-            overall_coverage_strand = [[np.matrix(tmp2[0][0]), np.matrix(tmp2[0][1])], [np.matrix(tmp2[1][0]), np.matrix(tmp2[0][1])]]
-            #list of matrices: #replicates (row) x #bins (columns)
-            overall_coverage = [np.matrix(tmp[0]), np.matrix(tmp[1])]
-         
-            return overall_coverage, overall_coverage_strand
-        else:
-            return [np.matrix(tmp[0]), np.matrix(tmp[1])]
+        conditions = [range(self.dim_1), range(self.dim_1, self.dim_1 + self.dim_2)]
+        covs = self.covs if cov_strand else self.norm_regions
+        #list of matrices: #replicates (row) x #bins (columns)
+        overall_coverage = [np.asmatrix(coverage_matrix([covs[i].coverage for i in it])) for it in conditions]
+        if not cov_strand:
+            return overall_coverage
+        
+        #1. or 2. signal -> pos/neg strand -> matrix with rep x bins
+        overall_coverage_strand = [[np.asmatrix(coverage_matrix([[a[:, s] for a in self.covs[i].cov_strand_all]
+                                                                  for i in it])) for s in range(2)]
+                                   for it in conditions]
+        return overall_coverage, overall_coverage_strand
     
     def count_positive_signal(self):
         return np.sum([self.covs[i].coverage for i in range(self.dim_1 + self.dim_2)])
@@ -171,7 +153,8 @@ class MultiCoverageSet(DualCoverageSet):
                  verbose, debug, no_gc_content, rmdup, path_bamfiles, exts, path_inputs, exts_inputs, \
                  factors_inputs, chrom_sizes_dict, scaling_factors_ip, save_wig, strand_cov, housekeeping_genes,\
                  tracker, end, counter, gc_content_cov=None, avg_gc_content=None, gc_hist=None, output_bw=True,\
-                 folder_report=None, report=None, save_input=False, m_threshold=80, a_threshold=95):
+                 folder_report=None, report=None, save_input=False, m_threshold=80, a_threshold=95, workers=1,\
+                 bigwig_writers=None):
         """Compute CoverageSets, GC-content and normalize input-DNA and IP-channel"""
         self.genomicRegions = regions
         self.binsize = binsize
@@ -195,7 +178,8 @@ class MultiCoverageSet(DualCoverageSet):
         VERBOSE = verbose
         
         #make data nice
-        self._help_init(path_bamfiles, exts, rmdup, binsize, stepsize, path_inputs, exts_inputs, sum(dims), regions, norm_regionset, strand_cov = strand_cov)
+        self._help_init(path_bamfiles, exts, rmdup, binsize, stepsize, path_inputs, exts_inputs, sum(dims), regions, norm_regionset, strand_cov = strand_cov,
+                        workers=workers)
         if self.count_positive_signal() < 1:
             self.no_data = True
             return None
@@ -210,7 +194,7 @@ class MultiCoverageSet(DualCoverageSet):
                                       m_threshold, a_threshold)
         
         if output_bw:
-            self._output_bw(name, chrom_sizes, save_wig, save_input) 
+            self._output_bw(name, chrom_sizes, save_wig, save_input, bigwig_writers)
         
         self.scores = np.zeros(len(self.overall_coverage[0]))
         self.indices_of_interest = []
@@ -285,22 +269,20 @@ class MultiCoverageSet(DualCoverageSet):
             return np.asarray(m_values), np.asarray(a_values)
     
     def _norm_TMM(self, overall_coverage, m_threshold, a_threshold):
-        """Normalize with TMM approach, based on PePr"""
+        """Normalize with TMM approach, based on PePr. The M and A values come from the binned coverage
+        <overall_coverage> of the CoverageSets, not from read starts (see normalize.bin_counts)"""
         scaling_factors_ip = []
+        all_ref = np.asarray(np.sum(overall_coverage[0], axis=0) + np.sum(overall_coverage[1], axis=0), dtype='float')/ (self.dim_1 + self.dim_2)
+        mask_ref = all_ref > 0
+        all_ref = all_ref[mask_ref]
         for j, cond_max in enumerate([self.dim_1, self.dim_2]):
             for i in range(cond_max): #normalize all replicates
-                ref = np.asarray(np.sum(overall_coverage[0], axis=0) + np.sum(overall_coverage[1], axis=0), dtype='float')/ (self.dim_1 + self.dim_2)
-                
-                mask_ref = ref > 0
-                ref = ref[mask_ref]
                 data_rep = np.asarray(overall_coverage[j][i,:])[mask_ref]
-                tmp = zip(data_rep, ref, data_rep + ref)
-                tmp.sort(key = lambda x: x[2], reverse=True)
-                tmp = tmp[:min(len(tmp), 10000)]
+                # the 10000 bins with the highest sums, ties in the order of the bins
+                top = np.argsort(-(data_rep + all_ref), kind='mergesort')[:10000]
                 
-                data_rep = np.asarray(map(lambda x: x[0], tmp))
-                ref = np.asarray(map(lambda x: x[1], tmp))
-                assert len(data_rep) == len(ref)
+                data_rep = data_rep[top]
+                ref = all_ref[top]
                 m = data_rep > 0
                 data_rep = data_rep[m]
                 ref = ref[m]
@@ -25,20 +25,25 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # Python
 from __future__ import print_function
 import sys
+import multiprocessing
+from collections import deque
 
 # Internal
-from dpc_help import get_peaks, _fit_mean_var_distr, initialize, merge_output, handle_input
+from dpc_help import get_peaks, _fit_mean_var_distr, initialize, open_bigwig_writers, handle_input
 from tracker import Tracker
 from postprocessing import _output_BED, _output_narrowPeak
 from rgt.THOR.neg_bin_rep_hmm import NegBinRepHMM, get_init_parameters, _get_pvalue_distr
 from rgt.THOR.RegionGiver import RegionGiver
 from rgt.THOR.postprocessing import filter_by_pvalue_strand_lag
+from rgt.CoverageSet import CoverageSet
 from rgt import __version__
 
 # External
 
 
 TEST = False #enable to test THOR locally
+BIN_MEMORY = 100 #estimated bytes per bin and BAM file of a region set which is processed in parallel
+_run = None #state of run_HMM for the processes of the pool
 
 
 def _write_info(tracker, report, **data):
@@ -70,7 +75,7 @@ def train_HMM(region_giver, options, bamfiles, genome, chrom_sizes, dims, inputs
                               housekeeping_genes=options.housekeeping_genes, test=TEST, report=options.report,
                               chrom_sizes_dict=region_giver.get_chrom_dict(), end=True, counter=0, output_bw=False,
                               save_input=options.save_input, m_threshold=options.m_threshold,
-                              a_threshold=options.a_threshold, rmdup=options.rmdup)
+                              a_threshold=options.a_threshold, rmdup=options.rmdup, workers=options.workers)
         if exp_data.count_positive_signal() > len(train_regions.sequences[0]) * 0.00001:
             tracker.write(text=" ".join(map(lambda x: str(x), exp_data.exts)), header="Extension size (rep1, rep2, input1, input2)")
             tracker.write(text=map(lambda x: str(x), exp_data.scaling_factors_ip), header="Scaling factors")
@@ -97,55 +102,129 @@ def train_HMM(region_giver, options, bamfiles, genome, chrom_sizes, dims, inputs
 
 def run_HMM(region_giver, options, bamfiles, genome, chrom_sizes, dims, inputs, tracker, exp_data, m, distr):
     """Run trained HMM chromosome-wise on genomic signal and call differential peaks"""
-    output, pvalues, ratios, no_bw_files = [], [], [], []
+    output, pvalues, ratios = [], [], []
     print("Compute HMM's posterior probabilities and Viterbi path to call differential peaks", file=sys.stderr)
     
-    for i, r in enumerate(region_giver):
-        end = True if i == len(region_giver) - 1 else False
-        print("- taking into account %s" % r.sequences[0].chrom, file=sys.stderr)
-        
-        exp_data = initialize(name=options.name, dims=dims, genome_path=genome, regions=r,
-                              stepsize=options.stepsize, binsize=options.binsize,
-                              bamfiles=bamfiles, exts=exp_data.exts, inputs=inputs,
-                              exts_inputs=exp_data.exts_inputs, debug=options.debug,
-                              verbose=False, no_gc_content=options.no_gc_content,
-                              factors_inputs=exp_data.factors_inputs, chrom_sizes=chrom_sizes,
-                              tracker=tracker, norm_regions=options.norm_regions,
-                              scaling_factors_ip=exp_data.scaling_factors_ip, save_wig=options.save_wig,
-                              housekeeping_genes=options.housekeeping_genes, test=TEST, report=False,
-                              chrom_sizes_dict=region_giver.get_chrom_dict(), gc_content_cov=exp_data.gc_content_cov,
-                              avg_gc_content=exp_data.avg_gc_content, gc_hist=exp_data.gc_hist,
-                              end=end, counter=i, m_threshold=options.m_threshold, a_threshold=options.a_threshold,
-                              rmdup=options.rmdup)
-        if exp_data.no_data:
-            continue
-        
-        no_bw_files.append(i)
-        exp_data.compute_putative_region_index()
+    #the signal of all chromosomes goes into one bigWig file per BAM file
+    chroms = [reg.chrom for reg in region_giver.get_regionset()]
+    bigwig_writers = open_bigwig_writers(bamfiles, dims, options, chrom_sizes, sorted(set(chroms), key=chroms.index))
+    
+    state = dict(region_giver=region_giver, options=options, bamfiles=bamfiles, genome=genome,
+                 chrom_sizes=chrom_sizes, dims=dims, inputs=inputs, tracker=tracker, exp_data=exp_data, m=m,
+                 distr=distr)
+    #the bigWig files are closed (and indexed) even if a chromosome fails
+    try:
+        if options.workers > 1 and len(region_giver) > 1:
+            results = _parallel_results(state, options.workers, options.max_memory)
+        else:
+            results = (_call_peaks(state, i, r, bigwig_writers) for i, r in enumerate(region_giver))
         
-        if exp_data.indices_of_interest is None:
-            continue
+        for inst_ratios, inst_pvalues, inst_output, signal in results:
+            if bigwig_writers and signal:
+                for writer, cov in zip(bigwig_writers, signal):
+                    writer.write_coverage(cov)
+            output += inst_output
+            pvalues += inst_pvalues
+            ratios += inst_ratios
         
-        states = m.predict(exp_data.get_observation(exp_data.indices_of_interest))
+        res_output, res_pvalues, res_filter_pass = filter_by_pvalue_strand_lag(ratios, options.pcutoff, pvalues,
+                                                                               output, options.no_correction,
+                                                                               options.name, options.singlestrand)
         
-        inst_ratios, inst_pvalues, inst_output = get_peaks(name=options.name, states=states, DCS=exp_data,
-                                                           distr=distr, merge=options.merge, exts=exp_data.exts,
-                                                           pcutoff=options.pcutoff, debug=options.debug, p=options.par,
-                                                           no_correction=options.no_correction,
-                                                           deadzones=options.deadzones)
-
-        output += inst_output
-        pvalues += inst_pvalues
-        ratios += inst_ratios
+        _output_BED(options.name, res_output, res_pvalues, res_filter_pass)
+        _output_narrowPeak(options.name, res_output, res_pvalues, res_filter_pass)
+    finally:
+        for writer in bigwig_writers:
+            writer.close()
+
+
+def _call_peaks(state, i, r, bigwig_writers=None, workers=None):
+    """Compute the signal of the i-th region set <r> of the RegionGiver and call its differential peaks with the
+    trained HMM; return the ratios, p-values and peaks. The signal of the BAM files is added to <bigwig_writers>, or
+    else returned as fourth element (list of CoverageSets, None if there is no data)."""
+    options, exp_data = state['options'], state['exp_data']
+    workers = options.workers if workers is None else workers
+    end = True if i == len(state['region_giver']) - 1 else False
+    print("- taking into account %s" % r.sequences[0].chrom, file=sys.stderr)
+    
+    exp_data = initialize(name=options.name, dims=state['dims'], genome_path=state['genome'], regions=r,
+                          stepsize=options.stepsize, binsize=options.binsize,
+                          bamfiles=state['bamfiles'], exts=exp_data.exts, inputs=state['inputs'],
+                          exts_inputs=exp_data.exts_inputs, debug=options.debug,
+                          verbose=False, no_gc_content=options.no_gc_content,
+                          factors_inputs=exp_data.factors_inputs, chrom_sizes=state['chrom_sizes'],
+                          tracker=state['tracker'], norm_regions=options.norm_regions,
+                          scaling_factors_ip=exp_data.scaling_factors_ip, save_wig=options.save_wig,
+                          housekeeping_genes=options.housekeeping_genes, test=TEST, report=False,
+                          chrom_sizes_dict=state['region_giver'].get_chrom_dict(),
+                          gc_content_cov=exp_data.gc_content_cov, avg_gc_content=exp_data.avg_gc_content,
+                          gc_hist=exp_data.gc_hist, end=end, counter=i, m_threshold=options.m_threshold,
+                          a_threshold=options.a_threshold, rmdup=options.rmdup,
+                          workers=workers,
+                          output_bw=bigwig_writers is not None, bigwig_writers=bigwig_writers)
+    if exp_data.no_data:
+        return [], [], [], None
+    
+    signal = None
+    if bigwig_writers is None:
+        signal = []
+        for cov in exp_data.covs:
+            #only the normalized coverage is sent back
+            s = CoverageSet(cov.name, cov.genomicRegions)
+            s.coverage, s.binsize, s.stepsize = cov.coverage, cov.binsize, cov.stepsize
+            signal.append(s)
+    
+    exp_data.compute_putative_region_index()
     
-    res_output, res_pvalues, res_filter_pass = filter_by_pvalue_strand_lag(ratios, options.pcutoff, pvalues, output,
-                                                                           options.no_correction, options.name,
-                                                                           options.singlestrand)
+    if exp_data.indices_of_interest is None:
+        return [], [], [], signal
     
-    _output_BED(options.name, res_output, res_pvalues, res_filter_pass)
-    _output_narrowPeak(options.name, res_output, res_pvalues, res_filter_pass)
+    states = state['m'].predict(exp_data.get_observation(exp_data.indices_of_interest))
     
-    merge_output(bamfiles, dims, options, no_bw_files, chrom_sizes)
+    inst_ratios, inst_pvalues, inst_output = get_peaks(name=options.name, states=states, DCS=exp_data,
+                                                       distr=state['distr'], merge=options.merge, exts=exp_data.exts,
+                                                       pcutoff=options.pcutoff, debug=options.debug, p=options.par,
+                                                       no_correction=options.no_correction,
+                                                       deadzones=options.deadzones, workers=workers)
+    return inst_ratios, inst_pvalues, inst_output, signal
+
+
+def _parallel_results(state, workers, max_memory=0):
+    """Call the differential peaks of the region sets of the RegionGiver in a pool of <workers> processes and yield
+    the results of _call_peaks in the order of the region sets. At most 2 * <workers> region sets are in flight
+    (computed or waiting to be yielded), and their estimated memory stays within <max_memory> GB (if set); a single
+    region set is always processed."""
+    global _run
+    # the trained HMM (its mean-variance function is a lambda) and the other state are inherited by the forked
+    # processes instead of being pickled
+    _run = state
+    pool = multiprocessing.Pool(workers)
+    options = state['options']
+    samples = len(state['bamfiles']) + len(state['inputs'] or [])
+    budget = max_memory * 1024 ** 3
+    pending = deque()
+    in_flight = 0
+    try:
+        for i, r in enumerate(state['region_giver']):
+            size = sum(len(x) for x in r) // options.stepsize * samples * BIN_MEMORY
+            while pending and (len(pending) >= 2 * workers or budget and in_flight + size > budget):
+                done, result = pending.popleft()
+                in_flight -= done
+                yield result.get()
+            pending.append((size, pool.apply_async(_call_peaks_task, (i, r))))
+            in_flight += size
+        while pending:
+            yield pending.popleft()[1].get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        _run = None
+
+
+def _call_peaks_task(i, r):
+    #coverage is computed serially in the processes of the pool
+    return _call_peaks(_run, i, r, workers=1)
 
 
 def main():
@@ -70,24 +70,21 @@ class BinomialHMM(_BaseHMM):
         self.lookup_logpmf = {}
 
     def _compute_log_likelihood(self, X):
-        res = []
+        """Return the log-likelihood of the observations <X> (observations x replicates of both conditions) for each
+        state. The counts are truncated to integers and looked up in a logpmf table per state and condition."""
+        X = np.asarray(X)
+        counts = X.astype(np.int64)
+        n = int(counts.max()) if counts.size else 0
+        res = np.zeros((len(X), self.n_components))
+        cols = [slice(0, self.dim[0]), slice(self.dim[0], self.dim[0] + self.dim[1])] #grab proper observations
+        for i in range(self.n_components): #over number of HMM's state
+            for j in range(self.n_features): #over dim
+                index = (self.p[j][i], self.n[j])
+                if index not in self.lookup_logpmf or len(self.lookup_logpmf[index]) <= n:
+                    self.lookup_logpmf[index] = binom.logpmf(np.arange(n + 1), self.n[j], self.p[j][i])
+                res[:, i] += self.lookup_logpmf[index][counts[:, cols[j]]].sum(axis=1)
         
-        for x in X: #over all observations
-            row = []
-            for i in range(self.n_components): #over number of HMM's state
-                r_sum = 0
-                for j in range(self.n_features): #over dim
-                    it = range(self.dim[0]) if j == 0 else range(self.dim[0], self.dim[0] + self.dim[1]) #grab proper observation
-                    for k in it:
-                        index = (int(x[k]), self.p[j][i], self.n[j])
-                        if not self.lookup_logpmf.has_key( index ):
-                            self.lookup_logpmf[index] = binom.logpmf(x[k], self.n[j], self.p[j][i])
-                        r_sum += self.lookup_logpmf[index]
-                row.append(r_sum)
-        
-            res.append(row)
-        
-        return np.asarray(res)
+        return res
     
 
     def _generate_sample_from_state(self, state, random_state=None):
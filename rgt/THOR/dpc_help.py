@@ -27,10 +27,11 @@ from datetime import datetime
 from rgt.THOR.postprocessing import merge_delete, filter_deadzones
 from MultiCoverageSet import MultiCoverageSet
 from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.BigWigWriter import BigWigWriter
 from rgt.THOR.get_extension_size import get_extension_size
-from rgt.THOR.get_fast_gen_pvalue import get_log_pvalue_new
+from rgt.THOR.get_fast_gen_pvalue import get_log_pvalues
 from input_parser import input_parser
-from rgt.Util import which, npath
+from rgt.Util import npath
 from rgt import __version__
 
 # External
@@ -45,36 +46,15 @@ import matplotlib.pyplot as plt
 FOLDER_REPORT = None
 
 
-def merge_output(bamfiles, dims, options, no_bw_files, chrom_sizes):
+def open_bigwig_writers(bamfiles, dims, options, chrom_sizes, chroms):
+    """Return one BigWigWriter per BAM file; the chromosomes are written one after another (in the order of
+    <chroms>) into the same bigWig file."""
+    writers = []
     for i in range(len(bamfiles)):
         rep = i if i < dims[0] else i - dims[0]
         sig = 1 if i < dims[0] else 2
-
-        temp_bed = npath(options.name + '-s%s-rep%s_temp.bed' % (sig, rep))
-
-        files = [options.name + '-' + str(j) + '-s%s-rep%s.bw' %(sig, rep) for j in no_bw_files]
-        if len(no_bw_files) > len(bamfiles):
-            files = filter(lambda x: isfile(x), files)
-            t = ['bigWigMerge'] + files + [temp_bed]
-            c = " ".join(t)
-            os.system(c)
-
-            os.system("LC_COLLATE=C sort -k1,1 -k2,2n " + temp_bed + ' > ' + temp_bed +'.sort')
-
-            t = ['bedGraphToBigWig', temp_bed + '.sort', chrom_sizes, options.name + '-s%s-rep%s.bw' % (sig, rep)]
-            c = " ".join(t)
-            os.system(c)
-
-            for f in files:
-                os.remove(f)
-            os.remove(temp_bed)
-            os.remove(temp_bed + ".sort")
-        else:
-            ftarget = [options.name + '-s%s-rep%s.bw' %(sig, rep) for j in no_bw_files]
-            for i in range(len(ftarget)):
-                c = ['mv', files[i], ftarget[i]]
-                c = " ".join(c)
-                os.system(c)
+        writers.append(BigWigWriter(options.name + '-s%s-rep%s.bw' % (sig, rep), chrom_sizes, chroms=chroms))
+    return writers
 
 
 def _func_quad_2p(x, a, c):
@@ -222,9 +202,12 @@ def dump_posteriors_and_viterbi(name, posteriors, DCS, states):
     g.close()
 
 
-def _compute_pvalue((x, y, side, distr)):
-    a, b = int(np.mean(x)), int(np.mean(y))
-    return -get_log_pvalue_new(a, b, side, distr)
+def _compute_pvalues(data, distr, workers=1):
+    """Return the p-values (-log10) of the triples (x, y, side) of <data> as array; x and y are lists of counts,
+    whose means (as int) are compared. All p-values are computed in one call of get_log_pvalues."""
+    x = [int(np.mean(d[0])) for d in data]
+    y = [int(np.mean(d[1])) for d in data]
+    return -get_log_pvalues(x, y, [d[2] for d in data], distr, workers)
 
 
 def _get_log_ratio(l1, l2):
@@ -247,7 +230,7 @@ def _get_log_ratio(l1, l2):
         return sys.maxint
 
 
-def _merge_consecutive_bins(tmp_peaks, distr):
+def _merge_consecutive_bins(tmp_peaks, distr, workers=1):
     """Merge consecutive peaks and compute p-value. Return list 
     <(chr, s, e, c1, c2, strand)> and <(pvalue)>"""
     peaks = []
@@ -272,13 +255,13 @@ def _merge_consecutive_bins(tmp_peaks, distr):
             i += 1
         
         side = 'l' if strand == '+' else 'r'
-        pvalues.append((v1, v2, side, distr))
+        pvalues.append((v1, v2, side))
         
         ratio = _get_log_ratio(tmp_pos, tmp_neg)
         peaks.append((c, s, e, v1, v2, strand, ratio))
         i += 1
     
-    pvalues = map(_compute_pvalue, pvalues)
+    pvalues = _compute_pvalues(pvalues, distr, workers).tolist()
     assert len(pvalues) == len(peaks)
     
     return pvalues, peaks
@@ -298,7 +281,7 @@ def _get_covs(DCS, i, as_list=False):
     return cov1, cov2
 
 
-def get_peaks(name, DCS, states, exts, merge, distr, pcutoff, debug, no_correction, deadzones, p=70):
+def get_peaks(name, DCS, states, exts, merge, distr, pcutoff, debug, no_correction, deadzones, p=70, workers=1):
     """Merge Peaks, compute p-value and give out *.bed and *.narrowPeak"""
     exts = np.mean(exts)
     tmp_peaks = []
@@ -318,13 +301,13 @@ def get_peaks(name, DCS, states, exts, merge, distr, pcutoff, debug, no_correcti
         
         tmp_peaks.append((chrom, start, end, cov1, cov2, strand, cov1_strand, cov2_strand))
         side = 'l' if strand == '+' else 'r'
-        tmp_data.append((sum(cov1), sum(cov2), side, distr))
+        tmp_data.append((sum(cov1), sum(cov2), side))
     
     if not tmp_data:
         print('no data', file=sys.stderr)
         return [], [], []
     
-    tmp_pvalues = map(_compute_pvalue, tmp_data)
+    tmp_pvalues = _compute_pvalues(tmp_data, distr, workers)
     per = np.percentile(tmp_pvalues, p)
     
     tmp = []
@@ -334,7 +317,7 @@ def get_peaks(name, DCS, states, exts, merge, distr, pcutoff, debug, no_correcti
             tmp.append(tmp_peaks[j])
     tmp_peaks = tmp
 
-    pvalues, peaks, = _merge_consecutive_bins(tmp_peaks, distr) #merge consecutive peaks and compute p-value
+    pvalues, peaks, = _merge_consecutive_bins(tmp_peaks, distr, workers) #merge consecutive peaks and compute p-value
     regions = merge_delete(exts, merge, peaks, pvalues) #postprocessing, returns GenomicRegionSet with merged regions
     if deadzones:
         regions = filter_deadzones(deadzones, regions)
@@ -419,7 +402,8 @@ def initialize(name, dims, genome_path, regions, stepsize, binsize, bamfiles, ex
                inputs, exts_inputs, factors_inputs, chrom_sizes, verbose, no_gc_content, \
                tracker, debug, norm_regions, scaling_factors_ip, save_wig, housekeeping_genes, \
                test, report, chrom_sizes_dict, counter, end, gc_content_cov=None, avg_gc_content=None, \
-               gc_hist=None, output_bw=True, save_input=False, m_threshold=80, a_threshold=95, rmdup=False):
+               gc_hist=None, output_bw=True, save_input=False, m_threshold=80, a_threshold=95, rmdup=False, workers=1,
+               bigwig_writers=None):
     """Initialize the MultiCoverageSet"""
     regionset = regions
     regionset.sequences.sort()
@@ -442,7 +426,8 @@ def initialize(name, dims, genome_path, regions, stepsize, binsize, bamfiles, ex
                                      tracker=tracker, gc_content_cov=gc_content_cov, avg_gc_content=avg_gc_content,
                                      gc_hist=gc_hist, end=end, counter=counter, output_bw=output_bw,
                                      folder_report=FOLDER_REPORT, report=report, save_input=save_input,
-                                     m_threshold=m_threshold, a_threshold=a_threshold)
+                                     m_threshold=m_threshold, a_threshold=a_threshold, workers=workers,
+                                     bigwig_writers=bigwig_writers)
     return multi_cov_set
 
 
@@ -533,6 +518,13 @@ def handle_input():
                      help="Define the A threshold of percentile for training TMM. [default: %default]")
     group.add_option("--rmdup", default=False, dest="rmdup", action="store_true",
                      help="Remove the duplicate reads [default: %default]")
+    group.add_option("--workers", default=1, dest="workers", type="int",
+                     help="Number of processes computing the coverage of the BAM files (split by file and "
+                          "chromosome) for training; the differential peaks of the chromosomes are then called in "
+                          "parallel. [default: %default]")
+    group.add_option("--max-memory", default=0, dest="max_memory", type="float",
+                     help="Memory budget (in GB) of the chromosomes which are processed in parallel at the same "
+                          "time; 0: no limit. [default: %default]")
     parser.add_option_group(group)
 
     (options, args) = parser.parse_args()
@@ -595,10 +587,6 @@ def handle_input():
         d = str(datetime.now()).replace("-", "_").replace(":", "_").replace(" ", "_").replace(".", "_").split("_")
         options.name = "THOR-exp" + "-" + "_".join(d[:len(d) - 1])
 
-    if not which("wigToBigWig") or not which("bedGraphToBigWig") or not which("bigWigMerge"):
-        print("Warning: wigToBigWig, bigWigMerge or bedGraphToBigWig not found! Signal will not be stored!",
-              file=sys.stderr)
-
     if options.outputdir:
         options.outputdir = npath(options.outputdir)
         if isdir(options.outputdir) and sum(
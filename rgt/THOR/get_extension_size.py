@@ -20,8 +20,8 @@ Estimate extension size of reads for an ChIP-seq experiment.
 
 Author: Manuel Allhoff
 
-Calculate the cross correlation between coverage of forward and backward reads
-on first chromosome.
+Calculate the cross correlation between the read starts of forward and
+backward reads, on windows of several chromosomes, with the FFT.
 Methods is based on:
 
 Kharchenko et al., Design and analysis of ChIP-seq experiments for DNA-binding
@@ -37,15 +37,13 @@ Return shift/extension size of reads descriebed by BAM file.
 """
 
 from __future__ import print_function
+import os
 import pysam
+import numpy as np
 
-cov_f = {}
-cov_r = {}
-
-
-def get_value(d, x):
-    """Return d[x] of dictionary d or 0"""
-    return d[x] if d.has_key(x) else 0
+CHROMOSOMES = 5  # Number of (the longest) chromosomes which are sampled
+WINDOW = 4194304  # Size of the window of each chromosome, from its first read, which is sampled
+_sizes = {}  # (BAM file state, start, end, stepsize) -> result of get_extension_size
 
 
 def get_read_size(filename):
@@ -65,52 +63,57 @@ def get_read_size(filename):
     return sum(s) / len(s)
 
 
-def init_cov(filename):
-    file = pysam.Samfile(filename, "rb")
-
-    for read in file.fetch(file.references[0]):
+def read_starts(bam, chrom, start, end):
+    """Return two arrays (length end - start) which flag the positions where forward and reverse reads of a chromosome
+    start; positions are counted once."""
+    forward = np.zeros(end - start, dtype=np.float64)
+    reverse = np.zeros(end - start, dtype=np.float64)
+    for read in bam.fetch(chrom, start, end):
         if not read.is_unmapped:
-            if not read.seq:
-                h = 0
-            else:
-                h = len(read.seq)
-            pos = read.pos + read.rlen - h if read.is_reverse else read.pos
-            if read.is_reverse:
-                if not cov_r.has_key(pos):
-                    cov_r[pos] = 1
-            else:
-                if not cov_f.has_key(pos):
-                    cov_f[pos] = 1
-
-
-def ccf(k):
-    """Return value of cross-correlation function"""
-    s = 0
-    forward_keys = set(cov_f.keys())
-    reverse_keys = set(map(lambda x: x - k, cov_r.keys()))
-    keys = forward_keys & reverse_keys
-
-    for p in keys:
-        s += get_value(cov_f, p) & get_value(cov_r, p + k)
-
-    return s, k
+            h = len(read.seq) if read.seq else 0
+            pos = (read.pos + read.rlen - h if read.is_reverse else read.pos) - start
+            if 0 <= pos < end - start:
+                (reverse if read.is_reverse else forward)[pos] = 1
+    return forward, reverse
+
+
+def cross_correlation(filename, shifts, chromosomes=CHROMOSOMES, window=WINDOW):
+    """Return the cross correlation of forward and reverse read starts for each shift k, i.e. the number of positions
+    p with a forward read at p and a reverse read at p + k, summed over a window of the <chromosomes> longest
+    chromosomes with reads. The correlation of each window is computed with the FFT."""
+    shifts = np.asarray(shifts)
+    result = np.zeros(len(shifts))
+    bam = pysam.Samfile(filename, "rb")
+    reach = int(np.abs(shifts).max()) if len(shifts) else 0
+    sampled = 0
+    for chrom, length in sorted(zip(bam.references, bam.lengths), key=lambda x: -x[1]):
+        first = next((r.pos for r in bam.fetch(chrom) if not r.is_unmapped), None)
+        if first is None:
+            continue
+        start, end = first, min(first + window, length)
+        forward, reverse = read_starts(bam, chrom, start, end)
+        # zero padding by the largest shift, so that the circular correlation does not wrap around
+        n = 1 << int(np.ceil(np.log2(end - start + reach + 1)))
+        corr = np.fft.irfft(np.conj(np.fft.rfft(forward, n)) * np.fft.rfft(reverse, n), n)
+        result += corr[shifts % n]
+        sampled += 1
+        if sampled == chromosomes:
+            break
+    return np.rint(result).astype(int)
 
 
 def get_extension_size(filename, start=0, end=600, stepsize=5):
     """Return extension/shift size of reads and all computed values of the convolution. 
-    Search value with a resolution of <stepsize> from start to end."""
-    read_length = get_read_size(filename)
-    start -= read_length
-
-    init_cov(filename)
-
-    r = map(ccf, range(start, end, stepsize))
-
-    r = map(lambda x: (x[0], x[1]), r)
-
-    # print('extension size is %s' %max(r[read_length/stepsize*2:])[1])
-
-    return max(r[read_length / stepsize * 2:])[1], r
+    Search value with a resolution of <stepsize> from start to end. The results are kept for each BAM file."""
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_size, stat.st_mtime, start, end, stepsize)
+    if key not in _sizes:
+        read_length = get_read_size(filename)
+        shifts = range(start - read_length, end, stepsize)
+        r = zip(cross_correlation(filename, shifts).tolist(), shifts)
+        # print('extension size is %s' %max(r[read_length/stepsize*2:])[1])
+        _sizes[key] = max(r[read_length / stepsize * 2:])[1], r
+    return _sizes[key]
 
 
 if __name__ == '__main__':
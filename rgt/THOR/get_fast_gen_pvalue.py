@@ -25,34 +25,28 @@ value y follows h2.
 """
 
 from __future__ import print_function
+import multiprocessing
+from collections import OrderedDict
 from scipy.stats import binom
 from math import log
 from sklearn.utils.extmath import logsumexp
 import numpy as np
 from rgt.THOR.neg_bin import NegBin
 
-lookup_pmf = {}
-lookup_pvalue = {}
+CACHE_SIZE = 10000000  # Number of values of the cumulative tables which are kept (over all distributions)
+_tables = OrderedDict()  # (distribution key, N) -> cumulative log-sums, least recently used first
+_cached = 0  # number of values in _tables
+_pmf_tables = {}  # distribution key -> logpmf table of a binomial distribution
 
 
 def get_value(x, distr):
     if distr['distr_name'] == 'binomial':
-        if lookup_pmf.has_key(x):
-            return lookup_pmf[x]
-        else:
-            v = binom.pmf(x, distr['n'], distr['p'])
-            lookup_pmf[x] = v
-            return v
+        return binom.pmf(x, distr['n'], distr['p'])
 
 
 def get_log_value(x, distr):
     if distr['distr_name'] == 'binomial':
-        if lookup_pmf.has_key(x):
-            return lookup_pmf[x]
-        else:
-            v = binom.logpmf(x, distr['n'], distr['p'])
-            lookup_pmf[x] = v
-            return v
+        return _log_pmf(distr, x)[x]
     if distr['distr_name'] == 'nb':
         return distr['distr'].logpdf(x)
         # return nbinom.logpmf(x, distr['n'], distr['p'])
@@ -92,18 +86,100 @@ def compute_pvalue(distr, N, side, current_p, x):
 
 def get_log_pvalue_new(x, y, side, distr):
     """compute log10 p-value"""
+    return get_log_pvalues([x], [y], [side], distr)[0]
+
+
+def get_log_pvalues(x, y, side, distr, workers=1):
+    """Return the log10 p-values of the pairs (x, y) (integer counts) as array.
+
+    For each N = x + y, the p-value of side 'r' is the sum of pmf(i) * pmf(N - i) over i = 0, ..., min(x, N / 2),
+    divided by twice the sum over i = 0, ..., N / 2 (side 'l' swaps x and y). The cumulative log-sums of N are
+    computed once per distribution (in <workers> processes) and kept in a cache of at most CACHE_SIZE values.
+
+    *Keyword arguments:*
+
+        - x, y -- lists or arrays of the counts.
+        - side -- list or array of the sides ('l' or 'r') of the pairs, or one side for all.
+        - distr -- distribution as dict ('distr_name': 'nb' with 'distr': NegBin, or 'binomial' with 'n', 'p').
+        - workers -- number of processes computing the cumulative log-sums of the N not in the cache.
+    """
+    if len(x) == 0:
+        return np.zeros(0)
+    x, y = np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64)
+    left = np.asarray(side, dtype=str) == 'l'
+    x, y = np.where(left, y, x), np.where(left, x, y)
     N = x + y
-    if side == 'l':
-        x, y = y, x
-        side = 'r'
+    k = np.minimum(x, N // 2)
+    key = _distr_key(distr)
+    unique, inverse = np.unique(N, return_inverse=True)
+    tables = {}
+    for n in unique.tolist():
+        if (key, n) in _tables:
+            tables[n] = _tables[(key, n)] = _tables.pop((key, n))
+    missing = [n for n in unique.tolist() if n not in tables]
+    if missing:
+        logpmf = _log_pmf(distr, max(missing))
+        if workers > 1 and len(missing) > 1:
+            chunks = [missing[i::workers] for i in range(workers)]
+            pool = multiprocessing.Pool(workers)
+            try:
+                computed = pool.map(_sum_tables_task, [(logpmf, chunk) for chunk in chunks])
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+            computed = zip([n for chunk in chunks for n in chunk], [t for chunk in computed for t in chunk])
+        else:
+            computed = zip(missing, _sum_tables(logpmf, missing))
+        for n, table in computed:
+            tables[n] = table
+            _cache_table((key, n), table)
+    # the pairs grouped by N
+    order = np.argsort(inverse, kind='mergesort')
+    result = np.empty(len(N))
+    for n, index in zip(unique.tolist(), np.split(order, np.cumsum(np.bincount(inverse))[:-1])):
+        table = tables[n]
+        result[index] = table[k[index]] - (log(2) + table[-1])
+    return result / log(10)
+
+
+def _distr_key(distr):
+    if distr['distr_name'] == 'binomial':
+        return 'binomial', distr['n'], distr['p']
+    return distr['distr_name'], distr['distr'].mu, distr['distr'].alpha
 
-    if lookup_pvalue.has_key((x, y, 'r')):
-        return lookup_pvalue[(x, y, 'r')]
-    else:
-        current_p = get_log_value(x, distr) + get_log_value(y, distr)
-        pvalue = compute_pvalue(distr, N, side, current_p, x) / log(10)
-        lookup_pvalue[(x, y, side)] = pvalue
-        return pvalue
+
+def _log_pmf(distr, n):
+    """Return the log pmf of the distribution for 0, ..., n (at least) as array."""
+    if distr['distr_name'] == 'nb':
+        return distr['distr'].logpdf_table(n)
+    key = _distr_key(distr)
+    if key not in _pmf_tables or len(_pmf_tables[key]) <= n:
+        _pmf_tables[key] = binom.logpmf(np.arange(n + 1), distr['n'], distr['p'])
+    return _pmf_tables[key]
+
+
+def _sum_tables(logpmf, Ns):
+    """Return for each N the cumulative log-sums of logpmf(i) + logpmf(N - i) over i = 0, ..., N / 2."""
+    tables = []
+    for n in Ns:
+        terms = logpmf[:n // 2 + 1] + logpmf[n - n // 2:n + 1][::-1]
+        top = terms.max()
+        with np.errstate(all='ignore'):
+            tables.append(np.log(np.cumsum(np.exp(terms - top))) + top)
+    return tables
+
+
+def _sum_tables_task((logpmf, Ns)):
+    return _sum_tables(logpmf, Ns)
+
+
+def _cache_table(key, table):
+    global _cached
+    _tables[key] = table
+    _cached += len(table)
+    while _cached > CACHE_SIZE and len(_tables) > 1:
+        _cached -= len(_tables.popitem(last=False)[1])
 
 
 def change_nb_WP2NB1(n, p):
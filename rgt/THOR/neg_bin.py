@@ -30,6 +30,7 @@ from numpy.random import random_sample
 import sys
 from math import fabs
 from scipy.stats import nbinom
+from scipy.special import gammaln
 
 class NegBin():
     """Negative Binomial distribution (NB1) with continuous parameter r,
@@ -62,6 +63,7 @@ class NegBin():
         self.map_pdf = {}
         self.map_logpdf = {}
         self.bins = []
+        self.table = None
         mu = float(mu)
         
         self.alpha = alpha
@@ -83,6 +85,21 @@ class NegBin():
             self.map_logpdf[x] = v_log
         
         return self.map_logpdf[x]
+    
+    def logpdf_table(self, n):
+        """Return logpdf(x) for the counts x = 0, ..., n as array; all values are computed at once (in float
+        precision) and kept for the next call. The values agree with logpdf to about 1e-12 (relative) for the usual
+        parameters, but only to about 5e-4 for alpha near 1e-11, where gammaln(x + 1/alpha) loses the digits."""
+        if self.table is None or len(self.table) <= n:
+            x = np.arange(n + 1, dtype=np.float64)
+            mu, v = self.mu, 1. / self.alpha
+            if mu <= 0 or v <= 0:
+                self.table = np.ones(len(x)) #as _get_value_log
+            else:
+                with np.errstate(all='ignore'):
+                    self.table = gammaln(x + v) - gammaln(x + 1) - gammaln(v) + v * log(v) - v * log(v + mu) \
+                                 + x * log(mu) - x * log(v + mu)
+        return self.table[:n + 1]
         
     def rvs(self):
         if not self.bins:
@@ -173,26 +173,17 @@ class NegBinRepHMM(_BaseHMM):
                 return 1e-300
     
     def _compute_log_likelihood(self, X):
-        matrix = []
-        lookup = {}
-        for x in X: #over all observations
-            row = []
-            for i in range(self.n_components): #over number of HMM's state
-                r_sum = 0
-                for j in range(self.n_features): #over dim
-                    it = range(self.dim[0]) if j == 0 else range(self.dim[0], self.dim[0] + self.dim[1]) #grab proper ob
-                    for k in it:
-                        index = (int(x[k]), i, j)
-                        if lookup.has_key( index ):
-                            r_sum += lookup[index]
-                        else:
-                            y = float(self.neg_distr[j,i].logpdf(x[k]))
-                            lookup[index] = y
-                            r_sum += y
-                row.append(r_sum)
-        
-            matrix.append(row)
-        return np.asarray(matrix)
+        """Return the log-likelihood of the observations <X> (observations x replicates of both conditions) for each
+        state. The counts are truncated to integers and looked up in the logpdf table of each distribution."""
+        X = np.asarray(X)
+        counts = X.astype(np.int64)
+        n = int(counts.max()) if counts.size else 0
+        matrix = np.zeros((len(X), self.n_components))
+        cols = [slice(0, self.dim[0]), slice(self.dim[0], self.dim[0] + self.dim[1])] #grab proper observations
+        for i in range(self.n_components): #over number of HMM's state
+            for j in range(self.n_features): #over dim
+                matrix[:, i] += self.neg_distr[j, i].logpdf_table(n)[counts[:, cols[j]]].sum(axis=1)
+        return matrix
     
     
     def _generate_sample_from_state(self, state, random_state=None):
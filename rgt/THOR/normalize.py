@@ -27,10 +27,10 @@ Features must have same length in both input files.
 
 from __future__ import print_function
 from optparse import OptionParser
-from HTSeq import GenomicPosition, GenomicArray, GenomicInterval
 from math import fabs
-import pysam, sys, operator, os.path
-from itertools import chain
+from array import array
+import pysam, sys, os.path
+import numpy as np
 
 
 class HelpfulOptionParser(OptionParser):
@@ -41,17 +41,6 @@ class HelpfulOptionParser(OptionParser):
         self.exit(2, "\n%s: error: %s\n" % (self.get_prog_name(), msg))
 
 
-def _accumulate(iterable):
-    """Return running totals"""
-    it = iter(iterable)
-    total = next(it)
-    yield [total[0], total[1]]
-    for e1, e2 in it:
-        total[0] = total[0] + e1
-        total[1] = total[1] + e2
-        yield [total[0], total[1]]
-
-
 def get_feature_len(path):
     """Return length of reads"""
     filename, fileextension = os.path.splitext(path)
@@ -85,8 +74,10 @@ def _get_read_info(path):
 
 
 def get_count_list(CHROM_LEN, path, stop=False):
-    """Compute list of read's starting positions based on HTSeq's genomic array."""
-    genomic_array = GenomicArray(CHROM_LEN, stranded=False, typecode='i', storage='step')
+    """Compute the read's starting positions of every chromosome.
+    It returns a dict like {'chr1': array([10, 500, ...]), ...} of NumPy arrays and the set of chromosomes of the
+    reads."""
+    positions = {}
     i = 0
     chromosomes = set()
     for chrom, pos in _get_read_info(path):
@@ -100,31 +91,30 @@ def get_count_list(CHROM_LEN, path, stop=False):
 
         if chrom not in chromosomes:
             chromosomes.add(chrom)
+            positions[chrom] = array('l')
 
-        # ignore reads that fall out of chromosome borders, should not be necassary!
-        if chrom not in CHROM_LEN.keys() or pos >= CHROM_LEN[chrom] or pos < 0:
-            # print("illegal read on chromosome %s at positions %s not"%(chrom, pos), file=sys.stderr)
-            continue
-
-        genomic_array[GenomicPosition(chrom, pos)] += 1
-
-    # print('count_list', i, file=sys.stderr)
+        positions[chrom].append(pos)
 
-    return genomic_array, chromosomes
+    count_list = {}
+    for chrom, pos in positions.items():
+        # ignore reads that fall out of chromosome borders, should not be necassary!
+        if chrom in CHROM_LEN:
+            pos = np.frombuffer(pos, dtype=np.int_).astype(np.int64)
+            count_list[chrom] = pos[(pos >= 0) & (pos < CHROM_LEN[chrom])]
 
+    return count_list, chromosomes
 
-def _get_overrun(chrom, i, end, step_width, count_list, feature_len):
-    """Return overrun of reads that fall in two bins"""
-    help_c1 = filter(lambda x: x[0].start + feature_len > end and x[1] is not 0,
-                     list(count_list[GenomicInterval(chrom, i, end)].steps()))
-    overrun = 0 if not help_c1 else sum(map(lambda x: x[1], help_c1))
 
-    return overrun
+def bin_counts(starts, chrom_len, step_width):
+    """Return the number of reads starting in each bin of length <step_width> of a chromosome (the last bin may be
+    shorter) as NumPy array. The read starts must lie within the chromosome."""
+    starts = np.asarray(starts, dtype=np.int64)
+    return np.bincount(starts // step_width, minlength=(chrom_len + step_width - 1) // step_width)
 
 
 def write_pq_list(pq_list, max_index, max_value, factor1, factor2, filename):
     """Write p,q-list to file"""
-    if pq_list:
+    if pq_list is not None and len(pq_list):
         with open(filename, 'w') as f:
             print('#max index', 'max value', 'factor1', 'factor2', sep='\t', file=f)
             print('#' + str(max_index), str(max_value), str(factor1), str(factor2), sep='\t', file=f)
@@ -136,49 +126,36 @@ def get_bins(chrom_len, chromosomes, count_list, step_width, feature_len):
     """Creates list of bins of length <step_width> with values describing 
     the number of reads that fall into a bin.
     <count_list> has to be created with 'get_count_list' 
-    It returns a dict like: {'chr1' [0,10,2,0,...], 'chr2' ...} 
-    where the first list entry gives the first bin and so on."""
+    It returns a dict like: {'chr1' array([0,10,2,0,...]), 'chr2' ...} 
+    where the first entry gives the first bin and so on."""
     result = {}
+    empty = np.zeros(0, dtype=np.int64)
     for chrom in chromosomes:
-        overrun = 0
-        if not chrom_len.has_key(chrom):
-            #             print("Warning: %s not found, do not consider" %chrom, file=sys.stderr)
-            pass
-        else:
-            # print("... considering %s..."%chrom, file=sys.stderr)
-            for i in range(0, chrom_len[chrom], step_width):
-                end = min(i + step_width, chrom_len[chrom])
-                counts = reduce(lambda x, y: x + y, count_list[GenomicInterval(chrom, i, end)])
-                count_list[GenomicInterval(chrom, i, end)] = 0
-                counts += overrun
-
-                if chrom in result.keys():
-                    result[chrom].append(counts)
-                else:
-                    result[chrom] = [counts]
-
-                overrun = _get_overrun(chrom, i, end, step_width, count_list, feature_len)
+        if chrom_len.has_key(chrom):
+            # reads are counted in the bin they start in; the overrun of the former HTSeq implementation was taken
+            # from the bin after its counts had been reset and was always 0, so <feature_len> is not used
+            result[chrom] = bin_counts(count_list.get(chrom, empty), chrom_len[chrom], step_width)
 
     return result
 
 
 def _get_lists(count_list, zero_counts, two_sample=False):
     if two_sample:
-        count_list.sort(key=lambda x: x[0] + x[1])
+        count_list = count_list[np.argsort(count_list.sum(axis=1), kind='mergesort')]
         if not zero_counts:
-            count_list = filter(lambda x: x[0] != 0.0 or x[1] != 0.0, count_list)
-        pre_pq_list = list(_accumulate(count_list))
-        pq_list = pre_pq_list
+            count_list = count_list[(count_list[:, 0] != 0) | (count_list[:, 1] != 0)]
+        pq_list = np.cumsum(count_list, axis=0)
         max_index = int(len(pq_list) * 0.5)
         max_value = fabs(pq_list[max_index][1] - pq_list[max_index][0])
     else:
-        count_list.sort(key=lambda a: a[0])
+        count_list = count_list[np.argsort(count_list[:, 0], kind='mergesort')]
         if not zero_counts:
-            count_list = filter(lambda x: x[0] != 0.0, count_list)
-        pre_pq_list = list(_accumulate(count_list))
+            count_list = count_list[count_list[:, 0] != 0]
+        pre_pq_list = np.cumsum(count_list, axis=0)
         # get k, a from Diaz et al., 2012, compute p, q from Diaz et al., 2012
-        pq_list = map(lambda x: [x[0] / float(pre_pq_list[-1][0]), x[1] / float(pre_pq_list[-1][1])], pre_pq_list)
-        max_index, max_value = max(enumerate(map(lambda x: fabs(x[0] - x[1]), pq_list)), key=operator.itemgetter(1))
+        pq_list = pre_pq_list / pre_pq_list[-1].astype(float)
+        max_index = int(np.argmax(np.abs(pq_list[:, 0] - pq_list[:, 1])))
+        max_value = fabs(pq_list[max_index][0] - pq_list[max_index][1])
 
     return pq_list, max_index, max_value, \
            float(pq_list[max_index][0]) / pq_list[max_index][1], \
@@ -197,10 +174,10 @@ def get_binstats(chrom_len, count_list_1, count_list_2, feature_len, chromosomes
 
     counts_dict_2 = get_bins(chrom_len, chromosomes, count_list_2, step_width, feature_len)
     counts_dict_1 = get_bins(chrom_len, chromosomes, count_list_1, step_width, feature_len)
-    # merge values with zip, obtain [ [(),()...], [(),(),..] ]
-    tmp_list = [zip(counts_dict_1[chrom], counts_dict_2[chrom]) for chrom in counts_dict_2.keys()]
-    # convert tmp_list to [[],[],[]...]
-    count_list = map(lambda x: list(x), list(chain.from_iterable(tmp_list)))
+    # merge values, obtain one row (x, y) per bin
+    chroms = counts_dict_2.keys()
+    count_list = np.column_stack((np.concatenate([counts_dict_1[chrom] for chrom in chroms]),
+                                  np.concatenate([counts_dict_2[chrom] for chrom in chroms])))
 
     return _get_lists(count_list, zero_counts, two_sample)
 
@@ -208,7 +185,7 @@ def get_binstats(chrom_len, count_list_1, count_list_2, feature_len, chromosomes
 def work(first_path, second_path, step_width, zero_counts, two_sample, chrom_sizes_dict, stop):
     """work"""
     CHROM_LEN = chrom_sizes_dict  # CHROM_LEN_HUMAN if genome == 'hg19' else CHROM_LEN_MOUSE
-    # counts_1, counts_1 is a genomicarray (HTSeq) describing chr und pos of reads
+    # counts_1, counts_2 are dicts of arrays describing the starting positions of the reads per chromosome
     # print("Reading first input file...", file=sys.stderr)
     counts_1, chromosomes1 = get_count_list(CHROM_LEN, first_path, stop=stop)
 
@@ -249,13 +226,12 @@ def get_normalization_factor(first_path, second_path, step_width, zero_counts, f
     # print("norm sums 1 : ", sum([i for (i,j) in pq_list]), file=sys.stderr)
     # print("norm sums 2 : ", sum([j for (i,j) in pq_list]), file=sys.stderr)
 
-    if pq_list == None:
+    if pq_list is None:
         return None, None
 
     if two_sample:
         l = 0.5
-        s1 = sum([i for (i, j) in pq_list[:int(len(pq_list) * l)]])
-        s2 = sum([j for (i, j) in pq_list[:int(len(pq_list) * l)]])
+        s1, s2 = pq_list[:int(len(pq_list) * l)].sum(axis=0)
 
         # print("norm sums half: ", s1, s2, file=sys.stderr)
 
@@ -25,6 +25,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 from __future__ import print_function
 from rgt.GenomicRegion import GenomicRegion
 from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.OverlapIndex import OverlapIndex
 import sys
 # import re
 from scipy.stats.mstats import zscore
@@ -169,10 +170,17 @@ def _output_narrowPeak(name, output, pvalues, filter):
 def filter_deadzones(bed_deadzones, peak_regions):
     """Filter by peaklist by deadzones"""
     deadzones = GenomicRegionSet('deadzones')
-    deadzones.read_bed(bed_deadzones)
-    peak_regions = peak_regions.subtract(deadzones, whole_region=True)
-    
-    return peak_regions
+    # Only the deadzones around the peaks are needed (through the tabix index if the file has one)
+    deadzones.read_bed(bed_deadzones, regions=peak_regions)
+    if len(deadzones) == 0:
+        return peak_regions
+    
+    peak_regions.sort()
+    hit = OverlapIndex(deadzones).include_regionset(peak_regions, query_first=True)
+    z = GenomicRegionSet(peak_regions.name + ' - ' + deadzones.name)
+    z.sequences = [r for r, h in zip(peak_regions.sequences, hit) if not h]
+    z.sorted = True
+    return z
     
 if __name__ == '__main__':
     ext_size1 = int(sys.argv[1]) #100
@@ -315,6 +315,46 @@ class Library_path(ConfigurationFile):
         return self.path_c_rgt
 
 
+class CacheData(ConfigurationFile):
+    """Represent the cache of parsed region files and coverage (see rgt.RegionCache and rgt.CoverageCache). Inherits
+    ConfigurationFile."""
+
+    def __init__(self):
+        ConfigurationFile.__init__(self)
+        if self.config.has_option("Cache", "path"):
+            self.cache_dir = self.config.get("Cache", "path")
+        else:
+            self.cache_dir = os.path.join(self.data_dir, "cache")
+        if self.config.has_option("Cache", "min_file_size"):
+            self.min_file_size = self.config.getint("Cache", "min_file_size")
+        else:
+            self.min_file_size = 10 * 1024 * 1024
+        if self.config.has_option("Cache", "max_size"):
+            self.max_size = self.config.getint("Cache", "max_size")
+        else:
+            self.max_size = 10 * 1024 * 1024 * 1024
+        if self.config.has_option("Cache", "gc_max_size"):
+            self.gc_max_size = self.config.getint("Cache", "gc_max_size")
+        else:
+            self.gc_max_size = 8 * 1024 * 1024 * 1024
+
+    def get_cache_dir(self):
+        """Returns the path to the cache directory."""
+        return self.cache_dir
+
+    def get_min_file_size(self):
+        """Returns the minimum size (in bytes) of files which are cached automatically."""
+        return self.min_file_size
+
+    def get_max_size(self):
+        """Returns the size budget (in bytes) of the coverage cache and of the region cache."""
+        return self.max_size
+
+    def get_gc_max_size(self):
+        """Returns the size budget (in bytes) of the GC tracks of genomes (see rgt.GCTrack)."""
+        return self.gc_max_size
+
+
 class OverlapType:
     """Class of overlap type constants.
 
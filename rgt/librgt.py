@@ -0,0 +1,260 @@
+"""
+librgt
+===================
+librgt binds the C library of RGT (c/librgt.c). The shared library is loaded
+once per process and the function signatures are declared once. Region sets
+are handed over as contiguous NumPy int32 arrays (chromosome codes, initials,
+finals) without copying, and results come back in caller-allocated NumPy
+arrays.
+
+Libraries built before the chromosome-code functions existed are still
+supported through the original functions taking chromosome names.
+
+"""
+###############################################################################
+# Libraries
+###############################################################################
+# Python
+from __future__ import print_function
+from ctypes import cdll, byref, POINTER, c_int, c_double, c_char_p
+import numpy as np
+from numpy.ctypeslib import ndpointer
+# Internal
+from rgt.Util import Library_path, OverlapType
+
+###############################################################################
+# Library
+###############################################################################
+
+_int_array = ndpointer(dtype=np.int32, ndim=1, flags="C_CONTIGUOUS")
+_string_set = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int]
+_code_set = [_int_array, _int_array, _int_array, c_int]
+_library = None
+
+
+def get_library():
+    """Return the loaded C library with declared signatures. It is loaded only once per process."""
+    global _library
+    if _library is None:
+        lib = cdll.LoadLibrary(Library_path().get_c_rgt())
+
+        for name in ["intersectGenomicRegionSetsOverlap", "intersectGenomicRegionSetsOriginal",
+                     "intersectGenomicRegionSetsCompletelyIncluded"]:
+            function = getattr(lib, name)
+            function.argtypes = _string_set + _string_set + [POINTER(POINTER(c_int))] * 3 + [POINTER(c_int)]
+            function.restype = None
+        lib.jaccard.argtypes = _string_set + _string_set
+        lib.jaccard.restype = c_double
+
+        if has_codes(lib):
+            lib.intersectGenomicRegionSetsCodes.argtypes = [c_int] + _code_set + _code_set + [_int_array] * 3 + [c_int]
+            lib.intersectGenomicRegionSetsCodes.restype = c_int
+            lib.jaccardCodes.argtypes = _code_set + _code_set
+            lib.jaccardCodes.restype = c_double
+        if has_sweeps(lib):
+            lib.mergeGenomicRegionsCodes.argtypes = [_int_array] * 4 + [c_int] + [_int_array] * 3
+            lib.mergeGenomicRegionsCodes.restype = c_int
+            lib.clusterGenomicRegionsCodes.argtypes = [_int_array] * 3 + [c_int, c_int] + [_int_array] * 3
+            lib.clusterGenomicRegionsCodes.restype = c_int
+            lib.subtractGenomicRegionSetsCodes.argtypes = _code_set + _code_set + [c_int] + [_int_array] * 3 + [c_int]
+            lib.subtractGenomicRegionSetsCodes.restype = c_int
+        _library = lib
+    return _library
+
+
+def has_codes(lib=None):
+    """Return True if the library provides the functions with chromosome codes."""
+    if lib is None:
+        lib = get_library()
+    return hasattr(lib, "intersectGenomicRegionSetsCodes")
+
+
+def has_sweeps(lib=None):
+    """Return True if the library provides the sweep-line functions (merge, cluster, subtract). Returns False as
+    well if the library cannot be loaded, so that the callers can fall back to Python."""
+    if lib is None:
+        try:
+            lib = get_library()
+        except OSError:
+            return False
+    return hasattr(lib, "subtractGenomicRegionSetsCodes")
+
+
+###############################################################################
+# Columns
+###############################################################################
+
+def chromosome_codes(*regionsets):
+    """Return a dictionary chromosome -> code for the given GenomicRegionSets. The codes are ordered like the
+    chromosome names, so that they sort the regions as GenomicRegion.__cmp__ does."""
+    names = set()
+    for regions in regionsets:
+        names.update(regions.get_index().keys())
+    return dict((name, code) for code, name in enumerate(sorted(names)))
+
+
+def code_columns(regions, codes):
+    """Return the int32 arrays (chromosome codes, initials, finals) of a GenomicRegionSet, which is sorted if
+    necessary."""
+    chroms, initials, finals = regions.get_columns()
+    chrom_codes = np.zeros(len(initials), dtype=np.int32)
+    for chrom, lo, hi in chroms:
+        chrom_codes[lo:hi] = codes[chrom]
+    return chrom_codes, initials, finals
+
+
+def _string_columns(regions):
+    """Return the ctypes arguments of the functions with chromosome names for a GenomicRegionSet."""
+    chroms, initials, finals = regions.get_columns()
+    names = []
+    for chrom, lo, hi in chroms:
+        names.extend([chrom] * (hi - lo))
+    return ((c_char_p * len(names))(*names), initials.ctypes.data_as(POINTER(c_int)),
+            finals.ctypes.data_as(POINTER(c_int)), len(names))
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def intersect(a, b, mode=OverlapType.OVERLAP):
+    """Return the intersection of two GenomicRegionSets as computed by the C library.
+
+    *Keyword arguments:*
+
+        - a, b -- GenomicRegionSets (sorted if necessary; they are not merged here).
+        - mode -- OverlapType.OVERLAP, OverlapType.ORIGINAL or OverlapType.COMP_INCL.
+
+    *Return:*
+
+        - indices -- int32 array with the index of the region of a each result region belongs to
+        - initials, finals -- int32 arrays with the positions of the result regions
+    """
+    if has_codes():
+        return _intersect_codes(a, b, mode)
+    return _intersect_names(a, b, mode)
+
+
+def _intersect_codes(a, b, mode):
+    """intersect() with chromosome codes. The result buffers are enlarged if the C function reports more regions."""
+    lib = get_library()
+    codes = chromosome_codes(a, b)
+    columns_a = code_columns(a, codes)
+    columns_b = code_columns(b, codes)
+    capacity = len(a) + len(b)
+    while True:
+        indices = np.empty(capacity, dtype=np.int32)
+        initials = np.empty(capacity, dtype=np.int32)
+        finals = np.empty(capacity, dtype=np.int32)
+        size = lib.intersectGenomicRegionSetsCodes(mode, columns_a[0], columns_a[1], columns_a[2], len(a),
+                                                   columns_b[0], columns_b[1], columns_b[2], len(b),
+                                                   indices, initials, finals, capacity)
+        if size <= capacity:
+            return indices[:size], initials[:size], finals[:size]
+        capacity = size
+
+
+def _intersect_names(a, b, mode):
+    """intersect() with the original functions taking chromosome names, for libraries built before the codes.
+
+    These functions cannot report a too small result buffer, so it is sized for the worst case: every result region
+    comes from a different overlapping pair of regions of a and b, and the pairs are counted with an OverlapIndex.
+    """
+    from rgt.OverlapIndex import OverlapIndex
+    lib = get_library()
+    if mode == OverlapType.OVERLAP:
+        function = lib.intersectGenomicRegionSetsOverlap
+    elif mode == OverlapType.ORIGINAL:
+        function = lib.intersectGenomicRegionSetsOriginal
+    else:
+        function = lib.intersectGenomicRegionSetsCompletelyIncluded
+    capacity = max(int(OverlapIndex(b).count_regionset(a, query_first=True).sum()), 1)
+    indices = np.empty(capacity, dtype=np.int32)
+    initials = np.empty(capacity, dtype=np.int32)
+    finals = np.empty(capacity, dtype=np.int32)
+    pointers = [x.ctypes.data_as(POINTER(c_int)) for x in [indices, initials, finals]]
+    size = c_int()
+    function(*(_string_columns(a) + _string_columns(b) + tuple(byref(p) for p in pointers) + (byref(size),)))
+    return indices[:size.value], initials[:size.value], finals[:size.value]
+
+
+def jaccard(a, b):
+    """Return the jaccard index of two GenomicRegionSets as computed by the C library."""
+    lib = get_library()
+    if has_codes(lib):
+        codes = chromosome_codes(a, b)
+        columns_a = code_columns(a, codes)
+        columns_b = code_columns(b, codes)
+        return lib.jaccardCodes(columns_a[0], columns_a[1], columns_a[2], len(a),
+                                columns_b[0], columns_b[1], columns_b[2], len(b))
+    return lib.jaccard(*(_string_columns(a) + _string_columns(b)))
+
+
+def merge(regions, keys=None):
+    """Merge the overlapping regions of a sorted GenomicRegionSet.
+
+    *Keyword arguments:*
+
+        - regions -- GenomicRegionSet.
+        - keys -- Optional sequence of integers, one per region; only regions with the same key are merged.
+
+    *Return:*
+
+        - indices -- int32 array with the index of the first region of every merged region
+        - initials, finals -- int32 arrays with the positions of the merged regions
+    """
+    lib = get_library()
+    size = len(regions)
+    chroms, initials, finals = code_columns(regions, chromosome_codes(regions))
+    if keys is None:
+        keys = np.zeros(size, dtype=np.int32)
+    else:
+        keys = np.ascontiguousarray(keys, dtype=np.int32)
+    indices = np.empty(size, dtype=np.int32)
+    initials_r = np.empty(size, dtype=np.int32)
+    finals_r = np.empty(size, dtype=np.int32)
+    size = lib.mergeGenomicRegionsCodes(chroms, initials, finals, keys, size, indices, initials_r, finals_r)
+    return indices[:size], initials_r[:size], finals_r[:size]
+
+
+def cluster(regions, distance):
+    """Cluster the regions of a sorted GenomicRegionSet within the given distance. Returns the same arrays as
+    merge()."""
+    lib = get_library()
+    size = len(regions)
+    chroms, initials, finals = code_columns(regions, chromosome_codes(regions))
+    indices = np.empty(size, dtype=np.int32)
+    initials_r = np.empty(size, dtype=np.int32)
+    finals_r = np.empty(size, dtype=np.int32)
+    size = lib.clusterGenomicRegionsCodes(chroms, initials, finals, size, int(distance), indices, initials_r, finals_r)
+    return indices[:size], initials_r[:size], finals_r[:size]
+
+
+def subtract(a, b, whole_region=False):
+    """Subtract the regions of b from the regions of a in one pass.
+
+    *Keyword arguments:*
+
+        - a -- GenomicRegionSet (sorted if necessary).
+        - b -- merged GenomicRegionSet.
+        - whole_region -- Remove the overlapping regions of a completely.
+
+    *Return:*
+
+        - The same arrays as intersect().
+    """
+    lib = get_library()
+    codes = chromosome_codes(a, b)
+    columns_a = code_columns(a, codes)
+    columns_b = code_columns(b, codes)
+    capacity = len(a) + len(b)
+    while True:
+        indices = np.empty(capacity, dtype=np.int32)
+        initials = np.empty(capacity, dtype=np.int32)
+        finals = np.empty(capacity, dtype=np.int32)
+        size = lib.subtractGenomicRegionSetsCodes(columns_a[0], columns_a[1], columns_a[2], len(a),
+                                                  columns_b[0], columns_b[1], columns_b[2], len(b),
+                                                  int(bool(whole_region)), indices, initials, finals, capacity)
+        if size <= capacity:
+            return indices[:size], initials[:size], finals[:size]
+        capacity = size
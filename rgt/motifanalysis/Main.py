@@ -454,8 +454,8 @@ def main_matching():
         # Initializing output bed file
         output_bed_file = os.path.join(output_location, genomic_region_set.name + "_mpbs.bed")
 
-        # GenomicRegionSet where all found MPBS regions are added
-        output_grs = GenomicRegionSet("output")
+        # Sorted GenomicRegionSets of the MPBSs found per region and motif
+        mpbs_sets = []
 
         # Iterating on genomic regions
         for genomic_region in genomic_region_set.sequences:
@@ -465,10 +465,11 @@ def main_matching():
 
             for motif in motif_list:
                 grs = match_single(motif, sequence, genomic_region, unique_threshold, options.normalize_bitscore,
-                                   # supposedly, python sort implementation works best with partially sorted sets
                                    sort=True)
-                output_grs.combine(grs, change_name=False)
+                mpbs_sets.append(grs)
 
+        # Merging the sorted sets at once gives the sorted set of all MPBSs
+        output_grs = GenomicRegionSet.concatenate(mpbs_sets, name="output")
         output_grs.sort()
 
         # writing sorted regions to BED file
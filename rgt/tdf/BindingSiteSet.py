@@ -87,6 +87,7 @@ class BindingSiteSet(GenomicRegionSet):
     def sort(self):
         """Sort Elements by criteria defined by a GenomicRegion."""
         self.sequences.sort(cmp = GenomicRegion.__cmp__)
+        self._index = None
         self.sorted = True
     
     def get_bs(self, orientation):
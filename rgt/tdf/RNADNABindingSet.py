@@ -9,6 +9,7 @@ import pysam
 from rgt.GenomicRegion import *
 from rgt.GenomicRegionSet import *
 from rgt.Util import OverlapType
+from rgt.OverlapIndex import OverlapIndex
 from BindingSiteSet import BindingSite, BindingSiteSet
 
 class RNADNABinding:
@@ -154,6 +155,12 @@ class RNADNABindingSet:
         self.sequences = sorted(self.sequences, key=lambda x: x.dna, cmp=GenomicRegion.__cmp__)
         self.sorted_dna = True
     
+    def dbs_index(self):
+        """Return an OverlapIndex of the DNA binding sites; its indices refer to self.sequences"""
+        dbss = GenomicRegionSet("DNA_binding_sites")
+        dbss.sequences = [rd.dna for rd in self.sequences]
+        return OverlapIndex(dbss)
+
     def sort_dbs_by_regions(self, regionset):
         """Sort the DBS by given GenomicRegionSet"""
         dbss = self.get_dbs(sort=True)
@@ -161,44 +168,12 @@ class RNADNABindingSet:
         result = {}
 
         if not regionset.sorted: regionset.sort()
-        
-        iter_dbs = iter(dbss)
-        dbs = iter_dbs.next()
-
-        last_j = len(regionset)-1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-
-        while cont_loop:
-            # When the regions overlap
-            if dbs.overlap(regionset[j]):
-                result[regionset[j].toString()].add(dbs)
-
-                if cont_overlap == False: pre_inter = j
-                if j == last_j: 
-                    try: dbs = iter_dbs.next()
-                    except: cont_loop = False 
-                else: 
-                    j = j + 1
-                    result[regionset[j].toString()] = GenomicRegionSet("RBS_"+regionset[j].toString())
-                cont_overlap = True
-            
-            elif dbs < regionset[j]:
-                try: 
-                    dbs = iter_dbs.next()
-                    j = pre_inter
-                    cont_overlap = False
-                except: cont_loop = False 
-            
-            elif dbs > regionset[j]:
-                if j == last_j:
-                    cont_loop = False
-                else:
-                    j = j + 1
-                    result[regionset[j].toString()] = GenomicRegionSet("RBS_"+regionset[j].toString())
-                    cont_overlap = False
+        for region in regionset:
+            result[region.toString()] = GenomicRegionSet("RBS_"+region.toString())
+
+        regions, dbs = OverlapIndex(dbss).overlap_pairs(regionset)
+        for j, i in zip(regions, dbs):
+            result[regionset[j].toString()].add(dbss[i])
         return result
 
     def sort_rbs_by_regions(self, regionset, merge_rbs=True):
@@ -206,8 +181,6 @@ class RNADNABindingSet:
         
         result = OrderedDict()
 
-        #txp_copy = copy.deepcopy(self)
-        #txp_copy.sort_dbs()
         self.sort_dbs()
 
         if not regionset.sorted: regionset.sort()
@@ -217,56 +190,19 @@ class RNADNABindingSet:
         
         if len(self) == 0: 
             return result
-        #iter_rd = iter(txp_copy)
-        iter_rd = iter(self)
-        rd = iter_rd.next()
-
-        last_j = len(regionset)-1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-
-        while cont_loop:
-            # When the regions overlap
-            if rd.dna.overlap(regionset[j]):
-                result[regionset[j].toString()].add(rd.rna)
-
-                if cont_overlap == False: pre_inter = j
-                if j == last_j: 
-                    try: rd = iter_rd.next()
-                    except: cont_loop = False 
-                else: 
-                    j = j + 1
-                    
-                cont_overlap = True
-            
-            elif rd.dna < regionset[j]:
-                try: 
-                    rd = iter_rd.next()
-                    j = pre_inter
-                    cont_overlap = False
-                except: cont_loop = False 
-            
-            elif rd.dna > regionset[j]:
-                if j == last_j:
-                    cont_loop = False
-                else:
-                    j = j + 1
-                    cont_overlap = False
-         
+
+        regions, rds = self.dbs_index().overlap_pairs(regionset)
+        for j, i in zip(regions, rds):
+            result[regionset[j].toString()].add(self.sequences[i].rna)
 
         return result
 
 
     def sort_rd_by_regions(self, regionset):
         """Sort RNADNA binding information by a given GenomicRegionSet"""
-        """Sort the DBS by given GenomicRegionSet"""
 
         result = OrderedDict()
 
-        #txp_copy = copy.deepcopy(self)
-        #txp_copy.sort_dbs()
         self.sort_dbs()
 
         if not regionset.sorted: regionset.sort()
@@ -276,44 +212,10 @@ class RNADNABindingSet:
 
         if len(self) == 0: 
             return result
-        #iter_rd = iter(txp_copy)
-        iter_rd = iter(self)
-        
-        rd = iter_rd.next()
 
-        last_j = len(regionset)-1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-        
-
-        while cont_loop:
-            # When the regions overlap
-            if rd.dna.overlap(regionset[j]):
-                result[regionset[j].toString()].add(rd)
-
-                if cont_overlap == False: pre_inter = j
-                if j == last_j: 
-                    try: rd = iter_rd.next()
-                    except: cont_loop = False 
-                else: 
-                    j = j + 1
-                cont_overlap = True
-            
-            elif rd.dna < regionset[j]:
-                try: 
-                    rd = iter_rd.next()
-                    j = pre_inter
-                    cont_overlap = False
-                except: cont_loop = False 
-            
-            elif rd.dna > regionset[j]:
-                if j == last_j:
-                    cont_loop = False
-                else:
-                    j = j + 1
-                    cont_overlap = False
+        regions, rds = self.dbs_index().overlap_pairs(regionset)
+        for j, i in zip(regions, rds):
+            result[regionset[j].toString()].add(self.sequences[i])
         return result
 
     def sort_rd_by_rbs(self, rbss):
@@ -321,52 +223,17 @@ class RNADNABindingSet:
         
         result = OrderedDict()
 
-        #txp_copy = copy.deepcopy(self)
-        #txp_copy.sort_rbs()
-
-        
         self.sort_rbs()
 
         if not rbss.sorted: rbss.sort()
-
-        #iter_rd = iter(txp_copy)
-        iter_rd = iter(self)
-        rd = iter_rd.next()
-
-        last_j = len(rbss)-1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-
-        while cont_loop:
-            # When the regions overlap
-            if rd.rna.overlap(rbss[j]):
-                result[rbss[j].str_rna()].add(rd)
-
-                if cont_overlap == False: pre_inter = j
-                if j == last_j: 
-                    try: rd = iter_rd.next()
-                    except: cont_loop = False 
-                else: 
-                    j = j + 1
-                    result[rbss[j].str_rna()] = RNADNABindingSet("RNADNA_interaction:"+rbss[j].str_rna())
-                cont_overlap = True
-            
-            elif rd.dna < rbss[j]:
-                try: 
-                    rd = iter_rd.next()
-                    j = pre_inter
-                    cont_overlap = False
-                except: cont_loop = False 
-            
-            elif rd.dna > rbss[j]:
-                if j == last_j:
-                    cont_loop = False
-                else:
-                    j = j + 1
-                    result[rbss[j].str_rna()] = RNADNABindingSet("RNADNA_interaction:"+rbss[j].str_rna())
-                    cont_overlap = False
+        for rbs in rbss:
+            result[rbs.str_rna()] = RNADNABindingSet("RNADNA_interaction:"+rbs.str_rna())
+
+        rnas = BindingSiteSet("RNA_binding_sites")
+        rnas.sequences = [rd.rna for rd in self.sequences]
+        sites, rds = OverlapIndex(rnas).overlap_pairs(rbss)
+        for j, i in zip(sites, rds):
+            result[rbss[j].str_rna()].add(self.sequences[i])
         return result
 
 
@@ -684,8 +551,11 @@ class RNADNABindingSet:
 
     def overlap_rbss(self, rbss):
         z = RNADNABindingSet(self.name)
-        for rd in self.sequences:
-            for rbs in rbss:
-                if rd.rna.overlap(rbs):
-                    z.add(rd)
+        if len(self) == 0 or len(rbss) == 0:
+            return z
+        # Every interaction is added once per overlapping RNA binding site
+        counts = OverlapIndex(rbss).count_regionset([rd.rna for rd in self.sequences], query_first=True)
+        for rd, c in zip(self.sequences, counts):
+            for i in range(c):
+                z.add(rd)
         return z
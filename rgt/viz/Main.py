@@ -156,6 +156,7 @@ def main():
     parser_boxplot.add_argument('-p', metavar='  ', type=float, default=0.05, help='Define the significance level for multiple test.  (default: %(default)s)')
     parser_boxplot.add_argument('-show', action="store_true", help='Show the figure in the screen. (default: %(default)s)')
     parser_boxplot.add_argument('-table', action="store_true", help='Store the tables of the figure in text format. (default: %(default)s)')
+    parser_boxplot.add_argument('-workers', metavar='  ', type=int, default=1, help='Define the number of processes computing the coverage of the BAM files, split by file and chromosome. (default: %(default)s)')
     
     ################### Lineplot ##########################################
     parser_lineplot = subparsers.add_parser('lineplot', help='Generate lineplot with various modes.')
@@ -189,6 +190,7 @@ def main():
     parser_lineplot.add_argument('-show', action="store_true", help='Show the figure in the screen. (default: %(default)s)')
     parser_lineplot.add_argument('-table', action="store_true", help='Store the tables of the figure in text format. (default: %(default)s)')
     parser_lineplot.add_argument('-sense', action="store_true", help='Set the plot sense-specific. (default: %(default)s)')
+    parser_lineplot.add_argument('-workers', metavar='  ', type=int, default=1, help='Define the number of processes computing the coverage of the BAM files, split by file and chromosome. (default: %(default)s)')
     
     ################### Heatmap ##########################################
     parser_heatmap = subparsers.add_parser('heatmap', help='Generate heatmap with various modes.')
@@ -220,6 +222,7 @@ def main():
     parser_heatmap.add_argument('-mp', action="store_true", help="Perform multiprocessing for faster computation. (default: %(default)s)")
     parser_heatmap.add_argument('-show', action="store_true", help='Show the figure in the screen. (default: %(default)s)')
     parser_heatmap.add_argument('-table', action="store_true", help='Store the tables of the figure in text format. (default: %(default)s)')
+    parser_heatmap.add_argument('-workers', metavar='  ', type=int, default=1, help='Define the number of processes computing the coverage of the BAM files, split by file and chromosome. (default: %(default)s)')
     
     ################### Venn Diagram ########################################
     parser_venn = subparsers.add_parser('venn', help='Generate Venn Diagram with peaks of gene list.')
@@ -485,7 +488,7 @@ def main():
             
             # Coverage of reads on all_bed
             print2(parameter,"Step 2/5: Calculating coverage of each bam file on all regions")
-            boxplot.bedCoverage() 
+            boxplot.bedCoverage(workers=args.workers)
             t2 = time.time()
             print2(parameter,"    --- finished in {0} (H:M:S)\n".format(datetime.timedelta(seconds=round(t2-t1))))
             
@@ -563,7 +566,7 @@ def main():
             else: print2(parameter, "\nStep 2/3: Calculating the coverage to all reads and averaging")
             lineplot.group_tags(groupby=args.col, sortby=args.row, colorby=args.c)
             lineplot.gen_cues()
-            lineplot.coverage(sortby=args.row, mp=args.mp, log=args.log)
+            lineplot.coverage(sortby=args.row, mp=args.mp, log=args.log, workers=args.workers)
             t2 = time.time()
             print2(parameter, "\t--- finished in {0} (H:M:S)".format(str(datetime.timedelta(seconds=round(t2-t1)))))
             
@@ -614,7 +617,7 @@ def main():
             else: print2(parameter, "\nStep 2/4: Calculating the coverage to all reads and averaging")
             lineplot.group_tags(groupby=args.col, sortby=args.row, colorby=args.c)
             lineplot.gen_cues()
-            lineplot.coverage(sortby=args.s, heatmap=True, logt=args.log, mp=args.mp)
+            lineplot.coverage(sortby=args.s, heatmap=True, logt=args.log, mp=args.mp, workers=args.workers)
             t2 = time.time()
             print2(parameter, "    --- finished in {0} (h:m:s)".format(str(datetime.timedelta(seconds=round(t2-t1)))))
             
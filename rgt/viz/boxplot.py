@@ -10,7 +10,7 @@ from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 # Local Libraries
 # Distal Libraries
 from rgt.Util import Html
-from rgt.CoverageSet import CoverageSet
+from rgt.CoverageSet import CoverageSet, compute_coverages
 from rgt.GenomicRegionSet import GenomicRegionSet
 from rgt.ExperimentalMatrix import ExperimentalMatrix
 from shared_function import output_array, gen_tags, tag_from_r, colormap, multiple_correction,\
@@ -57,16 +57,21 @@ class Boxplot:
             self.all_bed.combine(bed)
         self.all_bed.remove_duplicates()  # all_bed is sorted!!
 
-    def bedCoverage(self):
+    def bedCoverage(self, workers=1):
         """ Return coverage matrix of multiple reads on one bed.
         bed --> GenomicRegionSet
+        workers --> number of processes computing the coverage (split by reads file and chromosome)
         """
-        c = []
+        covs, jobs = [], []
         for rp in self.reads:
             print("    processing: ..." + rp[-45:])
             r = os.path.abspath(rp)  # Here change the relative path into absolute path
             cov = CoverageSet(r, self.all_bed)
-            cov.coverage_from_genomicset(r)
+            covs.append(cov)
+            jobs.append((cov, "coverage_from_genomicset", dict(bamFile=r)))
+        compute_coverages(jobs, workers=workers)
+        c = []
+        for cov in covs:
             cov.normRPM()
             c.append(cov.coverage)
         self.all_table = numpy.transpose(c)
@@ -137,7 +137,16 @@ class Lineplot:
         for bam in self.readsnames:
             self.cuebam[bam] = set(tag_from_r(self.exps, self.tag_type, bam))
 
-    def coverage(self, sortby, heatmap=False, logt=False, mp=0, log=False):
+    def _bam_arguments(self, j):
+        """Return the arguments of CoverageSet.coverage_from_bam for the j-th reads file."""
+        arguments = dict(bam_file=self.reads[j], extension_size=self.rs, binsize=self.bs, stepsize=self.ss)
+        if self.sense:
+            arguments.update(get_sense_info=True, paired_reads=True)
+        return arguments
+
+    def coverage(self, sortby, heatmap=False, logt=False, mp=0, log=False, workers=1):
+        """Compute the coverage of every combination of the tags; <mp> processes compute one combination each, or
+        else <workers> processes compute the coverage of the BAM files split by file and chromosome."""
 
         def annot_ind(bednames, tags):
             """Find the index for annotation tag"""
@@ -151,6 +160,7 @@ class Lineplot:
         data = OrderedDict()
 
         bi = 0
+        pairs = []  # (s, g, c, d, bed, bam) of every coverage to compute
         for s in self.sort_tags:
             data[s] = OrderedDict()
             for g in self.group_tags:
@@ -176,130 +186,139 @@ class Lineplot:
                                     # print(self.cuebam[bam])
                                     # print(set([s,g,c]))
                                     if self.cuebam[bam] <= set([s, g, c, d]):
-                                        i = self.bednames.index(bed)
-                                        j = self.readsnames.index(bam)
-                                        # print(bed + "." + bam)
-
-                                        # if len(self.processed_beds[i]) == 0:
-                                        #     try:
-                                        #         data[s][g][c][d].append(numpy.empty(1, dtype=object))
-                                        #     except:
-                                        #         data[s][g][c][d] = [numpy.empty(1, dtype=object)]
-                                        #     continue
-                                        #########################################################################
-                                        if mp > 0:  # Multiple processing
-                                            mp_input.append([self.processed_beds[i], self.reads[j],
-                                                             self.rs, self.bs, self.ss, self.center, heatmap, logt,
-                                                             s, g, c, d])
-                                            data[s][g][c][d] = None
-
-                                        #########################################################################
-                                        else:  # Single thread
-                                            ts = time.time()
-                                            cov = CoverageSet(bed + "." + bam, self.processed_beds[i])
-
-                                            # print(len(self.processed_beds[i]))
-                                            if "Conservation" in [s,g,c,d]:
-                                                cov.phastCons46way_score(stepsize=self.ss)
-
-                                            elif ".bigwig" in self.reads[j].lower() or ".bw" in self.reads[j].lower():
-                                                cov.coverage_from_bigwig(bigwig_file=self.reads[j], stepsize=self.ss)
-                                            else:
-                                                if not self.sense:
-                                                    cov.coverage_from_bam(bam_file=self.reads[j],
-                                                                          extension_size=self.rs, binsize=self.bs,
-                                                                          stepsize=self.ss)
-                                                    if normRPM: cov.normRPM()
-                                                else:  # Sense specific
-                                                    cov.coverage_from_bam(bam_file=self.reads[j],
-                                                                          extension_size=self.rs, binsize=self.bs,
-                                                                          stepsize=self.ss, get_sense_info=True,
-                                                                          paired_reads=True)
-                                                    cov.array_transpose()
-                                                    if normRPM: cov.normRPM()
-
-                                            # When bothends, consider the fliping end
-                                            if self.center == 'bothends' or self.center == 'upstream' or self.center == 'downstream':
-                                                if "Conservation" in [s,g,c,d]:
-                                                    flap = CoverageSet("for flap", self.processed_bedsF[i])
-                                                    flap.phastCons46way_score(stepsize=self.ss)
-                                                    ffcoverage = numpy.fliplr(flap.coverage)
-                                                    cov.coverage = numpy.concatenate((cov.coverage, ffcoverage), axis=0)
-                                                elif ".bigwig" in self.reads[j].lower() or ".bw" in self.reads[j].lower():
-                                                    flap = CoverageSet("for flap", self.processed_bedsF[i])
-                                                    flap.coverage_from_bigwig(bigwig_file=self.reads[j],
-                                                                              stepsize=self.ss)
-                                                    ffcoverage = numpy.fliplr(flap.coverage)
-                                                    cov.coverage = numpy.concatenate((cov.coverage, ffcoverage), axis=0)
-                                                else:
-                                                    flap = CoverageSet("for flap", self.processed_bedsF[i])
-                                                    if not self.sense:
-                                                        flap.coverage_from_bam(self.reads[j], extension_size=self.rs,
-                                                                               binsize=self.bs, stepsize=self.ss)
-                                                        if normRPM: flap.normRPM()
-                                                    else:  # Sense specific
-                                                        flap.coverage_from_bam(bam_file=self.reads[j],
-                                                                               extension_size=self.rs, binsize=self.bs,
-                                                                               stepsize=self.ss, get_sense_info=True,
-                                                                               paired_reads=True)
-                                                        flap.array_transpose(flip=True)
-                                                        if normRPM: flap.normRPM()
-                                                    ffcoverage = numpy.fliplr(flap.coverage)
-                                                    try: cov.coverage = numpy.concatenate((cov.coverage, ffcoverage), axis=0)
-                                                    except: pass
-
-                                                    if self.sense:
-                                                        cov.transpose_cov1 = numpy.concatenate((cov.transpose_cov1,
-                                                                                                flap.transpose_cov1),axis=0)
-                                                        cov.transpose_cov2 = numpy.concatenate((cov.transpose_cov2,
-                                                                                                flap.transpose_cov2), axis=0)
-
-                                            # Averaging the coverage of all regions of each bed file
-                                            if heatmap:
-                                                if logt:
-                                                    data[s][g][c][d] = numpy.log10(numpy.vstack(
-                                                        cov.coverage) + 1)  # Store the array into data list
-                                                else:
-                                                    data[s][g][c][d] = numpy.vstack(
-                                                        cov.coverage)  # Store the array into data list
-                                            else:
-                                                if len(cov.coverage) == 0:
-                                                    data[s][g][c][d] = None
-                                                    print("** Warning: Cannot open " + self.reads[j])
-                                                    continue
-                                                else:
-                                                    for i, car in enumerate(cov.coverage):
-                                                        if i == 0: avearr = np.array(car, ndmin=2)
-                                                        else:
-                                                            # avearr = numpy.vstack((avearr, np.array(car, ndmin=2)))
-                                                            try: avearr = numpy.vstack((avearr, np.array(car, ndmin=2)))
-                                                            except: print(bed+"."+bam+"."+str(i))
-                                                    if log:
-                                                        avearr = numpy.log2(avearr+1)
-
-                                                    avearr = numpy.average(avearr, axis=0)
-                                                    if self.sense:
-                                                        if log:
-                                                            sense_1 = numpy.average(numpy.log2(cov.transpose_cov1+1), axis=0)
-                                                            sense_2 = numpy.average(numpy.log2(cov.transpose_cov2+1), axis=0)
-                                                        else:
-                                                            sense_1 = numpy.average(cov.transpose_cov1,axis=0)
-                                                            sense_2 = numpy.average(cov.transpose_cov2,axis=0)
-                                                    cut_end = int(self.bs/self.ss)
-                                                    avearr = avearr[cut_end:-cut_end]
-                                                    data[s][g][c][d]["all"].append(avearr)
-
-                                                    if self.sense:
-                                                        sense_1 = sense_1[cut_end:-cut_end]
-                                                        sense_2 = sense_2[cut_end:-cut_end]
-                                                        data[s][g][c][d]["sense_1"].append(sense_1)
-                                                        data[s][g][c][d]["sense_2"].append(sense_2)
-
-                                            bi += 1
-                                            te = time.time()
-                                            print2(self.parameter,
-                                                   "\t" + str(bi) + "\t" + "{0:30}\t--{1:<5.1f}s".format(
-                                                       bed + "." + bam, ts - te))
+                                        pairs.append((s, g, c, d, bed, bam))
+
+        # The coverage of the BAM files (and of the flapped regions) is computed at once by a pool of processes
+        bam_covs, flap_covs = {}, {}
+        if mp == 0 and workers > 1:
+            jobs = []
+            for k, (s, g, c, d, bed, bam) in enumerate(pairs):
+                i = self.bednames.index(bed)
+                j = self.readsnames.index(bam)
+                if "Conservation" in [s, g, c, d] or ".bigwig" in self.reads[j].lower() or \
+                        ".bw" in self.reads[j].lower():
+                    continue
+                bam_covs[k] = CoverageSet(bed + "." + bam, self.processed_beds[i])
+                jobs.append((bam_covs[k], "coverage_from_bam", self._bam_arguments(j)))
+                if self.center == 'bothends' or self.center == 'upstream' or self.center == 'downstream':
+                    flap_covs[k] = CoverageSet("for flap", self.processed_bedsF[i])
+                    jobs.append((flap_covs[k], "coverage_from_bam", self._bam_arguments(j)))
+            compute_coverages(jobs, workers=workers)
+
+        for k, (s, g, c, d, bed, bam) in enumerate(pairs):
+            i = self.bednames.index(bed)
+            j = self.readsnames.index(bam)
+            # print(bed + "." + bam)
+
+            # if len(self.processed_beds[i]) == 0:
+            #     try:
+            #         data[s][g][c][d].append(numpy.empty(1, dtype=object))
+            #     except:
+            #         data[s][g][c][d] = [numpy.empty(1, dtype=object)]
+            #     continue
+            #########################################################################
+            if mp > 0:  # Multiple processing
+                mp_input.append([self.processed_beds[i], self.reads[j],
+                                 self.rs, self.bs, self.ss, self.center, heatmap, logt,
+                                 s, g, c, d])
+                data[s][g][c][d] = None
+
+            #########################################################################
+            else:  # Single thread
+                ts = time.time()
+                cov = bam_covs[k] if k in bam_covs else CoverageSet(bed + "." + bam, self.processed_beds[i])
+
+                # print(len(self.processed_beds[i]))
+                if "Conservation" in [s,g,c,d]:
+                    cov.phastCons46way_score(stepsize=self.ss)
+
+                elif ".bigwig" in self.reads[j].lower() or ".bw" in self.reads[j].lower():
+                    cov.coverage_from_bigwig(bigwig_file=self.reads[j], stepsize=self.ss)
+                else:
+                    if k not in bam_covs:
+                        cov.coverage_from_bam(**self._bam_arguments(j))
+                    if self.sense:  # Sense specific
+                        cov.array_transpose()
+                    if normRPM: cov.normRPM()
+
+                # When bothends, consider the fliping end
+                if self.center == 'bothends' or self.center == 'upstream' or self.center == 'downstream':
+                    if "Conservation" in [s,g,c,d]:
+                        flap = CoverageSet("for flap", self.processed_bedsF[i])
+                        flap.phastCons46way_score(stepsize=self.ss)
+                        ffcoverage = numpy.fliplr(flap.coverage)
+                        cov.coverage = numpy.concatenate((cov.coverage, ffcoverage), axis=0)
+                    elif ".bigwig" in self.reads[j].lower() or ".bw" in self.reads[j].lower():
+                        flap = CoverageSet("for flap", self.processed_bedsF[i])
+                        flap.coverage_from_bigwig(bigwig_file=self.reads[j],
+                                                  stepsize=self.ss)
+                        ffcoverage = numpy.fliplr(flap.coverage)
+                        cov.coverage = numpy.concatenate((cov.coverage, ffcoverage), axis=0)
+                    else:
+                        if k in flap_covs:
+                            flap = flap_covs[k]
+                        else:
+                            flap = CoverageSet("for flap", self.processed_bedsF[i])
+                            flap.coverage_from_bam(**self._bam_arguments(j))
+                        if self.sense:  # Sense specific
+                            flap.array_transpose(flip=True)
+                        if normRPM: flap.normRPM()
+                        ffcoverage = numpy.fliplr(flap.coverage)
+                        try: cov.coverage = numpy.concatenate((cov.coverage, ffcoverage), axis=0)
+                        except: pass
+
+                        if self.sense:
+                            cov.transpose_cov1 = numpy.concatenate((cov.transpose_cov1,
+                                                                    flap.transpose_cov1),axis=0)
+                            cov.transpose_cov2 = numpy.concatenate((cov.transpose_cov2,
+                                                                    flap.transpose_cov2), axis=0)
+
+                # Averaging the coverage of all regions of each bed file
+                if heatmap:
+                    if logt:
+                        data[s][g][c][d] = numpy.log10(numpy.vstack(
+                            cov.coverage) + 1)  # Store the array into data list
+                    else:
+                        data[s][g][c][d] = numpy.vstack(
+                            cov.coverage)  # Store the array into data list
+                else:
+                    if len(cov.coverage) == 0:
+                        data[s][g][c][d] = None
+                        print("** Warning: Cannot open " + self.reads[j])
+                        continue
+                    else:
+                        for i, car in enumerate(cov.coverage):
+                            if i == 0: avearr = np.array(car, ndmin=2)
+                            else:
+                                # avearr = numpy.vstack((avearr, np.array(car, ndmin=2)))
+                                try: avearr = numpy.vstack((avearr, np.array(car, ndmin=2)))
+                                except: print(bed+"."+bam+"."+str(i))
+                        if log:
+                            avearr = numpy.log2(avearr+1)
+
+                        avearr = numpy.average(avearr, axis=0)
+                        if self.sense:
+                            if log:
+                                sense_1 = numpy.average(numpy.log2(cov.transpose_cov1+1), axis=0)
+                                sense_2 = numpy.average(numpy.log2(cov.transpose_cov2+1), axis=0)
+                            else:
+                                sense_1 = numpy.average(cov.transpose_cov1,axis=0)
+                                sense_2 = numpy.average(cov.transpose_cov2,axis=0)
+                        cut_end = int(self.bs/self.ss)
+                        avearr = avearr[cut_end:-cut_end]
+                        data[s][g][c][d]["all"].append(avearr)
+
+                        if self.sense:
+                            sense_1 = sense_1[cut_end:-cut_end]
+                            sense_2 = sense_2[cut_end:-cut_end]
+                            data[s][g][c][d]["sense_1"].append(sense_1)
+                            data[s][g][c][d]["sense_2"].append(sense_2)
+
+                bi += 1
+                te = time.time()
+                print2(self.parameter,
+                       "\t" + str(bi) + "\t" + "{0:30}\t--{1:<5.1f}s".format(
+                           bed + "." + bam, ts - te))
 
 
         if mp > 0:
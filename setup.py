@@ -110,8 +110,8 @@ tools_dictionary = {
 "THOR": (
     "rgt-THOR",
     "rgt.THOR.THOR:main",
-    ["scikit-learn>=0.17.1", "hmmlearn<0.2.0", "matplotlib>=1.1.0", "mpmath", "HTSeq"],
-    ["data/bin/"+bin_dir+"/wigToBigWig", "data/bin/"+bin_dir+"/bigWigMerge", "data/bin/"+bin_dir+"/bedGraphToBigWig"]
+    ["scikit-learn>=0.17.1", "hmmlearn<0.2.0", "matplotlib>=1.1.0", "mpmath"],
+    []
 ),
 "filterVCF": (
     "rgt-filterVCF",
@@ -317,6 +317,11 @@ data_config_file.write("default_bias_table_R_ATAC: fp_hmms/atac_bias_table_R.txt
 data_config_file.write("[Library]\n")
 data_config_file.write("path_triplexator: " + path.join(options.param_rgt_data_location, "lib/libtriplexator.so") + "\n")
 data_config_file.write("path_c_rgt: " + path.join(options.param_rgt_data_location, "lib/"+libRGT) + "\n")
+data_config_file.write("\n[Cache]\n")
+data_config_file.write("path: " + path.join(options.param_rgt_data_location, "cache") + "\n")
+data_config_file.write("min_file_size: 10485760\n")
+data_config_file.write("max_size: 10737418240\n")
+data_config_file.write("gc_max_size: 8589934592\n")
 
 data_config_file.close()
 
@@ -0,0 +1,112 @@
+from __future__ import print_function
+from __future__ import division
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+import pysam
+from rgt.BedReader import BedReader
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+
+"""Unit Test"""
+
+class TestBedReader(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, lines, compress=False):
+        path = os.path.join(self.directory, name)
+        f = gzip.open(path, "wb") if compress else open(path, "w")
+        f.write("\n".join(lines) + "\n")
+        f.close()
+        return path
+
+    def regions(self, regionset):
+        return [(r.chrom, r.initial, r.final, r.name, r.orientation, r.data) for r in regionset]
+
+    def test_bed(self):
+        lines = ["track name=test",
+                 "chr1\t5\t15\tpeak3\t7",
+                 "",
+                 "chr1\t40\t30\tpeak2",
+                 "chr1\t50\t50\tempty",
+                 "chr2\t10\t20\tpeak1\t5\t+\textra\tmore"]
+        path = self.write("test.bed", lines)
+        reader = BedReader(path, chunk_size=2)
+        self.assertEqual([(r.chrom, r.initial, r.final, r.name, r.orientation, r.data) for r in reader],
+                         [("chr1", 5, 15, "peak3", None, "7"), ("chr1", 30, 40, "peak2", None, None),
+                          ("chr2", 10, 20, "peak1", "+", "5\textra\tmore")])
+        self.assertTrue(reader.sorted)
+        self.assertEqual(reader.error_line, 2)
+
+        regionset = GenomicRegionSet("test")
+        regionset.read_bed(path)
+        self.assertTrue(regionset.sorted)
+        self.assertEqual(self.regions(regionset), self.regions(BedReader(path)))
+
+    def test_unsorted(self):
+        lines = ["chr2\t1\t5", "chr1\t8\t9", "chr1\t3\t4", "chr1\t3\t2"]
+        path = self.write("unsorted.bed", lines)
+        for chunk_size in [1, 2, 10]:
+            reader = BedReader(path, chunk_size=chunk_size)
+            self.assertEqual(sum(len(c[1]) for c in reader.chunks()), 4)
+            self.assertFalse(reader.sorted)
+        regionset = GenomicRegionSet("test")
+        regionset.read_bed(path)
+        self.assertEqual([(r.chrom, r.initial, r.final) for r in regionset],
+                         [("chr1", 2, 3), ("chr1", 3, 4), ("chr1", 8, 9), ("chr2", 1, 5)])
+
+    def test_gzip(self):
+        lines = ["chr%d\t%d\t%d\tr%d" % (i % 3 + 1, i, i + 10, i) for i in range(100)]
+        plain = self.write("test.bed", lines)
+        compressed = self.write("test.bed.gz", lines, compress=True)
+        self.assertEqual(self.regions(BedReader(compressed, chunk_size=7)), self.regions(BedReader(plain)))
+        a = GenomicRegionSet("plain")
+        a.read_bed(plain)
+        b = GenomicRegionSet("compressed")
+        b.read_bed(compressed)
+        self.assertEqual(self.regions(a), self.regions(b))
+
+    def test_regions(self):
+        lines = ["chr1\t%d\t%d\tr%d" % (i * 10, i * 10 + 15, i) for i in range(100)] + \
+                ["chr2\t%d\t%d\ts%d" % (i * 10, i * 10 + 5, i) for i in range(100)]
+        plain = self.write("test.bed", lines)
+        compressed = os.path.join(self.directory, "test.bed.gz")
+        pysam.tabix_compress(plain, compressed)
+        regions = GenomicRegionSet("query")
+        for chrom, initial, final in [("chr1", 100, 130), ("chr1", 125, 140), ("chr1", 502, 502), ("chr2", 0, 12),
+                                      ("chr3", 0, 100)]:
+            regions.add(GenomicRegion(chrom, initial, final))
+        everything = GenomicRegionSet("all")
+        everything.read_bed(plain)
+        expected = [(r.chrom, r.initial, r.final, r.name) for r in everything
+                    if any(r.overlap(q) for q in regions)]
+
+        result = GenomicRegionSet.from_tabix(compressed, regions)
+        self.assertTrue(os.path.exists(compressed + ".tbi"))
+        self.assertTrue(result.sorted)
+        self.assertEqual([(r.chrom, r.initial, r.final, r.name) for r in result], expected)
+        # Files without index are filtered while streaming
+        result = GenomicRegionSet("plain")
+        result.read_bed(plain, regions=regions)
+        self.assertEqual([(r.chrom, r.initial, r.final, r.name) for r in result], expected)
+
+    def test_bedgraph(self):
+        lines = ["track type=bedGraph", "chr1\t0\t10\t1.5", "chr1\t10\t20\t0"]
+        path = self.write("test.bedGraph", lines, compress=True)
+        regionset = GenomicRegionSet("test")
+        regionset.read_bedgraph(path)
+        self.assertEqual([(r.chrom, r.initial, r.final, r.data) for r in regionset],
+                         [("chr1", 0, 10, "1.5"), ("chr1", 10, 20, "0")])
+        self.assertTrue(regionset.sorted)
+
+
+if __name__ == "__main__":
+    unittest.main()
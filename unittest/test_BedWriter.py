@@ -0,0 +1,83 @@
+from __future__ import print_function
+from __future__ import division
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from rgt.BedReader import BedReader, open_file
+from rgt.BedWriter import BedWriter
+from rgt.CoverageSet import CoverageSet
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionArray import GenomicRegionArray
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+
+"""Unit Test"""
+
+class TestBedWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.regions = GenomicRegionSet("test")
+        self.regions.add(GenomicRegion("chr1", 5, 15))
+        self.regions.add(GenomicRegion("chr1", 10, 30, name="a", orientation="+", data="7"))
+        self.regions.add(GenomicRegion("chr1", 40, 50, name="b", data="3\tx\ty"))
+        self.regions.add(GenomicRegion("chr2", 0, 20, orientation="-", data=""))
+        self.regions.sort()
+        self.expected = ["chr1\t5\t15\tchr1:5-15\t.\t.", "chr1\t10\t30\ta\t7\t+\t", "chr1\t40\t50\tb\t3\t.\tx\ty",
+                         "chr2\t0\t20\tchr2:0-20\t.\t-"]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, filename):
+        f = open_file(filename)
+        lines = f.read().splitlines()
+        f.close()
+        return lines
+
+    def test_write_bed(self):
+        self.assertEqual([str(r) for r in self.regions], self.expected)
+        path = os.path.join(self.directory, "set.bed")
+        self.regions.write_bed(path)
+        self.assertEqual(self.read(path), self.expected)
+        path = os.path.join(self.directory, "array.bed")
+        GenomicRegionArray.from_regionset(self.regions).write_bed(path)
+        self.assertEqual(self.read(path), self.expected)
+
+    def test_compress_and_index(self):
+        path = os.path.join(self.directory, "set.bed.gz")
+        self.regions.write_bed(path, index=True)
+        self.assertTrue(os.path.exists(path + ".tbi"))
+        self.assertEqual(self.read(path), self.expected)
+        query = GenomicRegionSet("query")
+        query.add(GenomicRegion("chr1", 20, 45))
+        self.assertEqual([(r.chrom, r.initial, r.final) for r in BedReader(path, regions=query)],
+                         [("chr1", 10, 30), ("chr1", 40, 50)])
+
+    def test_buffer(self):
+        path = os.path.join(self.directory, "columns.bed")
+        with BedWriter(path, buffer_size=3) as f:
+            f.write_columns(["chr1"] * 10, np.arange(10), np.arange(10) + 5, np.arange(10) / 4)
+        self.assertEqual(self.read(path), ["chr1\t%d\t%d\t%s" % (i, i + 5, str(np.float64(i / 4))) for i in range(10)])
+
+    def test_coverage(self):
+        regions = GenomicRegionSet("bins")
+        regions.add(GenomicRegion("chr1", 0, 300))
+        regions.add(GenomicRegion("chr2", 100, 300))
+        cov = CoverageSet("cov", regions)
+        cov.coverage = [np.array([0, 2, 0, 1, 0]), np.array([1.5, 0, 0])]
+        path = os.path.join(self.directory, "cov.bed")
+        cov.write_bed(path)
+        self.assertEqual(self.read(path), ["chr1\t75\t125\t2", "chr1\t175\t225\t1", "chr2\t125\t175\t1.5"])
+        cov.write_bed(path, zero=True)
+        self.assertEqual(len(self.read(path)), 8)
+        path = os.path.join(self.directory, "cov.wig")
+        cov.write_wig(path)
+        self.assertEqual(self.read(path), ["variableStep chrom=chr1 span=50", "75 2", "175 1",
+                                           "variableStep chrom=chr2 span=50", "25 1.5"])
+
+
+if __name__ == "__main__":
+    unittest.main()
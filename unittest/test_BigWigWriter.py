@@ -0,0 +1,60 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pyBigWig
+from rgt.BigWigWriter import BigWigWriter
+from rgt.CoverageSet import CoverageSet
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+
+"""Unit Test"""
+
+class TestBigWigWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.chrom_file = os.path.join(self.directory, "chrom.sizes")
+        with open(self.chrom_file, "w") as f:
+            f.write("chr1\t1000\nchr2\t280\nchr3\t500\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def intervals(self, filename):
+        bw = pyBigWig.open(filename)
+        result = dict((c, bw.intervals(c)) for c in bw.chroms())
+        bw.close()
+        return result
+
+    def test_write_intervals(self):
+        path = os.path.join(self.directory, "test.bw")
+        with BigWigWriter(path, self.chrom_file, chroms=["chr2", "chr1"]) as f:
+            f.write_intervals("chr2", [100, 0], [150, 50], np.array([2, 1]))
+            f.write_intervals("chr2", [120, 250], [200, 300], [3, 4])
+            f.write_intervals("chrX", [0], [10], [1])
+            f.write_intervals("chr1", np.arange(3) * 10, np.arange(3) * 10 + 10, np.arange(3) / 2.)
+            self.assertRaises(ValueError, f.write_intervals, "chr2", [0], [10], [1])
+        self.assertEqual(self.intervals(path), {"chr1": ((0, 10, 0.0), (10, 20, 0.5), (20, 30, 1.0)),
+                                                "chr2": ((0, 50, 1.0), (100, 150, 2.0), (150, 200, 3.0),
+                                                         (250, 280, 4.0)),
+                                                "chr3": None})
+
+    def test_write_bigwig(self):
+        regions = GenomicRegionSet("bins")
+        regions.add(GenomicRegion("chr3", 0, 300))
+        regions.add(GenomicRegion("chr1", 100, 300))
+        cov = CoverageSet("cov", regions)
+        cov.coverage = [np.array([0, 2, 0, 1, 0, 0]), np.array([1, 0, 0, 5])]
+        path = os.path.join(self.directory, "cov.bw")
+        cov.write_bigwig(path, self.chrom_file)
+        # the same windows as in CoverageSet.write_bed
+        self.assertEqual(self.intervals(path), {"chr1": ((125, 175, 1.0), (275, 325, 5.0)),
+                                                "chr2": None, "chr3": ((75, 125, 2.0), (175, 225, 1.0))})
+
+
+if __name__ == "__main__":
+    unittest.main()
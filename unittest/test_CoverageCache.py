@@ -0,0 +1,71 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+import pysam
+import rgt.CoverageSet
+from rgt.CoverageCache import CoverageCache
+from rgt.CoverageSet import CoverageSet
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+
+"""Unit Test"""
+
+class TestCoverageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = CoverageCache(cache_dir=os.path.join(self.directory, "cache"), max_size=10 ** 9,
+                                   min_file_size=0)
+        self.bam = os.path.join(self.directory, "test.bam")
+        header = {"HD": {"VN": "1.0", "SO": "coordinate"},
+                  "SQ": [{"SN": "chr1", "LN": 10000}, {"SN": "chr2", "LN": 10000}]}
+        with pysam.AlignmentFile(self.bam, "wb", header=header) as f:
+            for i, (chrom, start, reverse) in enumerate([(0, 10, False), (0, 60, True), (1, 160, True)]):
+                read = pysam.AlignedSegment()
+                read.query_name = "r%d" % i
+                read.reference_id = chrom
+                read.reference_start = start
+                read.query_sequence = "A" * 10
+                read.cigarstring = "10M"
+                read.flag = 16 if reverse else 0
+                read.mapping_quality = 30
+                f.write(read)
+        pysam.index(self.bam)
+        self.regions = GenomicRegionSet("test")
+        self.regions.add(GenomicRegion("chr1", 0, 300))
+        self.regions.add(GenomicRegion("chr2", 0, 300))
+        self.regions.add(GenomicRegion("chr1", 100, 200))
+        self.fetch_windows = rgt.CoverageSet.fetch_windows
+
+    def tearDown(self):
+        rgt.CoverageSet.fetch_windows = self.fetch_windows
+        shutil.rmtree(self.directory)
+
+    def coverage(self, **kwargs):
+        cov = CoverageSet("coverage", self.regions)
+        cov.coverage_from_bam(self.bam, extension_size=0, get_strand_info=True, cache=self.cache, **kwargs)
+        return cov.overall_cov.tolist(), cov.overall_strand.tolist()
+
+    def test_cached(self):
+        expected = self.coverage()
+        self.assertEqual(len(os.listdir(self.cache.cache_dir)), 2)
+
+        def fail(*args):
+            raise AssertionError("BAM file read")
+        rgt.CoverageSet.fetch_windows = fail
+        self.assertEqual(self.coverage(), expected)
+        # other parameters are other entries
+        self.assertRaises(AssertionError, self.coverage, rmdup=True)
+
+    def test_evict(self):
+        self.coverage()
+        self.cache.max_size = 1
+        self.cache.evict()
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
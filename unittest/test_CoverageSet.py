@@ -15,4 +15,166 @@ class CoverageSet_Test(unittest.TestCase):
     def coverage_from_genomicset(self):
         cov.coverage_from_genomicset(bamfile)
         print(cov.coverage)
-        self.assertEqual(cov.coverage, 4)
\ No newline at end of file
+        self.assertEqual(cov.coverage, 4)
+
+
+class TestCoverageFromBam(unittest.TestCase):
+
+    def setUp(self):
+        import os
+        import shutil
+        import tempfile
+        import pysam
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.bam = os.path.join(self.directory, "test.bam")
+        header = {"HD": {"VN": "1.0", "SO": "coordinate"}, "SQ": [{"SN": "chr1", "LN": 10000},
+                                                                 {"SN": "chr2", "LN": 10000}]}
+        with pysam.AlignmentFile(self.bam, "wb", header=header) as f:
+            for i, (start, reverse) in enumerate([(10, False), (60, False), (60, True), (160, True)]):
+                read = pysam.AlignedSegment()
+                read.query_name = "r%d" % i
+                read.reference_id = 0
+                read.reference_start = start
+                read.query_sequence = "A" * 10
+                read.cigarstring = "10M"
+                read.flag = 16 if reverse else 0
+                read.mapping_quality = 30
+                f.write(read)
+        pysam.index(self.bam)
+
+    def test_windows(self):
+        regions = GenomicRegionSet("test")
+        regions.add(GenomicRegion("chr1", 0, 300, orientation="+"))
+        regions.add(GenomicRegion("chr1", 0, 20))
+        cov = CoverageSet("coverage", regions)
+        cov.coverage_from_bam(self.bam, extension_size=0, binsize=100, stepsize=50, get_strand_info=True,
+                              get_sense_info=True)
+        self.assertEqual(cov.coverage[0].tolist(), [1, 3, 3, 3, 1, 1])
+        self.assertEqual(len(cov.coverage[1]), 0)
+        self.assertEqual(cov.overall_cov.tolist(), [1, 3, 3, 3, 1, 1])
+        self.assertEqual(cov.cov_strand_all[0].tolist(), [[1, 0], [3, 0], [3, 0], [2, 1], [0, 1], [0, 1]])
+        self.assertEqual(cov.cov_sense_all[0].tolist(), [[0, 1], [0, 3], [0, 3], [1, 2], [1, 0], [1, 0]])
+
+        cov.coverage_from_bam(self.bam, extension_size=0, binsize=100, stepsize=50, rmdup=True)
+        self.assertEqual(cov.coverage[0].tolist(), [1, 2, 2, 2, 1, 1])
+
+    def test_array_transpose(self):
+        import numpy as np
+        regions = GenomicRegionSet("test")
+        regions.add(GenomicRegion("chr1", 0, 100, orientation="+"))
+        regions.add(GenomicRegion("chr1", 100, 200, orientation="+"))
+        cov = CoverageSet("coverage", regions)
+        cov.coverage_from_bam(self.bam, extension_size=0, binsize=100, stepsize=50, get_sense_info=True)
+        cov.array_transpose()
+        self.assertEqual(cov.transpose_cov1.tolist(), [[[0], [0]], [[0], [1]]])
+        self.assertEqual(cov.transpose_cov2.tolist(), [[[1], [3]], [[0], [0]]])
+        self.assertTrue(np.may_share_memory(cov.transpose_cov1, cov.overall_sense))
+        cov.array_transpose(flip=True)
+        self.assertEqual(cov.transpose_cov2.tolist(), cov.transpose_cov1.tolist())
+
+    def test_mask(self):
+        import os
+        from rgt.CoverageSet import read_mask
+        mask_file = os.path.join(self.directory, "mask.bed")
+        with open(mask_file, "w") as f:
+            f.write("chr2\t0\t100\nchr1\t58\t62\nchr1\t200\t300\nchr1\t55\t60\nchr1\t250\t260\n")
+        mask = read_mask(mask_file)
+        self.assertEqual([(m[0].tolist(), m[1].tolist()) for m in [mask["chr1"], mask["chr2"]]],
+                         [([55, 200], [62, 300]), ([0], [100])])
+        regions = GenomicRegionSet("test")
+        regions.add(GenomicRegion("chr1", 0, 300))
+        cov = CoverageSet("coverage", regions)
+        # the forward read at 60 is masked, the reverse one (start 60 - 10) is not
+        cov.coverage_from_bam(self.bam, extension_size=0, binsize=100, stepsize=50, mask_file=mask_file,
+                              get_strand_info=True)
+        self.assertEqual(cov.coverage[0].tolist(), [1, 2, 2, 2, 1, 1])
+        self.assertEqual(cov.cov_strand_all[0].tolist(), [[1, 0], [1, 1], [1, 1], [0, 2], [0, 1], [0, 1]])
+
+    def test_preallocated(self):
+        from rgt.CoverageSet import COVERAGE_DTYPE
+        regions = GenomicRegionSet("test")
+        regions.add(GenomicRegion("chr1", 0, 300))
+        regions.add(GenomicRegion("chr2", 0, 100))
+        cov = CoverageSet("coverage", regions)
+        cov.coverage_from_bam(self.bam, extension_size=0, binsize=100, stepsize=50, get_strand_info=True)
+        self.assertEqual(cov.overall_cov.tolist(), [1, 3, 3, 3, 1, 1, 0, 0])
+        self.assertEqual(cov.overall_strand.tolist(), [[1, 3, 3, 2, 0, 0, 0, 0], [0, 0, 0, 1, 1, 1, 0, 0]])
+        self.assertEqual(cov.cov_strand_all[0].shape, (6, 2))
+        cov.scale(2)
+        other = CoverageSet("other", regions)
+        other._allocate([6, 2])
+        other.overall_cov[:] = 3
+        cov.subtract(other)
+        # the regions are still views of the contiguous array
+        self.assertEqual(cov.overall_cov.tolist(), [0, 3, 3, 3, 0, 0, 0, 0])
+        self.assertEqual(cov.overall_cov.dtype, COVERAGE_DTYPE)
+
+    def test_fetch_windows(self):
+        import pysam
+        from rgt.CoverageSet import fetch_windows
+        bam = pysam.Samfile(self.bam, "rb")
+        windows = [("chr1", 0, 15), ("chr1", 5, 65), ("chr1", 50, 55), ("chr1", 62, 200), ("chr1", 20, 30),
+                   ("chr1", 150, 170)]
+        expected = [[r.qname for r in bam.fetch(*w)] for w in windows]
+        for stream in [True, False]:
+            self.assertEqual([[r.qname for r in reads] for reads in fetch_windows(bam, windows, stream)], expected)
+        reads = list(fetch_windows(bam, [("chrX", 0, 10)]))
+        self.assertRaises(ValueError, list, reads[0])
+
+    def test_compute_coverages(self):
+        from rgt.CoverageSet import compute_coverages
+        regions = GenomicRegionSet("test")
+        regions.add(GenomicRegion("chr1", 0, 300, orientation="+"))
+        regions.add(GenomicRegion("chr2", 0, 200, orientation="-"))
+        regions.add(GenomicRegion("chr1", 50, 250, orientation="-"))
+        results = []
+        for workers in [1, 2]:
+            bam_cov, set_cov = CoverageSet("bam", regions), CoverageSet("set", regions)
+            compute_coverages([(bam_cov, "coverage_from_bam", dict(bam_file=self.bam, extension_size=0,
+                                                                   get_strand_info=True)),
+                               (set_cov, "coverage_from_genomicset", dict(bamFile=self.bam, readSize=0))],
+                              workers=workers)
+            results.append(([c.tolist() for c in bam_cov.coverage], bam_cov.overall_cov.tolist(),
+                            [c.tolist() for c in bam_cov.cov_strand_all], bam_cov.reads, set_cov.coverage))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0][1], [1, 3, 3, 3, 1, 1, 0, 0, 0, 0, 2, 2, 3, 1])
+        self.assertEqual(results[0][4], [4, 0, 3])
+
+
+class TestCoverageFromBigWig(unittest.TestCase):
+
+    def setUp(self):
+        import os
+        import shutil
+        import tempfile
+        import pyBigWig
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.bigwig = os.path.join(self.directory, "test.bw")
+        bw = pyBigWig.open(self.bigwig, "w")
+        bw.addHeader([("chr1", 5000), ("chr2", 1000)])
+        bw.addEntries(["chr1"] * 4, [100, 250, 700, 3000], ends=[200, 400, 2500, 3010], values=[1., 2.5, 0.5, 4.])
+        bw.addEntries(["chr2"], [0], ends=[1000], values=[3.])
+        bw.close()
+
+    def test_coverage_from_bigwig(self):
+        import pyBigWig
+        from rgt.CoverageSet import bigwig_bins
+        regions = GenomicRegionSet("test")
+        for chrom, start, end in [("chr2", 100, 400), ("chr1", 0, 1000), ("chr1", 3000, 3040), ("chr1", 150, 333),
+                                  ("chr1", 4990, 5000), ("chr1", 500, 2500), ("chr3", 0, 100)]:
+            regions.add(GenomicRegion(chrom, start, end))
+        cov = CoverageSet("bigwig", regions)
+        cov.coverage_from_bigwig(self.bigwig, stepsize=50)
+        bw = pyBigWig.open(self.bigwig)
+        for r, c in zip(regions, cov.coverage):
+            if r.chrom == "chr3":
+                expected = [0] * (len(r) // 50)
+            else:
+                expected = bw.stats(r.chrom, r.initial, r.final, nBins=max(1, len(r) // 50), exact=True)
+            self.assertEqual(c.tolist(), [x if x else 0 for x in expected])
+        bw.close()
+        # reading each region on its own gives the same bins
+        self.assertEqual([c.tolist() for c in cov.coverage],
+                         [bigwig_bins(self.bigwig, [r], 50)[0].tolist() for r in regions])
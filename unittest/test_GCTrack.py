@@ -0,0 +1,100 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pysam
+import rgt.GCTrack
+from rgt.CoverageCache import CoverageCache
+from rgt.CoverageSet import CoverageSet, get_gc_context, gc_percent
+from rgt.GCTrack import GCTrack
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+
+"""Unit Test"""
+
+class TestGCTrack(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.genome = os.path.join(self.directory, "genome.fa")
+        with open(self.genome, "w") as f:
+            f.write(">chr1\nAACCGGTTNN\nacgtGGGGCC\n>chr2\nATATATATGC\n")
+        pysam.faidx(self.genome)
+        self.cache = CoverageCache(os.path.join(self.directory, "cache"), max_size=10 ** 9, min_file_size=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_gc_counts(self):
+        track = GCTrack(self.genome, cache=self.cache)
+        self.assertEqual(track.cumulative("chr1", range(21)).tolist(),
+                         [0, 0, 0, 1, 2, 3, 4, 4, 4, 4, 4, 4, 5, 6, 6, 7, 8, 9, 10, 11, 12])
+        gc, length = track.gc_counts("chr2", [0, 5, 8], [10, 100, 8])
+        self.assertEqual((gc.tolist(), length.tolist()), ([2, 2, 0], [10, 5, 0]))
+        gc, length = track.gc_counts("chrX", [0], [10])
+        self.assertEqual((gc.tolist(), length.tolist()), ([0], [0]))
+        # the second track is read from the cache
+        self.assertEqual(len(os.listdir(self.cache.cache_dir)), 2)
+        cached = GCTrack(self.genome, cache=self.cache)
+        self.assertEqual(cached.cumulative("chr1", range(21)).tolist(), track.cumulative("chr1", range(21)).tolist())
+        self.assertTrue(all(isinstance(a, np.memmap) for a in cached._tracks["chr1"]))
+
+    def test_blocks(self):
+        """Tracks over several blocks and chunks, with blocks of only G and C bases."""
+        rand = np.random.RandomState(0)
+        sequence = "".join(rand.choice(list("ACGTNacgt"), 5000)) + "G" * 600 + "AT" * 300
+        with open(self.genome, "w") as f:
+            f.write(">chr1\n" + sequence + "\n")
+        pysam.faidx(self.genome)
+        expected = np.concatenate([[0], np.cumsum([b in "CGcg" for b in sequence])])
+        chunk_size = rgt.GCTrack.CHUNK_SIZE
+        rgt.GCTrack.CHUNK_SIZE = 1024
+        self.addCleanup(setattr, rgt.GCTrack, "CHUNK_SIZE", chunk_size)
+        track = GCTrack(self.genome, cache=False)
+        self.assertEqual(track.cumulative("chr1", np.arange(len(sequence) + 1)).tolist(), expected.tolist())
+        gc, length = track.gc_counts("chr1", [0, 255, 4999], [257, 5700, 7000])
+        self.assertEqual(gc.tolist(), [expected[257], expected[5700] - expected[255],
+                                       expected[-1] - expected[4999]])
+
+    def test_gc_context(self):
+        key = (os.getpid(), os.path.abspath(self.genome))
+        rgt.GCTrack._tracks[key] = GCTrack(self.genome, cache=False)
+        self.addCleanup(rgt.GCTrack._tracks.pop, key)
+        regions = [GenomicRegion("chr2", 0, 10), GenomicRegion("chr1", 10, 20)]
+        # bins of 4 bases (binsize + 1) every 3 bases, clipped to the chromosome; the last bin of chr2 lies beyond it
+        gc = gc_percent(3, 3, self.genome, regions, [5, 3])
+        self.assertEqual(gc.tolist(), [0, 0, 50, 100, -1, 50, 75, 100])
+        gc_cov, gc_avg, hist = get_gc_context(3, 3, self.genome, [np.array([1, 2, 3, 5, 7]), np.array([2, 4, 6])],
+                                              regions)
+        self.assertEqual((hist[0], hist[50], hist[75], hist[100]), (1.5, 2.5, 4, 5.5))
+        self.assertEqual(sum(hist), 13.5)
+        self.assertAlmostEqual(gc_avg, 13.5 / 101)
+        self.assertEqual([g.tolist() for g in gc_cov], [[1.5, 1.5, 2.5, 5.5, 1.5], [2.5, 4, 5.5]])
+
+    def test_norm_gc_content(self):
+        key = (os.getpid(), os.path.abspath(self.genome))
+        rgt.GCTrack._tracks[key] = GCTrack(self.genome, cache=False)
+        self.addCleanup(rgt.GCTrack._tracks.pop, key)
+        regions = GenomicRegionSet("regions")
+        regions.add(GenomicRegion("chr2", 0, 10))
+        regions.add(GenomicRegion("chr1", 10, 20))
+        cov = CoverageSet("cov", regions)
+        cov.stepsize, cov.binsize = 3, 3
+        cov._allocate([5, 3])
+        cov.overall_cov[:] = [1000, 1000, 1000, 1000, 1000, 2000, 2000, 2000]
+        coverage = cov.coverage
+        cov.norm_gc_content([np.array([1, 2, 3, 5, 7]), np.array([2, 4, 6])], self.genome, None)
+        # GC averages of the bins (see test_gc_context): 1.5, 1.5, 2.5, 5.5, 1.5 and 2.5, 4, 5.5
+        gc_avg = 13.5 / 101
+        expected = [int(1000 * gc_avg / g) for g in [1.5, 1.5, 2.5, 5.5, 1.5]] + \
+                   [int(2000 * gc_avg / g) for g in [2.5, 4, 5.5]]
+        self.assertEqual(cov.overall_cov.tolist(), expected)
+        self.assertTrue(all(c.base is cov.overall_cov for c in cov.coverage))
+        self.assertIs(cov.coverage, coverage)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+from __future__ import print_function
+from __future__ import division
+import os
+import random
+import tempfile
+import unittest
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.GenomicRegionArray import GenomicRegionArray
+from rgt.Util import OverlapType
+
+
+"""Unit Test"""
+
+class TestGenomicRegionArray(unittest.TestCase):
+
+    def region_sets(self, listA, listB):
+        """ Setting the same regions as GenomicRegionSets (self.setA, self.setB) and GenomicRegionArrays
+        (self.arrayA, self.arrayB). """
+        self.setA = GenomicRegionSet('for Unit Test')
+        self.arrayA = GenomicRegionArray('for Unit Test')
+        for r in listA:
+            self.setA.add(GenomicRegion(chrom=r[0], initial=r[1], final=r[2]))
+            self.arrayA.add(GenomicRegion(chrom=r[0], initial=r[1], final=r[2]))
+
+        self.setB = GenomicRegionSet('for Unit Test')
+        self.arrayB = GenomicRegionArray('for Unit Test')
+        for r in listB:
+            self.setB.add(GenomicRegion(chrom=r[0], initial=r[1], final=r[2]))
+            self.arrayB.add(GenomicRegion(chrom=r[0], initial=r[1], final=r[2]))
+
+    def random_regions(self, n, seed, disjoint=False):
+        """Return n random regions on three chromosomes."""
+        rand = random.Random(seed)
+        regions = []
+        for chrom in ['chr1', 'chr10', 'chr2']:
+            pos = 0
+            for i in range(n):
+                if disjoint:
+                    pos += rand.randint(1, 50)
+                    length = rand.randint(1, 40)
+                    regions.append([chrom, pos, pos + length])
+                    pos += length
+                else:
+                    start = rand.randint(0, 5000)
+                    regions.append([chrom, start, start + rand.randint(1, 200)])
+        rand.shuffle(regions)
+        return regions
+
+    def overlapping_pairs(self, listA, listB):
+        """Return all overlapping pairs of regions by brute force."""
+        return [(a, b) for a in sorted(listA) for b in sorted(listB)
+                if GenomicRegion(a[0], a[1], a[2]).overlap(GenomicRegion(b[0], b[1], b[2]))]
+
+    def merged(self, regions):
+        s = GenomicRegionSet('merged')
+        for r in regions:
+            s.add(GenomicRegion(chrom=r[0], initial=r[1], final=r[2]))
+        return [[r.chrom, r.initial, r.final] for r in s.merge(w_return=True)]
+
+    def assertSameRegions(self, regions, expected):
+        self.assertEqual([(r.chrom, r.initial, r.final) for r in regions],
+                         [(r.chrom, r.initial, r.final) for r in expected])
+
+    def test_add_and_getitem(self):
+        self.region_sets([['chr2', 5, 10], ['chr1', 1, 3]], [])
+        self.assertEqual(len(self.arrayA), 2)
+        self.assertEqual(self.arrayA[0].chrom, 'chr2')
+        self.assertEqual(self.arrayA[-1].initial, 1)
+        self.assertEqual(len(self.arrayA[0:1]), 1)
+        self.assertEqual(self.arrayA.get_chrom(), ['chr2', 'chr1'])
+        self.assertRaises(IndexError, self.arrayA.__getitem__, 2)
+
+    def test_sort(self):
+        regions = self.random_regions(100, 0)
+        self.region_sets(regions, [])
+        self.setA.sort()
+        self.arrayA.sort()
+        self.assertTrue(self.arrayA.sorted)
+        self.assertSameRegions(self.arrayA, self.setA)
+
+    def test_extend(self):
+        self.region_sets([['chr1', 5, 10], ['chr1', 15, 20]], [])
+        result = self.arrayA.extend(5, 5, w_return=True)
+        self.assertSameRegions(result, [GenomicRegion('chr1', 0, 15), GenomicRegion('chr1', 10, 25)])
+        self.arrayA.extend(-3, -3)
+        self.assertSameRegions(self.arrayA, [GenomicRegion('chr1', 7, 8), GenomicRegion('chr1', 17, 18)])
+
+    def test_merge(self):
+        """
+        A : -----  ----   ---        ---
+                     ------     .
+        R : -----  ---------    .    ---
+        """
+        self.region_sets([['chr1', 1, 6], ['chr1', 8, 12], ['chr1', 10, 16], ['chr1', 14, 17], ['chr1', 20, 20],
+                          ['chr2', 3, 6]], [])
+        self.arrayA.merge()
+        self.assertSameRegions(self.arrayA, [GenomicRegion('chr1', 1, 6), GenomicRegion('chr1', 8, 17),
+                                             GenomicRegion('chr1', 20, 20), GenomicRegion('chr2', 3, 6)])
+        for seed in range(5):
+            self.region_sets(self.random_regions(200, seed), [])
+            self.assertSameRegions(self.arrayA.merge(w_return=True), self.setA.merge(w_return=True))
+
+    def test_merge_strand_specific(self):
+        self.arrayA = GenomicRegionArray('test')
+        self.arrayA.add(GenomicRegion('chr1', 1, 10, orientation="+"))
+        self.arrayA.add(GenomicRegion('chr1', 5, 15, orientation="-"))
+        self.arrayA.add(GenomicRegion('chr1', 8, 20, orientation="-"))
+        result = self.arrayA.merge(w_return=True, strand_specific=True)
+        self.assertEqual([(r.initial, r.final, r.orientation) for r in result],
+                         [(1, 10, "+"), (5, 20, "-")])
+
+    def test_intersect(self):
+        self.region_sets([], [])
+        self.assertEqual(len(self.arrayA.intersect(self.arrayB)), 0)
+        """
+        A : ------      ------
+        B :       ------
+        R : none
+        """
+        self.region_sets([['chr1', 1, 5], ['chr1', 11, 20]], [['chr1', 5, 11]])
+        self.assertEqual(len(self.arrayA.intersect(self.arrayB)), 0)
+        self.assertEqual(len(self.arrayA.intersect(self.arrayB, mode=OverlapType.ORIGINAL)), 0)
+        for seed in range(5):
+            listA, listB = self.random_regions(200, seed), self.random_regions(100, seed + 10)
+            self.region_sets(listA, listB)
+            pairs = self.overlapping_pairs(self.merged(listA), self.merged(listB))
+            expected = [GenomicRegion(a[0], max(a[1], b[1]), min(a[2], b[2])) for a, b in pairs]
+            self.assertSameRegions(self.arrayA.intersect(self.arrayB), expected)
+
+            pairs = self.overlapping_pairs(listA, listB)
+            expected = sorted(set(tuple(a) for a, b in pairs))
+            self.assertSameRegions(self.arrayA.intersect(self.arrayB, mode=OverlapType.ORIGINAL),
+                                   [GenomicRegion(*a) for a in expected])
+            expected = [a for a, b in pairs if a[1] >= b[1] and a[2] <= b[2]]
+            self.assertSameRegions(self.arrayA.intersect(self.arrayB, mode=OverlapType.COMP_INCL),
+                                   [GenomicRegion(*a) for a in expected])
+
+    def test_intersect_nested(self):
+        """
+        A :   --  --  --  --
+        B : ----------------------
+              ------  ------
+              --      --
+        """
+        rand = random.Random(0)
+        listA = [['chr1', i, i + rand.randint(0, 30)] for i in range(0, 5000, 7)]
+        listB = ([['chr1', 0, 6000], ['chr1', 100, 4000], ['chr1', 100, 4000], ['chr3', 0, 10]] +
+                 [['chr1', i, i + 3] for i in range(0, 5000, 50)])
+        self.region_sets(listA, listB)
+        pairs = self.overlapping_pairs(listA, listB)
+        self.assertSameRegions(self.arrayA.intersect(self.arrayB, mode=OverlapType.ORIGINAL),
+                               [GenomicRegion(*a) for a in sorted(set(tuple(a) for a, b in pairs))])
+        self.assertSameRegions(self.arrayA.intersect(self.arrayB, mode=OverlapType.COMP_INCL),
+                               [GenomicRegion(*a) for a, b in pairs if a[1] >= b[1] and a[2] <= b[2]])
+        # the chromosomes of B are not added to A
+        self.assertEqual(self.arrayA.chrom_names, ['chr1'])
+
+    def test_intersect_with_regionset(self):
+        self.region_sets([['chr1', 1, 10]], [['chr1', 5, 20]])
+        result = self.arrayA.intersect(self.setB)
+        self.assertSameRegions(result, [GenomicRegion('chr1', 5, 10)])
+
+    def test_subtract(self):
+        """
+        A : ------------------      -----
+        B :    ---   ---                     ---
+        R : ---   ---   ------      -----
+        """
+        self.region_sets([['chr1', 0, 18], ['chr1', 24, 29]], [['chr1', 3, 6], ['chr1', 9, 12], ['chr1', 37, 40]])
+        result = self.arrayA.subtract(self.arrayB)
+        self.assertSameRegions(result, [GenomicRegion('chr1', 0, 3), GenomicRegion('chr1', 6, 9),
+                                        GenomicRegion('chr1', 12, 18), GenomicRegion('chr1', 24, 29)])
+        result = self.arrayA.subtract(self.arrayB, whole_region=True)
+        self.assertSameRegions(result, [GenomicRegion('chr1', 24, 29)])
+        for seed in range(5):
+            listA, listB = self.random_regions(200, seed, disjoint=True), self.random_regions(100, seed + 10)
+            self.region_sets(listA, listB)
+            expected = []
+            for a in sorted(listA):
+                position = a[1]
+                for x, b in self.overlapping_pairs([a], self.merged(listB)):
+                    if b[1] > position:
+                        expected.append(GenomicRegion(a[0], position, b[1]))
+                    position = b[2]
+                if position < a[2]:
+                    expected.append(GenomicRegion(a[0], position, a[2]))
+            self.assertSameRegions(self.arrayA.subtract(self.arrayB), expected)
+
+    def test_remove_duplicates(self):
+        self.region_sets([['chr1', 1, 5], ['chr1', 1, 5], ['chr1', 3, 8]], [])
+        self.arrayA.remove_duplicates()
+        self.assertSameRegions(self.arrayA, [GenomicRegion('chr1', 1, 5), GenomicRegion('chr1', 3, 8)])
+
+    def test_combine(self):
+        self.region_sets([['chr1', 1, 5]], [['chr2', 1, 5]])
+        result = self.arrayA.combine(self.setB, output=True)
+        self.assertEqual(len(result), 2)
+        self.assertEqual(len(self.arrayA), 1)
+        self.arrayA.combine(self.arrayB)
+        self.assertEqual(self.arrayA.get_chrom(), ['chr1', 'chr2'])
+
+    def test_read_write_bed(self):
+        lines = ["track name=test",
+                 "chr2\t10\t20\tpeak1\t5\t+\textra",
+                 "chr1\t30\t40\tpeak2",
+                 "chr1\t5\t15\tpeak3\t7",
+                 "chr1\t50\t50\tempty"]
+        handle, bed = tempfile.mkstemp(suffix=".bed")
+        os.close(handle)
+        with open(bed, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        regionset = GenomicRegionSet("set")
+        regionset.read_bed(bed)
+        array = GenomicRegionArray("array")
+        array.read_bed(bed)
+        self.assertTrue(array.sorted)
+        self.assertSameRegions(array, regionset)
+
+        array.write_bed(bed)
+        with open(bed) as f:
+            written = f.read()
+        regionset.write_bed(bed)
+        with open(bed) as f:
+            expected = f.read()
+        os.remove(bed)
+        self.assertEqual(written, expected)
+
+    def test_conversion(self):
+        self.region_sets(self.random_regions(10, 0), [])
+        array = GenomicRegionArray.from_regionset(self.setA)
+        self.assertSameRegions(array, self.setA)
+        self.assertSameRegions(array.to_regionset(), self.setA)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ import unittest
 from rgt.GenomicRegion import *
 from rgt.GenomicRegionSet import *
 import os
+from copy import deepcopy
 from rgt.Util import GenomeData
 from rgt.Util import OverlapType
 
@@ -102,7 +103,56 @@ class TestGenomicRegionSet(unittest.TestCase):
         self.region_sets([['chr1',15,20],['chr1',40,50],['chr1',65,75],['chr1',5,10]],
                          [])
         self.setA.sort()
-    
+        self.assertEqual([(r.initial, r.final) for r in self.setA], [(5, 10), (15, 20), (40, 50), (65, 75)])
+        self.assertTrue(self.setA.sorted)
+
+    def test_sort_after_change(self):
+        """Regions recentered in place (as HINT does with summits) are sorted again by sort()."""
+        self.region_sets([['chr1', 100, 200], ['chr1', 150, 250]], [['chr1', 160, 161], ['chr1', 182, 183]])
+        self.setA.sort()
+        self.setA[0].initial, self.setA[0].final = 180, 200
+        self.setA[1].initial, self.setA[1].final = 145, 165
+        self.setA.sort()
+        self.assertEqual([(r.initial, r.final) for r in self.setA], [(145, 165), (180, 200)])
+        result = self.setA.intersect(self.setB, mode=OverlapType.ORIGINAL)
+        self.assertEqual([(r.initial, r.final) for r in result], [(145, 165), (180, 200)])
+
+    def test_sort_order(self):
+        import random
+        rand = random.Random(0)
+        regions = []
+        for i in range(2000):
+            start = rand.randint(0, 100)
+            regions.append(GenomicRegion(rand.choice(['chr1', 'chr10', 'chr2', 'chrX']), start,
+                                         start + rand.randint(0, 5), name=str(i)))
+        self.setA = GenomicRegionSet('random')
+        for r in regions:
+            self.setA.add(r)
+        self.setA.sort()
+        self.assertEqual([r.name for r in self.setA],
+                         [r.name for r in sorted(regions, cmp=GenomicRegion.__cmp__)])
+        self.setA.extend(0, 10, percentage=True)
+        self.assertFalse(self.setA.sorted)
+
+    def test_concatenate(self):
+        self.region_sets([['chr1', 15, 20], ['chr1', 40, 50], ['chr2', 5, 10]],
+                         [['chr1', 5, 10], ['chr1', 40, 50], ['chr3', 1, 2]])
+        self.setA.sort()
+        self.setB.sort()
+        result = GenomicRegionSet.concatenate([self.setA, GenomicRegionSet('empty'), self.setB])
+        self.assertTrue(result.sorted)
+        self.assertEqual([(r.chrom, r.initial) for r in result],
+                         [('chr1', 5), ('chr1', 15), ('chr1', 40), ('chr1', 40), ('chr2', 5), ('chr3', 1)])
+        self.assertIs(result[2], self.setA[1])
+        # Sorted sets which follow each other stay sorted when combined
+        tail = GenomicRegionSet('tail')
+        tail.add(GenomicRegion('chr3', 1, 2))
+        tail.sort()
+        self.setA.combine(tail)
+        self.assertTrue(self.setA.sorted)
+        self.setA.combine(self.setB)
+        self.assertFalse(self.setA.sorted)
+
     def test_intersect(self):
         """
         Two empty sets
@@ -614,6 +664,73 @@ class TestGenomicRegionSet(unittest.TestCase):
         # self.assertEqual(result[0].initial, 15)
         # self.assertEqual(result[0].final, 20)
     
+    def test_index_queries(self):
+        """
+        A : ------   -----------          .    ---
+                      ---    -----
+        R : include / covered_by_aregion / count_by_region for each query
+        """
+        self.region_sets([['chr1',1,7],['chr1',10,21],['chr1',11,14],['chr1',18,23],['chr1',30,30],
+                          ['chr1',35,38],['chr2',1,5]],
+                         [])
+        queries = [['chr1',0,1],['chr1',5,12],['chr1',13,19],['chr1',21,22],['chr1',23,30],['chr1',30,31],
+                   ['chr1',36,36],['chr2',4,10],['chr3',1,5]]
+        for q in queries:
+            region = GenomicRegion(chrom=q[0], initial=q[1], final=q[2])
+            expected = [s for s in self.setA if s.overlap(region)]
+            self.assertEqual(self.setA.include(region), len(expected) > 0)
+            self.assertEqual(self.setA.covered_by_aregion(region).sequences, expected)
+            query = GenomicRegionSet('query')
+            query.add(region)
+            self.assertEqual(self.setA.count_by_region(region), len(self.setA.intersect(query)))
+        self.assertEqual([(s.initial, s.final) for s in self.setA.any_chrom('chr1', len_min=5)],
+                         [(1, 7), (10, 21), (18, 23)])
+        self.assertEqual(len(self.setA.any_chrom('chr3')), 0)
+        # The index follows changes of the set
+        self.setA.add(GenomicRegion(chrom='chr3', initial=2, final=4))
+        self.assertTrue(self.setA.include(GenomicRegion(chrom='chr3', initial=1, final=5)))
+        self.assertEqual(len(self.setA.any_chrom('chr3')), 1)
+
+    def test_index_unsorted(self):
+        self.region_sets([['chr2',50,60],['chr1',500,600],['chr1',10,20],['chr1',550,700]],
+                         [])
+        order = list(self.setA.sequences)
+        self.assertTrue(self.setA.include(GenomicRegion(chrom='chr1', initial=15, final=16)))
+        self.assertEqual([(s.initial, s.final) for s in self.setA.any_chrom('chr1')], [(500, 600), (10, 20), (550, 700)])
+        self.assertEqual([(s.initial, s.final) for s in
+                          self.setA.covered_by_aregion(GenomicRegion(chrom='chr1', initial=0, final=560))],
+                         [(10, 20), (500, 600), (550, 700)])
+        self.assertEqual(self.setA.count_by_region(GenomicRegion(chrom='chr1', initial=0, final=560)), 2)
+        # the queries do not reorder the set
+        self.assertEqual(self.setA.sequences, order)
+        self.assertFalse(self.setA.sorted)
+        # regions changed in place are found after reset_index
+        self.setA[2].initial, self.setA[2].final = 800, 900
+        self.setA.reset_index()
+        self.assertTrue(self.setA.include(GenomicRegion(chrom='chr1', initial=850, final=851)))
+        self.assertFalse(self.setA.include(GenomicRegion(chrom='chr1', initial=15, final=16)))
+
+    def test_index_sort(self):
+        """Regions changed in place (in order) are found after sort()."""
+        self.region_sets([['chr1',10,20],['chr1',100,200],['chr1',300,400]], [])
+        self.setA.sort()
+        self.assertTrue(self.setA.include(GenomicRegion(chrom='chr1', initial=150, final=151)))
+        self.setA[1].initial, self.setA[1].final = 120, 130
+        self.setA.sort()
+        self.assertFalse(self.setA.include(GenomicRegion(chrom='chr1', initial=150, final=151)))
+        self.assertEqual(self.setA.count_by_region(GenomicRegion(chrom='chr1', initial=125, final=350)), 2)
+        self.assertEqual([(s.initial, s.final) for s in
+                          self.setA.covered_by_aregion(GenomicRegion(chrom='chr1', initial=0, final=140))],
+                         [(10, 20), (120, 130)])
+
+    def test_closest_index(self):
+        self.region_sets([['chr1',100,200],['chr1',1000,1100],['chr1',5000,5100],['chr2',50,60]],
+                         [['chr1',10,20],['chr1',230,250],['chr1',950,960],['chr1',1050,1060],['chr1',1500,1600],
+                          ['chr1',9000,9100],['chr2',70,80]])
+        result = self.setA.closest(self.setB)
+        self.assertEqual([(s.chrom, s.initial, s.final) for s in result],
+                         [('chr1',230,250),('chr1',1050,1060),('chr1',1500,1600),('chr2',70,80)])
+
     def test_remove_duplicates(self):
         """
         A : ===== -----
@@ -875,8 +992,33 @@ class TestGenomicRegionSet(unittest.TestCase):
                           ['chr4',10,15],['chr4',30,70],['chr4',120,140],['chr4',200,240]])
         result = self.setA.subtract(self.setB)
         self.assertEqual(len(result), 15)
-        
-        
+
+    def test_subtract_overlapping(self):
+        """
+        A : -----------           .
+                 ------------
+        B :    ---         ---    .
+        R : ---   -----           .
+                  ---------
+        """
+        self.region_sets([['chr1',0,11],['chr1',5,17],['chr1',22,22]],
+                         [['chr1',3,6],['chr1',15,18],['chr1',22,22]])
+        result = self.setA.subtract(self.setB)
+        self.assertEqual([(r.initial, r.final) for r in result], [(0,3),(6,11),(6,15),(22,22)])
+        self.assertEqual(len(self.setB), 3)
+        result = self.setA.subtract(self.setB, whole_region=True)
+        self.assertEqual([(r.initial, r.final) for r in result], [(22,22)])
+
+    def test_coverage_per_region(self):
+        """
+        A : ----------       ----
+        B :   --    ----   -----
+        R : (2+4)/10         5/4
+        """
+        self.region_sets([['chr1',0,10],['chr1',17,21],['chr2',0,5]],
+                         [['chr1',2,4],['chr1',8,12],['chr1',15,20]])
+        self.assertEqual(self.setA.coverage_per_region(self.setB), [0.6, 5/4, 0])
+
     def test_merge(self):
         """
         A : none
@@ -0,0 +1,93 @@
+from __future__ import print_function
+from __future__ import division
+import random
+import unittest
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.GenomicRegionArray import GenomicRegionArray
+from rgt.OverlapIndex import OverlapIndex
+
+
+"""Unit Test"""
+
+class TestOverlapIndex(unittest.TestCase):
+
+    def region_set(self, regions):
+        result = GenomicRegionSet('for Unit Test')
+        for r in regions:
+            result.add(GenomicRegion(chrom=r[0], initial=r[1], final=r[2]))
+        return result
+
+    def random_set(self, n, seed):
+        """Random nested regions, including zero-length ones."""
+        rand = random.Random(seed)
+        regions = []
+        for i in range(n):
+            start = rand.randint(0, 1000)
+            length = rand.choice([0, rand.randint(1, 20), rand.randint(1, 300)])
+            regions.append([rand.choice(['chr1', 'chr2']), start, start + length])
+        return self.region_set(regions)
+
+    def test_nested(self):
+        """
+        A : ------------------------
+              --------   -----
+                ---        .
+        """
+        index = OverlapIndex(self.region_set([['chr1', 0, 24], ['chr1', 2, 10], ['chr1', 4, 7], ['chr1', 13, 18],
+                                              ['chr1', 15, 15]]))
+        self.assertEqual(index.depth(), 3)
+        self.assertEqual(index.count(GenomicRegion('chr1', 5, 6)), 3)
+        self.assertEqual(index.count(GenomicRegion('chr1', 14, 16)), 3)
+        self.assertEqual(index.count(GenomicRegion('chr1', 30, 40)), 0)
+        self.assertEqual(index.count(GenomicRegion('chr2', 5, 6)), 0)
+        self.assertEqual([(r.initial, r.final) for r in index.contained(GenomicRegion('chr1', 1, 19))],
+                         [(2, 10), (4, 7), (13, 18), (15, 15)])
+        self.assertEqual([(r.initial, r.final) for r in index.containing(GenomicRegion('chr1', 5, 6))],
+                         [(0, 24), (2, 10), (4, 7)])
+
+    def test_duplicates(self):
+        """Identical regions and regions with the same end share one layer."""
+        index = OverlapIndex(self.region_set([['chr1', 10, 20]] * 20000 + [['chr1', 15, 20], ['chr1', 20, 30]]))
+        self.assertEqual(index.depth(), 1)
+        self.assertEqual(index.count(GenomicRegion('chr1', 12, 13)), 20000)
+        self.assertEqual(index.count(GenomicRegion('chr1', 19, 21)), 20002)
+        self.assertEqual(index.count(GenomicRegion('chr1', 20, 21)), 1)
+        self.assertEqual(index.overlap_indices(GenomicRegion('chr1', 16, 17)).tolist(), list(range(20001)))
+
+    def test_random(self):
+        for seed in range(5):
+            regions = self.random_set(300, seed)
+            queries = self.random_set(100, seed + 10)
+            index = OverlapIndex(regions)
+            for query_first in [False, True]:
+                expected = []
+                for j, q in enumerate(queries):
+                    for i, r in enumerate(regions):
+                        if (q.overlap(r) if query_first else r.overlap(q)):
+                            expected.append((j, i))
+                qi, ri = index.overlap_pairs(queries, query_first=query_first)
+                self.assertEqual(list(zip(qi.tolist(), ri.tolist())), expected)
+                counts = index.count_regionset(queries, query_first=query_first)
+                self.assertEqual(counts.tolist(), [len([p for p in expected if p[0] == j])
+                                                   for j in range(len(queries))])
+                for j, q in enumerate(queries):
+                    self.assertEqual(index.overlap_indices(q, query_first=query_first).tolist(),
+                                     [p[1] for p in expected if p[0] == j])
+
+    def test_regionarray(self):
+        regions = self.random_set(100, 0)
+        queries = self.random_set(50, 1)
+        array_index = OverlapIndex(GenomicRegionArray.from_regionset(regions))
+        index = OverlapIndex(regions)
+        self.assertEqual(array_index.count_regionset(queries).tolist(), index.count_regionset(queries).tolist())
+
+    def test_counts_per_region(self):
+        regions = self.random_set(200, 3)
+        queries = self.random_set(80, 4)
+        counts = queries.counts_per_region(regions)
+        self.assertEqual(counts, [len([r for r in regions if q.overlap(r)]) for q in queries])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+from __future__ import print_function
+from __future__ import division
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from rgt.BedReader import BedReader
+from rgt.GenomicRegionArray import TextColumn
+from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.RegionCache import RegionCache
+
+
+"""Unit Test"""
+
+class TestRegionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = RegionCache(cache_dir=os.path.join(self.directory, "cache"), max_size=10 ** 9, min_file_size=0)
+        self.bed = os.path.join(self.directory, "test.bed")
+        with open(self.bed, "w") as f:
+            f.write("track name=test\n"
+                    "chr2\t10\t20\tpeak1\t5\t+\textra\n"
+                    "chr1\t30\t40\tpeak2\n"
+                    "chr1\t5\t15\tpeak3\t7\n"
+                    "chr1\t8\t9\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def regions(self, regions):
+        return [(r.chrom, r.initial, r.final, r.name, r.orientation, r.data) for r in regions]
+
+    def test_read(self):
+        expected = self.regions(BedReader(self.bed))
+        parsed = self.cache.read(BedReader(self.bed))
+        self.assertEqual(self.regions(parsed.regions()), expected)
+        self.assertFalse(parsed.sorted)
+        self.assertEqual(len(os.listdir(self.cache.cache_dir)), 1)
+
+        cached = self.cache.read(BedReader(self.bed))
+        self.assertIsInstance(cached.initials, np.memmap)
+        self.assertIsInstance(cached.names, TextColumn)
+        self.assertIsInstance(cached.data.buffer, np.memmap)
+        self.assertEqual(cached.names[1], "peak2")
+        self.assertEqual(list(cached.names[np.array([3, 0])]), [None, "peak1"])
+        self.assertEqual(self.regions(cached.regions()), expected)
+        self.assertEqual(self.regions(cached.to_regionset()), expected)
+        self.assertFalse(cached.sorted)
+
+    def test_invalidation(self):
+        self.cache.read(BedReader(self.bed))
+        with open(self.bed, "a") as f:
+            f.write("chr3\t1\t2\tnew\n")
+        os.utime(self.bed, (0, 1))
+        self.assertIsNone(self.cache.load(self.bed))
+        cached = self.cache.read(BedReader(self.bed))
+        self.assertEqual(len(cached), 5)
+        # The entry of the old file is replaced
+        self.assertEqual(len(os.listdir(self.cache.cache_dir)), 1)
+        self.assertIsNone(self.cache.read(BedReader(self.bed, regions=GenomicRegionSet("query"))))
+
+    def test_small_files(self):
+        cache = RegionCache(cache_dir=self.cache.cache_dir, max_size=10 ** 9, min_file_size=10 ** 6)
+        self.assertIsNone(cache.read(BedReader(self.bed)))
+        self.assertIsNotNone(cache.read(BedReader(self.bed), force=True))
+
+    def test_eviction(self):
+        beds = []
+        for i in range(3):
+            beds.append(os.path.join(self.directory, "test%d.bed" % i))
+            shutil.copy(self.bed, beds[-1])
+        self.cache.read(BedReader(beds[0]))
+        size = sum(os.path.getsize(os.path.join(dirpath, f)) for dirpath, _, files in os.walk(self.cache.cache_dir)
+                   for f in files)
+        # room for two entries; the entry of the first file is used again, so the second one is removed
+        cache = RegionCache(cache_dir=self.cache.cache_dir, max_size=2 * size, min_file_size=0)
+        cache.read(BedReader(beds[1]))
+        os.utime(cache.path(beds[0]), (0, 1))
+        os.utime(cache.path(beds[1]), (0, 2))
+        self.assertIsNotNone(cache.load(beds[0]))
+        cache.read(BedReader(beds[2]))
+        self.assertEqual(sorted(os.listdir(cache.cache_dir)), sorted(os.path.basename(cache.path(b))
+                                                                    for b in [beds[0], beds[2]]))
+
+    def test_regionset(self):
+        expected = GenomicRegionSet("expected")
+        expected.read_bed(self.bed, cache=False)
+        sorted_bed = os.path.join(self.directory, "sorted.bed")
+        expected.write_bed(sorted_bed)
+        regions = GenomicRegionSet("cached")
+        regions.read_bed(sorted_bed, cache=self.cache)
+        regions = GenomicRegionSet("cached")
+        regions.read_bed(sorted_bed, cache=self.cache)
+        # the sorted file is kept as columns until the regions are used
+        self.assertNotIn("sequences", regions.__dict__)
+        self.assertEqual(len(regions), 4)
+        expected = GenomicRegionSet("expected")
+        expected.read_bed(sorted_bed, cache=False)
+        for regionset, filename in [(regions, "written.bed"), (expected, "expected.bed")]:
+            regionset.write_bed(os.path.join(self.directory, filename))
+        self.assertNotIn("sequences", regions.__dict__)
+        with open(os.path.join(self.directory, "written.bed")) as f, \
+                open(os.path.join(self.directory, "expected.bed")) as g:
+            self.assertEqual(f.read(), g.read())
+        self.assertEqual(self.regions(regions), self.regions(expected))
+        self.assertTrue(regions.sorted)
+        regions.add(expected[0])
+        self.assertEqual(len(regions), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+from __future__ import print_function
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import multiprocessing.pool
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.THOR import THOR
+from rgt.THOR.RegionGiver import RegionGiver
+
+
+"""Unit Test"""
+
+def _stub_task(i, r):
+    """Stands in for THOR._call_peaks_task; later region sets finish earlier."""
+    time.sleep(0.02 * (3 - i % 4))
+    region = r.sequences[0]
+    return i, region.chrom, region.initial, region.final
+
+
+class Options:
+    stepsize = 1
+
+
+class TestParallelResults(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.submitted = []
+        self.results = []
+        task = THOR._call_peaks_task
+        THOR._call_peaks_task = _stub_task
+        self.addCleanup(setattr, THOR, "_call_peaks_task", task)
+        test = self
+
+        class CountingPool(multiprocessing.pool.Pool):
+            def apply_async(self, func, args=(), kwds={}, callback=None):
+                # the region sets in flight: submitted, but not taken by the test yet
+                test.submitted.append(args)
+                test.in_flight.append(test.submitted[len(test.results):])
+                return multiprocessing.pool.Pool.apply_async(self, func, args, kwds, callback)
+
+        class Multiprocessing:
+            Pool = CountingPool
+
+        self.in_flight = []
+        THOR.multiprocessing = Multiprocessing
+        self.addCleanup(setattr, THOR, "multiprocessing", multiprocessing)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_parallel(self, region_giver, workers, max_memory=0):
+        state = dict(region_giver=region_giver, options=Options(), bamfiles=["a.bam"], inputs=None)
+        for result in THOR._parallel_results(state, workers, max_memory):
+            self.results.append(result)
+        return self.results
+
+    def test_order(self):
+        chrom_sizes = os.path.join(self.directory, "chrom.sizes")
+        with open(chrom_sizes, "w") as f:
+            f.write("".join("chr%s\t%s\n" % (i, 1000 + i) for i in range(1, 11)))
+        region_giver = RegionGiver(chrom_sizes)
+        expected = [(i, r.sequences[0].chrom, r.sequences[0].initial, r.sequences[0].final)
+                    for i, r in enumerate(region_giver)]
+        self.assertEqual(self.run_parallel(region_giver, 2), expected)
+        self.assertEqual(max(len(x) for x in self.in_flight), 4)
+
+    def test_max_memory(self):
+        region_sets = []
+        for length in [4, 4, 4, 100, 4, 4, 4]:
+            r = GenomicRegionSet("")
+            r.add(GenomicRegion("chr1", 0, length))
+            region_sets.append(r)
+        # 1000 bytes: two region sets of 4 bins (BIN_MEMORY bytes each), the region set of 100 bins exceeds it alone
+        budget = 1000
+        results = self.run_parallel(region_sets, 2, max_memory=budget / 1024.0 ** 3)
+        self.assertEqual([x[0] for x in results], list(range(len(region_sets))))
+        sizes = [[len(r[0]) * THOR.BIN_MEMORY for i, r in x] for x in self.in_flight]
+        self.assertEqual(max(len(x) for x in sizes), 2)
+        self.assertTrue(all(sum(x) <= budget or len(x) == 1 for x in sizes))
+        self.assertIn([100 * THOR.BIN_MEMORY], sizes)
+
+
+class TestRunHMM(unittest.TestCase):
+
+    def test_close_on_error(self):
+        """The bigWig files are closed when the peak calling of a chromosome fails."""
+        closed = []
+
+        class Writer:
+            def close(self):
+                closed.append(self)
+
+        def open_writers(*args):
+            return [Writer(), Writer()]
+
+        def call_peaks(state, i, r, bigwig_writers=None):
+            raise ValueError("chromosome %s" % i)
+
+        for name, value in [("open_bigwig_writers", open_writers), ("_call_peaks", call_peaks)]:
+            self.addCleanup(setattr, THOR, name, getattr(THOR, name))
+            setattr(THOR, name, value)
+        region_giver = [GenomicRegionSet("chr1")]
+        region_giver[0].add(GenomicRegion("chr1", 0, 1000))
+
+        class Giver(list):
+            def get_regionset(self):
+                return region_giver[0]
+
+        options = Options()
+        options.workers = 1
+        self.assertRaises(ValueError, THOR.run_HMM, Giver(region_giver), options, ["a.bam", "b.bam"], None,
+                          None, [1, 1], None, None, None, None, None)
+        self.assertEqual(len(closed), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pysam
+from rgt.THOR import get_extension_size as extension
+from rgt.THOR.get_extension_size import cross_correlation, get_extension_size
+
+
+"""Unit Test"""
+
+def ccf(filename, shifts):
+    """Cross correlation of the read starts of the first chromosome with dicts of the positions, as THOR computed it
+    before the FFT."""
+    cov_f, cov_r = {}, {}
+    bam = pysam.Samfile(filename, "rb")
+    for read in bam.fetch(bam.references[0]):
+        if not read.is_unmapped:
+            h = len(read.seq) if read.seq else 0
+            pos = read.pos + read.rlen - h if read.is_reverse else read.pos
+            (cov_r if read.is_reverse else cov_f)[pos] = 1
+    return [len(set(cov_f) & set(p - k for p in cov_r)) for k in shifts]
+
+
+class TestGetExtensionSize(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bam = os.path.join(self.directory, "reads.bam")
+        self.addCleanup(extension._sizes.clear)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_bam(self, seed, fragment=150):
+        """Fragments of <fragment> bp (forward read at the start, reverse read at the end) and some single reads on
+        chr1, and reads on the shorter chr2."""
+        rand = np.random.RandomState(seed)
+        header = {"HD": {"VN": "1.0"}, "SQ": [{"SN": "chr1", "LN": 200000}, {"SN": "chr2", "LN": 50000}]}
+        reads = []
+        for start in rand.randint(1000, 190000, 800):
+            reads.append((0, start, False))
+            reads.append((0, start + fragment + rand.randint(-10, 11) - 36, True))
+        for start in rand.randint(1000, 190000, 300):
+            reads.append((0, start, rand.rand() < 0.5))
+        for start in rand.randint(0, 45000, 300):
+            reads.append((1, start, rand.rand() < 0.5))
+        unsorted = self.bam + ".unsorted.bam"
+        with pysam.AlignmentFile(unsorted, "wb", header=header) as f:
+            for i, (chrom, start, reverse) in enumerate(sorted(reads)):
+                read = pysam.AlignedSegment()
+                read.query_name = "read%s" % i
+                read.reference_id = chrom
+                read.reference_start = start
+                read.query_sequence = "A" * 36
+                read.cigartuples = [(0, 36)]
+                read.mapping_quality = 30
+                read.is_reverse = reverse
+                f.write(read)
+        os.rename(unsorted, self.bam)
+        pysam.index(self.bam)
+
+    def test_cross_correlation(self):
+        self.write_bam(0)
+        shifts = list(range(-36, 600, 5))
+        correlation = cross_correlation(self.bam, shifts, chromosomes=1)
+        self.assertEqual(correlation.tolist(), ccf(self.bam, shifts))
+        # the fragments give the largest correlation
+        self.assertTrue(100 < shifts[int(np.argmax(correlation))] < 140)
+        # the reads of chr2 are added with two chromosomes
+        self.assertTrue((cross_correlation(self.bam, shifts, chromosomes=2) >= correlation).all())
+
+    def test_cache(self):
+        self.write_bam(0)
+        size, values = get_extension_size(self.bam)
+        self.assertIs(get_extension_size(self.bam)[1], values)
+        # a new modification time: the file is read again
+        stat = os.stat(self.bam)
+        os.utime(self.bam, (stat.st_atime, stat.st_mtime + 10))
+        self.assertIsNot(get_extension_size(self.bam)[1], values)
+        self.assertEqual(get_extension_size(self.bam), (size, values))
+        # another file at the same path
+        self.write_bam(1, fragment=250)
+        os.utime(self.bam, (stat.st_atime, stat.st_mtime + 20))
+        self.assertNotEqual(get_extension_size(self.bam)[0], size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+from __future__ import print_function
+import unittest
+import warnings
+from math import log
+import numpy as np
+from rgt.THOR import get_fast_gen_pvalue
+from rgt.THOR.get_fast_gen_pvalue import get_log_pvalues, compute_pvalue, get_log_value
+from rgt.THOR.neg_bin import NegBin
+
+
+"""Unit Test"""
+
+class TestGetLogPvalues(unittest.TestCase):
+
+    def setUp(self):
+        # every test starts with an empty cache of the default size
+        for name in ["CACHE_SIZE", "_tables", "_cached"]:
+            self.addCleanup(setattr, get_fast_gen_pvalue, name, getattr(get_fast_gen_pvalue, name))
+        get_fast_gen_pvalue._tables = get_fast_gen_pvalue._tables.__class__()
+        get_fast_gen_pvalue._cached = 0
+        self.distributions = [{'distr_name': 'nb', 'distr': NegBin(1.04, 0.1)},
+                              {'distr_name': 'nb', 'distr': NegBin(20., 0.5)},
+                              {'distr_name': 'binomial', 'n': 200, 'p': 0.05},
+                              {'distr_name': 'binomial', 'n': 1000, 'p': 0.3}]
+
+    def pvalue(self, x, y, side, distr):
+        """log10 p-value as computed by the loop over all i of compute_pvalue."""
+        if side == 'l':
+            x, y = y, x
+        current_p = get_log_value(x, distr) + get_log_value(y, distr)
+        return float(compute_pvalue(distr, x + y, 'r', current_p, x)) / log(10)
+
+    def pairs(self, seed, n=200):
+        rand = np.random.RandomState(seed)
+        return rand.randint(0, 120, n), rand.randint(0, 120, n), rand.choice(['l', 'r'], n)
+
+    def assertPvalues(self, x, y, side, distr):
+        expected = [self.pvalue(a, b, s, distr) for a, b, s in zip(x.tolist(), y.tolist(), side.tolist())]
+        self.assertLess(np.abs(get_log_pvalues(x, y, side, distr) - expected).max(), 1e-13)
+
+    def assertCacheSize(self):
+        self.assertEqual(get_fast_gen_pvalue._cached, sum(len(t) for t in get_fast_gen_pvalue._tables.values()))
+
+    def test_compute_pvalue(self):
+        for seed, distr in enumerate(self.distributions):
+            x, y, side = self.pairs(seed)
+            self.assertPvalues(x, y, side, distr)
+            # again from the cache
+            self.assertPvalues(x, y, side, distr)
+            self.assertEqual(get_log_pvalues([7, 3], [3, 7], 'l', distr).tolist(),
+                             get_log_pvalues([3, 7], [7, 3], 'r', distr).tolist())
+
+    def test_workers(self):
+        x, y, side = self.pairs(5)
+        distr = self.distributions[0]
+        pvalues = get_log_pvalues(x, y, side, distr, workers=2)
+        get_fast_gen_pvalue._tables.clear()
+        get_fast_gen_pvalue._cached = 0
+        self.assertEqual(pvalues.tolist(), get_log_pvalues(x, y, side, distr).tolist())
+
+    def test_zero(self):
+        for distr in self.distributions:
+            expected = self.pvalue(0, 0, 'r', distr)
+            # THOR turns warnings into errors (see neg_bin_rep_hmm)
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                # N = 0: the only term is in the numerator and the denominator, the p-value is 1/2
+                pvalues = get_log_pvalues([0, 0], [0, 0], ['l', 'r'], distr)
+                # no pairs, e.g. in _merge_consecutive_bins when no bin passes the cutoff
+                self.assertEqual(len(get_log_pvalues([], [], [], distr)), 0)
+                self.assertEqual(len(get_log_pvalues(np.zeros(0), np.zeros(0), 'l', distr)), 0)
+            self.assertAlmostEqual(pvalues[0], log(0.5, 10), places=13)
+            self.assertAlmostEqual(pvalues[1], expected, places=13)
+
+    def test_eviction(self):
+        # the tables of N have N / 2 + 1 values
+        get_fast_gen_pvalue.CACHE_SIZE = 40
+        distr = self.distributions[0]
+        for n in [10, 20, 30]:
+            get_log_pvalues([n], [0], 'r', distr)
+        self.assertEqual([k[1] for k in get_fast_gen_pvalue._tables], [10, 20, 30])
+        # N = 10 is used again, so N = 20 is the least recently used table
+        get_log_pvalues([10], [0], 'r', distr)
+        get_log_pvalues([24], [0], 'r', distr)
+        self.assertEqual([k[1] for k in get_fast_gen_pvalue._tables], [30, 10, 24])
+        self.assertCacheSize()
+        self.assertLessEqual(get_fast_gen_pvalue._cached, 40)
+        # a table larger than the cache is kept alone
+        get_log_pvalues([100], [0], 'r', distr)
+        self.assertEqual([k[1] for k in get_fast_gen_pvalue._tables], [100])
+        self.assertCacheSize()
+        x, y, side = self.pairs(6, 50)
+        self.assertPvalues(x, y, side, distr)
+
+    def test_distributions(self):
+        """The cached tables of one distribution are not used for another one."""
+        x, y, side = self.pairs(7)
+        results = [get_log_pvalues(x, y, side, distr) for distr in self.distributions]
+        for distr, pvalues in zip(self.distributions, results):
+            self.assertPvalues(x, y, side, distr)
+            self.assertEqual(get_log_pvalues(x, y, side, distr).tolist(), pvalues.tolist())
+        # a distribution with the same parameters shares the tables
+        distr = {'distr_name': 'nb', 'distr': NegBin(1.04, 0.1)}
+        cached = len(get_fast_gen_pvalue._tables)
+        self.assertEqual(get_log_pvalues(x, y, side, distr).tolist(), results[0].tolist())
+        self.assertEqual(len(get_fast_gen_pvalue._tables), cached)
+
+
+if __name__ == "__main__":
+    unittest.main()
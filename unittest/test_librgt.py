@@ -0,0 +1,113 @@
+from __future__ import print_function
+from __future__ import division
+import random
+import unittest
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.Util import OverlapType
+from rgt import librgt
+
+
+"""Unit Test"""
+
+class TestLibrgt(unittest.TestCase):
+
+    def random_set(self, n, seed):
+        rand = random.Random(seed)
+        result = GenomicRegionSet('for Unit Test')
+        for i in range(n):
+            start = rand.randint(0, 5000)
+            result.add(GenomicRegion(rand.choice(['chr1', 'chr10', 'chr2', 'chrX']), start,
+                                     start + rand.randint(1, 200)))
+        result.sort()
+        return result
+
+    def test_library_loaded_once(self):
+        self.assertIs(librgt.get_library(), librgt.get_library())
+
+    def test_intersect(self):
+        """
+        A : ------      -------
+        B :     ----- ---
+        R :     --      -
+        """
+        a = GenomicRegionSet('A')
+        a.add(GenomicRegion('chr1', 1, 7))
+        a.add(GenomicRegion('chr1', 13, 20))
+        b = GenomicRegionSet('B')
+        b.add(GenomicRegion('chr1', 5, 10))
+        b.add(GenomicRegion('chr1', 11, 14))
+        indices, initials, finals = librgt.intersect(a, b)
+        self.assertEqual(list(zip(indices.tolist(), initials.tolist(), finals.tolist())), [(0, 5, 7), (1, 13, 14)])
+
+    def test_codes_and_names(self):
+        if not librgt.has_codes():
+            return
+        for seed in range(3):
+            a = self.random_set(300, seed)
+            b = self.random_set(200, seed + 10)
+            for mode in [OverlapType.ORIGINAL, OverlapType.COMP_INCL]:
+                codes = librgt._intersect_codes(a, b, mode)
+                names = librgt._intersect_names(a, b, mode)
+                for x, y in zip(codes, names):
+                    self.assertEqual(x.tolist(), y.tolist())
+            a = a.merge(w_return=True)
+            b = b.merge(w_return=True)
+            codes = librgt._intersect_codes(a, b, OverlapType.OVERLAP)
+            names = librgt._intersect_names(a, b, OverlapType.OVERLAP)
+            for x, y in zip(codes, names):
+                self.assertEqual(x.tolist(), y.tolist())
+
+    def test_names_many_pairs(self):
+        """
+        A :    -  -  -  ...  -
+        B : -  ---------------  -   (100 times)
+        R : every region of A 100 times, more than len(A) + len(B) regions
+        """
+        a = GenomicRegionSet('A')
+        b = GenomicRegionSet('B')
+        b.add(GenomicRegion('chr1', 0, 1))
+        b.add(GenomicRegion('chr1', 3000, 3001))
+        for i in range(100):
+            a.add(GenomicRegion('chr1', i * 10 + 3, i * 10 + 8))
+            b.add(GenomicRegion('chr1', 2, 2000))
+        a.sort()
+        b.sort()
+        indices, initials, finals = librgt._intersect_names(a, b, OverlapType.COMP_INCL)
+        self.assertEqual(indices.tolist(), [i for i in range(100) for j in range(100)])
+        self.assertEqual(finals.tolist(), [i * 10 + 8 for i in range(100) for j in range(100)])
+
+    def test_merge_and_cluster(self):
+        if not librgt.has_sweeps():
+            return
+        regions = self.random_set(500, 3)
+        for distance in [None, 0, 20]:
+            expected = []
+            for r in regions:
+                if expected:
+                    last = expected[-1][1]
+                    if distance is None:
+                        joined = last.overlap(r)
+                    else:
+                        joined = r.extend(distance, distance, w_return=True).overlap(last)
+                    if joined:
+                        last.initial = min(last.initial, r.initial)
+                        last.final = max(last.final, r.final)
+                        continue
+                expected.append((len(expected), GenomicRegion(r.chrom, r.initial, r.final)))
+            if distance is None:
+                indices, initials, finals = librgt.merge(regions)
+            else:
+                indices, initials, finals = librgt.cluster(regions, distance)
+            self.assertEqual(list(zip(initials.tolist(), finals.tolist())),
+                             [(r.initial, r.final) for i, r in expected])
+            self.assertEqual([regions[i].chrom for i in indices], [r.chrom for i, r in expected])
+
+    def test_jaccard(self):
+        a = self.random_set(300, 0).merge(w_return=True)
+        b = self.random_set(200, 1).merge(w_return=True)
+        self.assertAlmostEqual(a.jaccard_c(b), a.jaccard(b))
+
+
+if __name__ == "__main__":
+    unittest.main()
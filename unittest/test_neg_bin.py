@@ -0,0 +1,38 @@
+from __future__ import print_function
+import unittest
+import numpy as np
+from rgt.THOR.neg_bin import NegBin
+
+
+"""Unit Test"""
+
+class TestNegBin(unittest.TestCase):
+
+    def logpdf(self, distr, n):
+        return np.array([float(distr.logpdf(x)) for x in range(n + 1)])
+
+    def test_logpdf_table(self):
+        for mu in [0.1, 5., 500.]:
+            for alpha in [0.001, 0.5, 2.]:
+                distr = NegBin(mu, alpha)
+                expected = self.logpdf(distr, 300)
+                table = distr.logpdf_table(300)
+                self.assertEqual(len(table), 301)
+                self.assertLess((np.abs(table - expected) / np.maximum(1, np.abs(expected))).max(), 1e-12)
+                # the table is kept and shortened for smaller counts
+                self.assertIs(distr.logpdf_table(10).base, distr.table)
+
+    def test_logpdf_table_small_alpha(self):
+        # 1/alpha = 1e11: the float log-gamma values of the table lose about 4 digits
+        for mu in [0.1, 50.]:
+            distr = NegBin(mu, 1e-11)
+            self.assertLess(np.abs(distr.logpdf_table(300) - self.logpdf(distr, 300)).max(), 1e-3)
+
+    def test_logpdf_table_invalid(self):
+        distr = NegBin(0, 0.5)
+        self.assertEqual(distr.logpdf_table(3).tolist(), [1, 1, 1, 1])
+        self.assertEqual(self.logpdf(distr, 3).tolist(), [1, 1, 1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+from __future__ import print_function
+import unittest
+import warnings
+import numpy as np
+from rgt.THOR.neg_bin_rep_hmm import NegBinRepHMM
+
+
+"""Unit Test"""
+
+class TestNegBinRepHMM(unittest.TestCase):
+
+    def hmm(self, dim_cond_1, dim_cond_2):
+        """HMM with the emission distributions only (the hmmlearn base class is not needed for them)."""
+        hmm = NegBinRepHMM.__new__(NegBinRepHMM)
+        hmm.dim = [dim_cond_1, dim_cond_2]
+        hmm.n_components = 3
+        hmm.n_features = 2
+        # neg_bin_rep_hmm turns warnings into errors; newer NumPy versions warn about np.matrix
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", PendingDeprecationWarning)
+            hmm._update_distr(np.matrix([[1., 8., 2.], [1.5, 2.5, 9.]]),
+                              np.matrix([[0.1, 0.02, 0.3], [0.05, 0.2, 0.01]]))
+        return hmm
+
+    def test_compute_log_likelihood(self):
+        rand = np.random.RandomState(0)
+        for dims in [(1, 1), (2, 3)]:
+            hmm = self.hmm(*dims)
+            X = rand.randint(0, 30, size=(50, sum(dims)))
+            X[0] = 0
+            expected = np.zeros((len(X), 3))
+            for t in range(len(X)):
+                for i in range(3):
+                    for k in range(sum(dims)):
+                        j = 0 if k < dims[0] else 1
+                        expected[t, i] += float(hmm.neg_distr[j, i].logpdf(int(X[t, k])))
+            matrix = hmm._compute_log_likelihood(X)
+            self.assertEqual(matrix.shape, (50, 3))
+            self.assertLess((np.abs(matrix - expected) / np.maximum(1, np.abs(expected))).max(), 1e-12)
+            # counts are truncated to integers
+            self.assertEqual(hmm._compute_log_likelihood(X + 0.7).tolist(), matrix.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+from __future__ import print_function
+import unittest
+import numpy as np
+from rgt.THOR.normalize import bin_counts, get_bins, _get_lists
+
+
+"""Unit Test"""
+
+class TestNormalize(unittest.TestCase):
+
+    def assertPQ(self, result, pq_list, max_index, max_value, factor1, factor2):
+        self.assertEqual(len(result[0]), len(pq_list))
+        for row, expected in zip(result[0], pq_list):
+            self.assertAlmostEqual(row[0], expected[0])
+            self.assertAlmostEqual(row[1], expected[1])
+        self.assertEqual(result[1], max_index)
+        self.assertAlmostEqual(result[2], max_value)
+        self.assertAlmostEqual(result[3], factor1)
+        self.assertAlmostEqual(result[4], factor2)
+
+    def test_bin_counts(self):
+        # bins [0, 10), [10, 20), [20, 25); reads on the bin borders belong to the bin starting there
+        self.assertEqual(bin_counts([0, 9, 10, 10, 19, 24], 25, 10).tolist(), [2, 3, 1])
+        self.assertEqual(bin_counts([0, 9, 10, 10, 19], 20, 10).tolist(), [2, 3])
+        self.assertEqual(bin_counts([], 25, 10).tolist(), [0, 0, 0])
+        self.assertEqual(bin_counts(np.array([3, 3, 3]), 1, 10).tolist(), [3])
+        self.assertEqual(bin_counts([4, 1, 4], 5, 1).tolist(), [0, 1, 0, 0, 2])
+
+    def test_get_bins(self):
+        # reads near the end of a bin are not counted in the next bin, whatever their length
+        count_list = {'chr1': np.array([5, 9, 15]), 'chr2': np.array([0])}
+        for feature_len in [0, 1, 50]:
+            bins = get_bins({'chr1': 30, 'chr2': 5}, set(['chr1', 'chr2', 'chr3']), count_list, 10, feature_len)
+            self.assertEqual(sorted(bins.keys()), ['chr1', 'chr2'])
+            self.assertEqual(bins['chr1'].tolist(), [2, 1, 0])
+            self.assertEqual(bins['chr2'].tolist(), [1])
+        bins = get_bins({'chr1': 30}, set(['chr1']), {}, 10, 0)
+        self.assertEqual(bins['chr1'].tolist(), [0, 0, 0])
+
+    def test_get_lists(self):
+        """
+        bins (x, y): (0, 1) (2, 0) (1, 3) (0, 0) (3, 2)
+        """
+        count_list = np.array([[0, 1], [2, 0], [1, 3], [0, 0], [3, 2]])
+        # sorted by x: (0, 1) (0, 0) (1, 3) (2, 0) (3, 2), cumulative sums / (6, 6)
+        self.assertPQ(_get_lists(count_list, True),
+                      [(0, 1 / 6.), (0, 1 / 6.), (1 / 6., 4 / 6.), (3 / 6., 4 / 6.), (1, 1)], 2, 0.5, 0.25, 4)
+        # without x = 0: (1, 3) (2, 0) (3, 2), cumulative sums / (6, 5)
+        self.assertPQ(_get_lists(count_list, False),
+                      [(1 / 6., 3 / 5.), (3 / 6., 3 / 5.), (1, 1)], 0, 13 / 30., 5 / 18., 18 / 5.)
+        # sorted by x + y: (0, 0) (0, 1) (2, 0) (1, 3) (3, 2), cumulative sums, the middle bin is chosen
+        self.assertPQ(_get_lists(count_list, True, two_sample=True),
+                      [(0, 0), (0, 1), (2, 1), (3, 4), (6, 6)], 2, 1, 2, 0.5)
+        # without (0, 0)
+        self.assertPQ(_get_lists(count_list, False, two_sample=True),
+                      [(0, 1), (2, 1), (3, 4), (6, 6)], 2, 1, 0.75, 4 / 3.)
+
+
+if __name__ == "__main__":
+    unittest.main()